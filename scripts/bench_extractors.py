@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+'''
+抽出器のスケーリング計測
+ATLAS 規模 (3,000人超・所属数百) の合成論文を各クラス形式で生成し、
+著者数を倍々にしたときの処理時間を表示する。
+線形なら「倍率」の列がおおむね 2.0 になる。
+例: python scripts/bench_extractors.py --max-authors 6000
+'''
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.extractor import InformationExtractor
+
+def _institutes(n_authors):
+    # 共同研究論文では所属数はおおむね著者数の 1/15 程度
+    return [f"Department of Physics, University {i}, City {i % 50}" for i in range(max(1, n_authors // 15))]
+
+def make_revtex(n_authors, rng):
+    """\\author{...} の直後に \\affiliation が1〜3個続く ATLAS 形式"""
+    insts = _institutes(n_authors)
+    lines = [r"\documentclass[aps]{revtex4-2}", r"\collaboration{ATLAS Collaboration}"]
+    for i in range(n_authors):
+        lines.append(rf"\author{{A.~Author{i}$^{{{i % 7}}}$}}")
+        for inst in rng.sample(insts, min(len(insts), rng.randint(1, 3))):
+            lines.append(rf"\affiliation{{{inst}}}")
+    return "\n".join(lines)
+
+def make_amsart(n_authors, rng):
+    """著者を全員並べた後に \\address[姓]{...} で名指しする形式"""
+    insts = _institutes(n_authors)
+    lines = [r"\documentclass{amsart}"]
+    for i in range(n_authors):
+        lines.append(rf"\author{{Author{i} Surname{i}}}")
+    for i in range(n_authors):
+        lines.append(rf"\address[Surname{i}]{{{rng.choice(insts)}}}")
+    return "\n".join(lines)
+
+def make_elsarticle(n_authors, rng):
+    """\\author[a,b]{...} と \\address[a]{...} のラベル方式"""
+    insts = _institutes(n_authors)
+    lines = [r"\documentclass{elsarticle}"]
+    for i in range(n_authors):
+        labels = ",".join(f"l{j}" for j in rng.sample(range(len(insts)), min(len(insts), 2)))
+        lines.append(rf"\author[{labels}]{{Author{i} Surname{i}}}")
+    for j, inst in enumerate(insts):
+        lines.append(rf"\address[l{j}]{{organization={{{inst}}},city={{City {j}}}}}")
+    return "\n".join(lines)
+
+def make_acmart(n_authors, rng):
+    """\\author の直後に \\institution 等の構造化タグ入りの \\affiliation が続く形式"""
+    insts = _institutes(n_authors)
+    lines = [r"\documentclass{acmart}"]
+    for i in range(n_authors):
+        lines.append(rf"\author{{Author{i} Surname{i}}}")
+        inst = rng.choice(insts)
+        lines.append(rf"\affiliation{{\institution{{{inst}}}\city{{City {i % 50}}}\country{{Country}}}}")
+    return "\n".join(lines)
+
+def make_sn_jnl(n_authors, rng):
+    """\\author*[1,2]{\\fnm{..} \\sur{..}} と \\affil[1]{\\orgdiv{..}, \\orgname{..}} の ID 方式"""
+    insts = _institutes(n_authors)
+    lines = [r"\documentclass{sn-jnl}"]
+    for i in range(n_authors):
+        ids = ",".join(str(j + 1) for j in rng.sample(range(len(insts)), min(len(insts), 2)))
+        lines.append(rf"\author[{ids}]{{\fnm{{Author{i}}} \sur{{Surname{i}}}}}")
+    for j, inst in enumerate(insts):
+        lines.append(rf"\affil[{j + 1}]{{\orgdiv{{Department {j}}}, \orgname{{{inst}}}}}")
+    return "\n".join(lines)
+
+GENERATORS = {
+    "revtex4-2": make_revtex,
+    "amsart": make_amsart,
+    "elsarticle": make_elsarticle,
+    "acmart": make_acmart,
+    "sn-jnl": make_sn_jnl,
+}
+
+def bench(doc_class, sizes, repeat, seed):
+    extractor = InformationExtractor()
+    print(f"\n[{doc_class}]")
+    print(f"{'authors':>8} | {'size(KB)':>9} | {'time(ms)':>9} | {'us/author':>9} | {'倍率':>6}")
+    prev = None
+    for n in sizes:
+        content = GENERATORS[doc_class](n, random.Random(seed))
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            extractor.extract(doc_class, content)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        ratio = f"{best / prev:.2f}" if prev else "-"
+        print(f"{n:>8} | {len(content) / 1024:>9.0f} | {best * 1000:>9.1f} | {best / n * 1e6:>9.1f} | {ratio:>6}")
+        prev = best
+
+def main():
+    parser = argparse.ArgumentParser(description="抽出器のスケーリング計測")
+    parser.add_argument("--max-authors", type=int, default=6000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--classes", nargs="+", default=list(GENERATORS))
+    args = parser.parse_args()
+
+    sizes = []
+    n = args.max_authors
+    while n >= 250:
+        sizes.insert(0, n)
+        n //= 2
+    for doc_class in args.classes:
+        bench(doc_class, sizes, args.repeat, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+import sys
+
+'''
+build_dataset のスクリプト版
+`pip install -e .` せずにリポジトリ直下から実行する場合の入口
+例: python scripts/build_dataset.py extract --workers 8
+'''
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.cli import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+from setuptools import setup, find_packages
+
+with open("requirements.txt", encoding="utf-8") as f:
+    requirements = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+setup(
+    name="arxiv-author-benchmark",
+    version="0.1.0",
+    description="arXiv の LaTeX ソースから著者・所属の紐付けデータセットを構築する",
+    packages=find_packages(include=["src", "src.*"]),
+    python_requires=">=3.8",
+    install_requires=requirements,
+    entry_points={
+        "console_scripts": [
+            "build_dataset=src.cli:main",
+        ],
+    },
+)
@@ -0,0 +1,398 @@
+import os
+import re
+import json
+import zlib
+import sqlite3
+from collections import Counter
+
+import numpy as np
+from src.normalize import normalize
+from src.utils import META_SCHEMA, get_meta, set_meta, ingest_jsonl
+
+"""
+- 表記揺れのある所属文字列のクラスタリング (MinHash + LSH)
+- "Dept. of Physics, MIT" と "Department of Physics, Massachusetts Institute of Technology" のような
+  同じ部局の別表記を、全組み合わせを比較せずに同じクラスタ ID にまとめる
+"""
+
+# 略語の展開 (比較前にそろえる)
+ABBREVIATIONS = {
+    "dept": "department", "dep": "department", "univ": "university", "inst": "institute",
+    "lab": "laboratory", "labs": "laboratories", "phys": "physics", "natl": "national", "nat": "national",
+    "sci": "science", "sciences": "science", "tech": "technology", "ctr": "center", "centre": "center",
+    "math": "mathematics", "astron": "astronomy", "eng": "engineering", "engg": "engineering",
+    "coll": "college", "fac": "faculty", "grad": "graduate", "sch": "school", "res": "research",
+    "intl": "international", "int": "international",
+}
+STOPWORDS = {"of", "the", "and", "for", "de", "der", "di", "la", "le", "des", "du", "und", "in", "at", "et", "y"}
+# 機関名の区間: これらの語を含み、部局を表す語 (UNIT_WORDS) を含まないもの。
+# 3語以上なら頭字語に置き換え ("Massachusetts Institute of Technology" -> "mit")、
+# 2語以下ならこれらの語を落とす ("University of Tokyo" / "Tokyo University" -> "tokyo")
+INSTITUTION_HEADS = {"university", "universite", "universitat", "universidad", "universita", "universidade",
+                     "institute", "institut", "instituto", "istituto", "college"}
+UNIT_WORDS = {"department", "departement", "departamento", "dipartimento", "school", "faculty", "division",
+              "laboratory", "laboratoire", "center", "group", "graduate"}
+# 大文字だけの区間 ("MIT", "CERN") も機関名とみなす。ただし国名の略号は除く
+_CAPS_ACRONYM = re.compile(r'[A-Z][A-Z&-]{2,7}')
+COUNTRY_CODES = {"usa", "uk", "prc", "uae", "roc"}
+
+# MinHash のハッシュ族 h(x) = ((a·x + b) mod P) の下位 32bit
+_PRIME = (1 << 61) - 1
+_MASK32 = np.uint64(0xFFFFFFFF)
+# 1回の行列計算で扱う (置換数 × シングル数) の上限 (uint64 で 64MB)
+_CHUNK_CELLS = 8 * 1024 * 1024
+
+def _segments(text):
+    """カンマ区切りの区間ごとに (比較用の語のリスト, 機関名かどうか)"""
+    for segment in (text or "").split(","):
+        words = [ABBREVIATIONS.get(w, w) for w in normalize(segment).split()]
+        words = [w for w in words if w not in STOPWORDS and not w.isdigit()]
+        if not words:
+            continue
+        raw = segment.strip()
+        if _CAPS_ACRONYM.fullmatch(raw) and raw.lower() not in COUNTRY_CODES:
+            yield words, True
+        elif INSTITUTION_HEADS & set(words) and not UNIT_WORDS & set(words):
+            if len(words) >= 3:
+                yield ["".join(w[0] for w in words)], True
+            else:
+                yield [w for w in words if w not in INSTITUTION_HEADS] or words, True
+        else:
+            yield words, False
+
+def split_affiliation(text):
+    """
+    【部局と機関への分解】
+    正規化・略語展開・一般語と数字 (郵便番号など) の除去をしたうえで、
+    最後の機関名の区間より前を部局、機関名の区間を機関とし、それより後ろ (市・国などの所在地) は捨てる。
+    機関名の区間がなければ全体を部局側として返す。
+    例: "Dept. of Physics, MIT, Cambridge, MA" -> (["department", "physics"], ["mit"])
+    """
+    segments = list(_segments(text))
+    last = max((i for i, (_, institution) in enumerate(segments) if institution), default=None)
+    if last is None:
+        return [w for words, _ in segments for w in words], []
+    unit = [w for words, institution in segments[:last] if not institution for w in words]
+    org = [w for words, institution in segments[:last + 1] if institution for w in words]
+    return unit, org
+
+def _grams(words, prefix):
+    """各語の前後に境界記号を付けた文字 3-gram (CRC32) のソート済み uint32 配列"""
+    grams = set()
+    for word in words:
+        padded = f"#{word}#"
+        for i in range(max(1, len(padded) - 2)):
+            grams.add(zlib.crc32(f"{prefix}{padded[i:i + 3]}".encode('utf-8')))
+    return np.array(sorted(grams), dtype=np.uint32)
+
+def shingles(text):
+    """(部局のシングル, 機関のシングル)。両者は接頭辞を変えてハッシュするので重ならない"""
+    unit, org = split_affiliation(text)
+    return _grams(unit, "u|"), _grams(org, "i|")
+
+def _lsh_input(grams):
+    """
+    MinHash に掛けるシングル: 機関名があれば機関のシングルだけ、なければ部局のシングル。
+    機関の一致は必須条件なので候補は同じ機関のリーダーに絞られ、
+    "Department of Mathematics" のような部局名だけを共有するリーダーが同じバケツに溜まらない
+    """
+    unit, org = grams
+    return org if len(org) else unit
+
+def _jaccard(a, b):
+    """ソート済み配列どうしの (共通数, Jaccard 係数)。両方空なら係数 1"""
+    if not len(a) and not len(b):
+        return 0, 1.0
+    common = len(np.intersect1d(a, b, assume_unique=True))
+    return common, common / (len(a) + len(b) - common)
+
+class MinHasher:
+    """
+    【MinHash 署名】
+    num_perm 個のハッシュ関数それぞれについてシングル集合の最小値を取る。
+    2つの署名で値が一致する割合は、元の集合の Jaccard 係数の推定値になる。
+    """
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        # a·x < 2^63 (x は 32bit) に収めて uint64 で桁あふれさせない
+        self.a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)[:, None]
+        self.b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)[:, None]
+
+    def signatures(self, shingle_arrays):
+        """シングル配列のリスト -> 署名行列 (len × num_perm, uint32)。空集合の行はすべて 0xFFFFFFFF"""
+        sigs = np.full((len(shingle_arrays), self.num_perm), 0xFFFFFFFF, dtype=np.uint32)
+        rows = [i for i, s in enumerate(shingle_arrays) if len(s)]
+        limit = max(1, _CHUNK_CELLS // self.num_perm)
+        start = 0
+        while start < len(rows):
+            # シングル数の合計が limit を超えない範囲をまとめて1回の行列計算にする
+            end, total = start, 0
+            while end < len(rows) and (end == start or total + len(shingle_arrays[rows[end]]) <= limit):
+                total += len(shingle_arrays[rows[end]])
+                end += 1
+            chunk = rows[start:end]
+            lengths = np.array([len(shingle_arrays[i]) for i in chunk])
+            x = np.concatenate([shingle_arrays[i] for i in chunk]).astype(np.uint64)
+            values = ((self.a * x + self.b) % np.uint64(_PRIME)) & _MASK32
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            sigs[chunk] = np.minimum.reduceat(values, offsets, axis=1).T.astype(np.uint32)
+            start = end
+        return sigs
+
+class AffiliationClusters:
+    """
+    【所属クラスタの索引 (SQLite)】
+    affiliations: 所属文字列ごとのクラスタ ID (= そのクラスタを作った所属 (リーダー) の ID)
+    buckets: LSH のバンドのハッシュ -> そのバンドを持つリーダー
+    新しい所属は、バンドを共有するリーダー (候補) と部局・機関それぞれのシングルの Jaccard 係数を正確に計算し、
+    両方が threshold 以上の候補のうち全体の係数が最も高いリーダーのクラスタに入る。
+    該当がなければ自分がリーダーになり、バケツに登録される。
+    部局と機関を別々に判定するのは、1つの係数だと長い機関名が部局の違いを (短い機関名なら部局名が機関の違いを)
+    打ち消してしまうため。署名による推定値は候補が多いと誤って閾値を超えるものが出るので、判定には使わない。
+    メンバーは必ずリーダーと似ているので、似た所属が鎖状につながって巨大なクラスタになることはなく、
+    一度付いたクラスタ ID は後から所属を追加しても変わらない。
+    """
+
+    def __init__(self, path, num_perm=64, bands=16, threshold=0.6, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS affiliations ("
+            " affiliation_id INTEGER PRIMARY KEY,"
+            " text TEXT NOT NULL UNIQUE,"
+            " cluster_id INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_affiliations_cluster ON affiliations (cluster_id);"
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " key INTEGER NOT NULL,"
+            " leader_id INTEGER NOT NULL,"
+            " PRIMARY KEY (key, leader_id)) WITHOUT ROWID;"
+            + META_SCHEMA
+        )
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        rng = np.random.RandomState(seed + 1)
+        self._band_mult = rng.randint(1, 1 << 62, size=self.rows).astype(np.uint64) | np.uint64(1)
+        # バンド番号もハッシュに混ぜ、(バンド, ハッシュ) を1つの整数キーにする
+        self._band_salt = rng.randint(0, 1 << 62, size=bands).astype(np.uint64)
+
+        # パラメータが変わるとバケツに互換性がないので作り直す
+        params = json.dumps({"num_perm": num_perm, "bands": bands, "seed": seed})
+        if get_meta(self.conn, "params") not in (None, params):
+            print("cluster: MinHash のパラメータが変わったため、索引を作り直します")
+            self.conn.executescript("DELETE FROM buckets; DELETE FROM affiliations; DELETE FROM meta;")
+        set_meta(self.conn, "params", params)
+        self._known = None
+        # 今回の実行で作ったリーダーはメモリ上で引く (SQLite に問い合わせるのは前回までのリーダーだけ)
+        self._run_buckets = {}
+        # リーダー ID -> (部局, 機関) のシングル (前回までのリーダーも、一度引いたらここに置く)
+        self._leader_grams = {}
+        self._has_stored_leaders = self.conn.execute("SELECT 1 FROM buckets LIMIT 1").fetchone() is not None
+
+    def _band_keys(self, sigs):
+        """署名行列 -> (len × bands) のバンドのキー (int64。uint64 の桁あふれはハッシュとして許容)"""
+        banded = sigs.astype(np.uint64).reshape(len(sigs), self.bands, self.rows)
+        return ((banded * self._band_mult).sum(axis=2) + self._band_salt).view(np.int64)
+
+    def _stored_leaders(self, keys):
+        """
+        バッチ内の各行について、バンドを共有する前回までのリーダーを
+        {行番号: {リーダーID, ...}} で返す (一時テーブルとの結合で1回で引く)
+        """
+        if not self._has_stored_leaders:
+            return {}
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS probe (key INTEGER, idx INTEGER)")
+        self.conn.execute("DELETE FROM probe")
+        self.conn.executemany(
+            "INSERT INTO probe (key, idx) VALUES (?, ?)",
+            ((int(k), i) for i in range(len(keys)) for k in keys[i]),
+        )
+        leaders = {}
+        for idx, leader_id, text in self.conn.execute(
+            "SELECT p.idx, b.leader_id, a.text FROM probe p"
+            " JOIN buckets b ON b.key = p.key"
+            " JOIN affiliations a ON a.affiliation_id = b.leader_id"
+        ):
+            leaders.setdefault(idx, set()).add(leader_id)
+            if leader_id not in self._leader_grams:
+                self._leader_grams[leader_id] = shingles(text)
+        return leaders
+
+    def _nearest(self, grams, keys, stored):
+        """(部局, 機関) のシングルに最も近いリーダーの ID。条件を満たす候補がなければ None"""
+        candidates = set(stored)
+        for key in keys.tolist():
+            candidates.update(self._run_buckets.get(key, ()))
+        unit, org = grams
+        best, best_score = None, 0.0
+        for leader_id in candidates:
+            leader_unit, leader_org = self._leader_grams[leader_id]
+            # 機関名が片方にしかない (機関単位の所属と所在地だけの所属など) 組は別物とする
+            if bool(len(org)) != bool(len(leader_org)):
+                continue
+            common_org, score_org = _jaccard(org, leader_org)
+            common_unit, score_unit = _jaccard(unit, leader_unit)
+            if score_org < self.threshold or score_unit < self.threshold:
+                continue
+            common = common_org + common_unit
+            score = common / (len(unit) + len(org) + len(leader_unit) + len(leader_org) - common)
+            if score > best_score:
+                best, best_score = leader_id, score
+        return best
+
+    def _new_texts(self, texts):
+        """未登録の所属文字列 (重複を除き、出現順)"""
+        if self._known is None:
+            self._known = {t for (t,) in self.conn.execute("SELECT text FROM affiliations")}
+        return [t for t in dict.fromkeys(texts) if t not in self._known]
+
+    def add(self, texts, batch_size=10000):
+        """
+        【所属の追加】
+        未登録の所属文字列を batch_size 件ずつ署名し、リーダーと比べてクラスタに入れる。
+        戻り値: 追加した件数
+        """
+        new = self._new_texts(texts)
+        for start in range(0, len(new), batch_size):
+            self.conn.execute("BEGIN")
+            self._add_batch(new[start:start + batch_size])
+            self.conn.execute("COMMIT")
+        return len(new)
+
+    def _add_batch(self, texts):
+        grams = [shingles(t) for t in texts]
+        keys = self._band_keys(self.hasher.signatures([_lsh_input(g) for g in grams]))
+        stored = self._stored_leaders(keys)
+        next_id = (self.conn.execute("SELECT MAX(affiliation_id) FROM affiliations").fetchone()[0] or 0) + 1
+
+        clusters = []
+        new_buckets = []
+        for i in range(len(texts)):
+            own = next_id + i
+            # 語が1つも残らない所属 (記号だけ等) はどれとも比べず単独のクラスタにする
+            if not (len(grams[i][0]) or len(grams[i][1])):
+                clusters.append(own)
+                continue
+            leader = self._nearest(grams[i], keys[i], stored.get(i, ()))
+            if leader is None:
+                leader = own
+                self._leader_grams[own] = grams[i]
+                for key in keys[i].tolist():
+                    self._run_buckets.setdefault(key, []).append(own)
+                    new_buckets.append((key, own))
+            clusters.append(leader)
+
+        self.conn.executemany(
+            "INSERT INTO affiliations (affiliation_id, text, cluster_id) VALUES (?, ?, ?)",
+            ((next_id + i, t, clusters[i]) for i, t in enumerate(texts)),
+        )
+        self.conn.executemany("INSERT OR IGNORE INTO buckets (key, leader_id) VALUES (?, ?)", new_buckets)
+        self._known.update(texts)
+
+    def update(self, results_path, batch_size=10000):
+        """
+        【差分取り込み】
+        結果ファイルの追記分を batch_size 論文ずつ読み、新しく現れた所属を同じトランザクションでクラスタに入れる。
+        ファイルが作り直されていたら先頭から読み直すが、登録済みの所属とクラスタはそのまま使う。
+        戻り値: 追加した所属の件数
+        """
+        if not os.path.exists(results_path):
+            print(f"Error: {results_path} が見つかりません。")
+            return 0
+        added = 0
+
+        def handle_batch(rows):
+            nonlocal added
+            new = self._new_texts(
+                affil for data in rows for author in data.get("authors", []) for affil in author.get("affiliations", [])
+            )
+            for start in range(0, len(new), batch_size):
+                self._add_batch(new[start:start + batch_size])
+            added += len(new)
+
+        ingest_jsonl(self.conn, results_path, "results", handle_batch, batch_size)
+        return added
+
+    def cluster_of(self, text):
+        """所属文字列のクラスタ ID。未登録なら登録はせず、最も近いリーダーのクラスタ (なければ None) を返す"""
+        row = self.conn.execute("SELECT cluster_id FROM affiliations WHERE text = ?", (text,)).fetchone()
+        if row:
+            return row[0]
+        grams = shingles(text)
+        keys = self._band_keys(self.hasher.signatures([_lsh_input(grams)]))
+        self._has_stored_leaders = True
+        return self._nearest(grams, keys[0], self._stored_leaders(keys).get(0, ()))
+
+    def members(self, cluster_id, limit=50):
+        return [t for (t,) in self.conn.execute(
+            "SELECT text FROM affiliations WHERE cluster_id = ? ORDER BY affiliation_id LIMIT ?", (cluster_id, limit)
+        )]
+
+    def write(self, output_path):
+        """所属ごとに {"affiliation", "cluster_id", "cluster_size"} を1行ずつ書き出す"""
+        sizes = dict(self.conn.execute("SELECT cluster_id, COUNT(*) FROM affiliations GROUP BY cluster_id"))
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for text, cluster_id in self.conn.execute(
+                "SELECT text, cluster_id FROM affiliations ORDER BY cluster_id, affiliation_id"
+            ):
+                row = {"affiliation": text, "cluster_id": cluster_id, "cluster_size": sizes[cluster_id]}
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return sizes
+
+    def annotate(self, results_path, output_path):
+        """
+        結果ファイルの各著者に、affiliations と同じ並びのクラスタ ID のリスト
+        ("affiliation_cluster_ids") を付けて書き出す。未登録の所属は None。戻り値: 書き出した行数
+        """
+        cluster_ids = dict(self.conn.execute("SELECT text, cluster_id FROM affiliations"))
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        written = 0
+        with open(results_path, 'rb') as src, open(output_path, 'w', encoding='utf-8') as dst:
+            for line in src:
+                if not line.endswith(b"\n"):
+                    break
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                for author in data.get("authors", []):
+                    author["affiliation_cluster_ids"] = [cluster_ids.get(a) for a in author.get("affiliations", [])]
+                dst.write(json.dumps(data, ensure_ascii=False) + "\n")
+                written += 1
+        return written
+
+    def stats(self):
+        affiliations = self.conn.execute("SELECT COUNT(*) FROM affiliations").fetchone()[0]
+        clusters = self.conn.execute("SELECT COUNT(DISTINCT cluster_id) FROM affiliations").fetchone()[0]
+        return {"affiliations": affiliations, "clusters": clusters}
+
+    def close(self):
+        self.conn.close()
+
+def cluster_results(results_path, db_path, output_path, annotated_path=None, num_perm=64, bands=16, threshold=0.6,
+                    batch_size=10000):
+    """
+    【抽出結果の所属をクラスタリング】
+    結果ファイルの新しい所属を索引に加え、全所属のクラスタ ID を output_path に書き出す。
+    annotated_path を渡すと、結果ファイルの各著者に所属ごとのクラスタ ID を付けたものもそこに書き出す。
+    戻り値: (追加した所属の件数, クラスタ数)
+    """
+    index = AffiliationClusters(db_path, num_perm=num_perm, bands=bands, threshold=threshold)
+    added = index.update(results_path, batch_size)
+    sizes = index.write(output_path)
+    if annotated_path:
+        written = index.annotate(results_path, annotated_path)
+        print(f"cluster: クラスタ ID 付きの結果 {written} 行 -> {annotated_path}")
+    stats = index.stats()
+    index.close()
+    print(f"cluster: {added} 件の所属を追加 / 所属 {stats['affiliations']} 件 -> {stats['clusters']} クラスタ -> {output_path}")
+    for cluster_id, size in Counter(sizes).most_common(5):
+        if size > 1:
+            print(f"  クラスタ {cluster_id}: {size} 件")
+    return added, stats["clusters"]
@@ -0,0 +1,99 @@
+import os
+import xml.etree.ElementTree as ET
+from urllib.parse import urlencode, urlsplit
+from src.http_cache import HttpCache
+
+"""
+- arXiv API (Atom フィード) とソース tarball の最小クライアント
+- 通信はすべて HttpCache を通すので、記録・再生・代役サーバーへの切り替えが透過的に効く
+"""
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+class Paper:
+    """検索結果1件。収集ステージが使う属性だけを持つ"""
+
+    def __init__(self, entry_id, title, client):
+        self.entry_id = entry_id
+        self.title = title
+        self._client = client
+
+    def get_short_id(self):
+        """例: http://arxiv.org/abs/2401.00001v2 -> 2401.00001v2"""
+        return self.entry_id.split("/abs/")[-1]
+
+    def download_source(self, dirpath, filename):
+        path = os.path.join(dirpath, filename)
+        body = self._client.get_source(self.get_short_id())
+        with open(path, 'wb') as f:
+            f.write(body)
+        return path
+
+class ArxivClient:
+    """
+    【arXiv クライアント】
+    api_base / source_base を代役サーバー (src.http_cache.serve) に向けると、記録済みの応答で動く。
+    """
+
+    def __init__(self, cache=None, api_base="https://export.arxiv.org", source_base="https://export.arxiv.org",
+                 page_size=100):
+        self.cache = cache or HttpCache(None, mode="passthrough")
+        self.api_base = api_base.rstrip("/")
+        self.source_base = source_base.rstrip("/")
+        self.page_size = page_size
+
+    def _query(self, params):
+        body = self.cache.get(f"{self.api_base}/api/query?{urlencode(params)}")
+        papers = []
+        for entry in ET.fromstring(body).iter(f"{ATOM}entry"):
+            entry_id = (entry.findtext(f"{ATOM}id") or "").strip()
+            # 該当なしやクエリ誤りのときは /api/errors#... の entry が返る
+            if "/abs/" not in entry_id:
+                continue
+            title = " ".join((entry.findtext(f"{ATOM}title") or "").split())
+            papers.append(Paper(entry_id, title, self))
+        return papers
+
+    def search(self, query, max_results=10, sort_by="submittedDate", sort_order="descending"):
+        """search_query で検索し、最大 max_results 件を返す (page_size 件ずつ取得)"""
+        papers = []
+        while len(papers) < max_results:
+            page = self._query({
+                "search_query": query,
+                "start": len(papers),
+                "max_results": min(self.page_size, max_results - len(papers)),
+                "sortBy": sort_by,
+                "sortOrder": sort_order,
+            })
+            papers.extend(page)
+            if len(page) < self.page_size:
+                break
+        return papers[:max_results]
+
+    def get_paper(self, arxiv_id):
+        """ID 1件のメタデータ。見つからなければ None"""
+        papers = self._query({"id_list": arxiv_id, "max_results": 1})
+        return papers[0] if papers else None
+
+    def get_source(self, short_id):
+        """ソース tarball。版付き ID の中身は変わらないので TTL による再検証はしない"""
+        return self.cache.get(f"{self.source_base}/e-print/{short_id}", ttl_s=0)
+
+def is_arxiv(url):
+    """url が本物の arXiv (利用規約の間隔を守る相手) を指すか。代役サーバーなら False"""
+    host = urlsplit(url).hostname or ""
+    return host == "arxiv.org" or host.endswith(".arxiv.org")
+
+def make_client(config):
+    """
+    config の harvest セクションと paths.http_cache からクライアントを作る。
+    api_base が代役サーバーを指すときは request_delay_s を無視して待たない
+    """
+    opts = config["harvest"]
+    cache = HttpCache(
+        config["paths"]["http_cache"],
+        mode=opts["cache_mode"],
+        ttl_s=opts["cache_ttl_s"],
+        delay_seconds=opts["request_delay_s"] if is_arxiv(opts["api_base"]) else 0.0,
+    )
+    return ArxivClient(cache, api_base=opts["api_base"], source_base=opts["source_base"])
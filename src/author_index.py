@@ -0,0 +1,164 @@
+import os
+import json
+import sqlite3
+from collections import Counter
+from src.normalize import normalize, split_name, soundex
+from src.utils import META_SCHEMA, jsonl_rewritten, ingest_jsonl
+
+"""
+- 論文をまたいだ著者リンキング用の索引 (ブロッキングキーの転置リスト, SQLite)
+- 全著者同士を比較する代わりに、キーを共有するレコードだけを候補として返す
+"""
+
+# 所属トークンのうちブロッキングに使わない一般語
+AFFILIATION_STOPWORDS = {
+    "of", "the", "and", "for", "de", "der", "di", "la", "le", "des", "du", "und", "in", "at",
+    "university", "universite", "universitat", "universidad", "universita", "univ",
+    "department", "dept", "institute", "inst", "school", "faculty", "college",
+    "laboratory", "lab", "center", "centre", "division", "research", "national",
+}
+
+def affiliation_tokens(affiliations):
+    """所属リストから、一般語と短すぎる語を除いたトークン集合を作る"""
+    tokens = set()
+    for affil in affiliations or []:
+        for t in normalize(affil).split():
+            if len(t) > 2 and t not in AFFILIATION_STOPWORDS and not t.isdigit():
+                tokens.add(t)
+    return tokens
+
+def blocking_keys(author):
+    """
+    【ブロッキングキー】
+    author は抽出結果と同じ {"name": ..., "affiliations": [...]} 形式。
+    - "n:<姓>:<名の頭文字>"  正規化した姓 + 頭文字
+    - "p:<Soundex>:<名の頭文字>"  表記揺れ (Muller / Mueller 等) 用の音韻キー
+    - "a:<Soundex>:<所属トークン>"  同じ音韻の姓を持ち、所属の語を共有する人
+      (所属トークン単独だと "physics" のような巨大ブロックになるため姓の音韻で絞る)
+    """
+    surname, initial = split_name(author.get("name"))
+    if not surname:
+        return []
+    phonetic = soundex(surname) or surname
+    keys = [f"n:{surname}:{initial}", f"p:{phonetic}:{initial}"]
+    keys.extend(f"a:{phonetic}:{t}" for t in sorted(affiliation_tokens(author.get("affiliations"))))
+    return keys
+
+class AuthorIndex:
+    """
+    【著者索引】
+    records: 著者1人 = 1レコード (arxiv_id, 論文内の順番, name, affiliations)
+    postings: ブロッキングキー -> レコードID
+    meta: 結果ファイルをどこまで取り込んだか (バイト位置)。追記分だけを差分で取り込む。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " record_id INTEGER PRIMARY KEY,"
+            " arxiv_id TEXT NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " name TEXT NOT NULL,"
+            " affiliations TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_records_arxiv ON records (arxiv_id);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " key TEXT NOT NULL,"
+            " record_id INTEGER NOT NULL,"
+            " PRIMARY KEY (key, record_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS idx_postings_record ON postings (record_id);"
+            + META_SCHEMA
+        )
+
+    def _remove_paper(self, arxiv_id):
+        """再抽出で同じ論文が再び追記された場合は、古いレコードを差し替える"""
+        ids = [r[0] for r in self.conn.execute("SELECT record_id FROM records WHERE arxiv_id = ?", (arxiv_id,))]
+        if ids:
+            self.conn.executemany("DELETE FROM postings WHERE record_id = ?", [(i,) for i in ids])
+            self.conn.execute("DELETE FROM records WHERE arxiv_id = ?", (arxiv_id,))
+
+    def add_paper(self, data):
+        """結果ファイルの1行分 ({"arxiv_id", "authors": [...]}) を索引に加える"""
+        aid = data["arxiv_id"]
+        self._remove_paper(aid)
+        for position, author in enumerate(data.get("authors", [])):
+            cur = self.conn.execute(
+                "INSERT INTO records (arxiv_id, position, name, affiliations) VALUES (?, ?, ?, ?)",
+                (aid, position, author["name"], json.dumps(author.get("affiliations", []), ensure_ascii=False)),
+            )
+            record_id = cur.lastrowid
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO postings (key, record_id) VALUES (?, ?)",
+                [(key, record_id) for key in blocking_keys(author)],
+            )
+
+    def update(self, results_path, batch_size=1000):
+        """
+        【差分取り込み】
+        前回取り込んだ位置から結果ファイルの末尾までを読み、batch_size 論文ごとにコミットする。
+        ファイルが作り直されていたら (前回より短い、または別のファイル) 全件を取り込み直す。
+        戻り値: 取り込んだ論文数
+        """
+        if not os.path.exists(results_path):
+            print(f"Error: {results_path} が見つかりません。")
+            return 0
+
+        if jsonl_rewritten(self.conn, results_path, "results"):
+            self.conn.executescript("DELETE FROM postings; DELETE FROM records;")
+
+        def handle_batch(rows):
+            for data in rows:
+                self.add_paper(data)
+        return ingest_jsonl(self.conn, results_path, "results", handle_batch, batch_size)
+
+    def candidates(self, author, limit=50, exclude_arxiv_id=None):
+        """
+        【候補検索】
+        author ({"name", "affiliations"}) とブロッキングキーを共有するレコードを、
+        共有キー数の多い順に返す。名前系キー (n: / p:) を1つも共有しない候補は除外する。
+        """
+        keys = blocking_keys(author)
+        if not keys:
+            return []
+        placeholders = ",".join("?" * len(keys))
+        rows = self.conn.execute(
+            f"SELECT key, record_id FROM postings WHERE key IN ({placeholders})", keys
+        ).fetchall()
+
+        shared = Counter()
+        name_hit = set()
+        for key, record_id in rows:
+            shared[record_id] += 1
+            if key[0] in "np":
+                name_hit.add(record_id)
+
+        ranked = sorted((r for r in shared if r in name_hit), key=lambda r: (-shared[r], r))
+        results = []
+        for record_id in ranked:
+            row = self.conn.execute(
+                "SELECT arxiv_id, position, name, affiliations FROM records WHERE record_id = ?", (record_id,)
+            ).fetchone()
+            if exclude_arxiv_id and row[0] == exclude_arxiv_id:
+                continue
+            results.append({
+                "record_id": record_id,
+                "arxiv_id": row[0],
+                "position": row[1],
+                "name": row[2],
+                "affiliations": json.loads(row[3]),
+                "shared_keys": shared[record_id],
+            })
+            if len(results) >= limit:
+                break
+        return results
+
+    def stats(self):
+        records = self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        postings = self.conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0]
+        keys = self.conn.execute("SELECT COUNT(DISTINCT key) FROM postings").fetchone()[0]
+        return {"records": records, "postings": postings, "keys": keys}
+
+    def close(self):
+        self.conn.close()
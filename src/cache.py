@@ -0,0 +1,65 @@
+import sys
+from collections import OrderedDict
+
+"""
+- 抽出処理で使うメモ化キャッシュ (上限付き LRU)
+- ヒット率・追い出し数・概算メモリ量を run profile へ出すための集計
+"""
+
+class LRUCache:
+    """
+    【上限付き LRU キャッシュ】
+    maxsize 件を超えると最も古く使われたエントリから追い出す。
+    hits / misses / evictions と、キー・値の概算バイト数 (nbytes) を数える。
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = int(maxsize)
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+
+    def get_or_compute(self, key, func):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            value = func(key)
+            self._data[key] = value
+            self.nbytes += sys.getsizeof(key) + sys.getsizeof(value)
+            if len(self._data) > self.maxsize:
+                old_key, old_value = self._data.popitem(last=False)
+                self.nbytes -= sys.getsizeof(old_key) + sys.getsizeof(old_value)
+                self.evictions += 1
+            return value
+        self.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "nbytes": self.nbytes,
+        }
+
+def merge_cache_stats(stats_list):
+    """
+    複数ワーカーの stats() を名前ごとに合算し、hit_rate を付けて返す。
+    stats_list の各要素は {キャッシュ名: stats()} の辞書。
+    """
+    merged = {}
+    for stats in stats_list:
+        for name, s in (stats or {}).items():
+            total = merged.setdefault(name, {"hits": 0, "misses": 0, "evictions": 0, "size": 0, "maxsize": 0, "nbytes": 0})
+            for key in total:
+                total[key] += s.get(key, 0)
+    for total in merged.values():
+        lookups = total["hits"] + total["misses"]
+        total["hit_rate"] = round(total["hits"] / lookups, 4) if lookups else 0.0
+    return merged
@@ -0,0 +1,240 @@
+import os
+import argparse
+
+"""
+build_dataset のエントリポイント
+サブコマンド: harvest / extract / census / review / export / query / evaluate / index / registry / cluster / arxiv-server
+
+重い依存 (selenium, fitz, cv2) はここでは import しない。
+各サブコマンドの中で必要なモジュールだけを読み込むので、
+`build_dataset extract --help` や抽出ワーカーの起動は即座に終わる。
+"""
+
+def cmd_harvest(config, args):
+    from src.collector import harvest
+    from src.arxiv_client import is_arxiv, make_client
+
+    opts = config["harvest"]
+    if args.cache_mode:
+        opts["cache_mode"] = args.cache_mode
+    if args.api_base:
+        opts["api_base"] = opts["source_base"] = args.api_base
+    harvest(
+        raw_dir=config["paths"]["raw_dir"],
+        categories=args.categories or opts["categories"],
+        max_results=opts["max_results"],
+        # 代役サーバー相手なら負荷軽減の待機は要らない
+        sleep_seconds=opts["sleep_seconds"] if is_arxiv(opts["api_base"]) else 0,
+        client=make_client(config),
+    )
+
+def cmd_extract(config, args):
+    from src.processor import run_pipeline
+
+    if args.workers is not None:
+        config["extract"]["workers"] = args.workers
+    if args.time_budget is not None:
+        config["extract"]["time_budget_s"] = args.time_budget
+    if args.memory_budget is not None:
+        config["extract"]["memory_budget_mb"] = args.memory_budget
+    if args.schedule is not None:
+        config["extract"]["schedule"] = args.schedule
+    run_pipeline(config)
+
+def cmd_census(config, args):
+    from src.others.class_collector import analyze_classes_recursive
+
+    analyze_classes_recursive(config["paths"]["raw_dir"])
+
+def cmd_review(config, args):
+    from src.renderer import render_with_selenium
+
+    start_id = args.start_id or config["review"]["start_id"]
+    render_with_selenium(config["paths"]["results"], config["paths"]["raw_dir"], start_id)
+
+def cmd_export(config, args):
+    from src.exporter import export_jsonl, export_sqlite
+
+    paths = config["paths"]
+    if args.format == "sqlite":
+        export_sqlite(paths["results"], paths["log"], args.output or paths["export_db"])
+    else:
+        export_jsonl(paths["results"], paths["manifest"], args.output or paths["export"])
+
+def cmd_query(config, args):
+    import time
+    from src.exporter import query_dataset
+
+    db_path = config["paths"]["export_db"]
+    if not os.path.exists(db_path):
+        print(f"Error: {db_path} がありません。先に export --format sqlite を実行してください。")
+        return
+    t0 = time.perf_counter()
+    rows = query_dataset(db_path, affiliation=args.affiliation, name=args.name,
+                         doc_class=args.doc_class, status=args.status, limit=args.limit)
+    elapsed = (time.perf_counter() - t0) * 1000
+    print(f"{len(rows)} 件 ({elapsed:.1f} ms)")
+    for r in rows:
+        print(f"  {r['arxiv_id']} [{r['doc_class']}/{r['status']}] {r['name']} | {r['affiliation'] or ''}")
+
+def cmd_evaluate(config, args):
+    from src.evaluator import evaluate, print_report, save_report
+
+    paths = config["paths"]
+    opts = config["evaluate"]
+    report = evaluate(
+        paths["results"],
+        args.gold or paths["gold"],
+        name_threshold=opts["name_threshold"],
+        affiliation_threshold=opts["affiliation_threshold"],
+        max_chars=opts["max_chars"],
+        batch_size=opts["batch_size"],
+        worst_cases=opts["worst_cases"],
+    )
+    print_report(report)
+    save_report(paths["eval_report"], report)
+
+def cmd_index(config, args):
+    import time
+    from src.author_index import AuthorIndex
+
+    index = AuthorIndex(config["paths"]["author_index"])
+    added = index.update(config["paths"]["results"])
+    print(f"索引更新: {added} 論文を追加 / {index.stats()}")
+
+    if args.query:
+        author = {"name": args.query, "affiliations": args.affiliation or []}
+        t0 = time.perf_counter()
+        found = index.candidates(author, limit=args.limit)
+        elapsed = (time.perf_counter() - t0) * 1000
+        print(f"\n候補 {len(found)} 件 ({elapsed:.1f} ms)")
+        for c in found:
+            print(f"  [{c['shared_keys']}] {c['arxiv_id']} #{c['position']} {c['name']} | {'; '.join(c['affiliations'])}")
+    index.close()
+
+def cmd_registry(config, args):
+    from src.registry import build_index, match_results
+
+    paths = config["paths"]
+    opts = config["registry"]
+    if args.action == "build":
+        build_index(args.dump or paths["registry_dump"], paths["registry_index"])
+    else:
+        match_results(
+            paths["results"],
+            paths["registry_index"],
+            args.output or paths["affiliation_matches"],
+            min_score=opts["min_score"],
+            max_postings=opts["max_postings"],
+            workers=args.workers or opts["workers"],
+        )
+
+def cmd_cluster(config, args):
+    from src.affiliation_clusters import AffiliationClusters, cluster_results
+
+    paths = config["paths"]
+    opts = config["cluster"]
+    params = {"num_perm": opts["num_perm"], "bands": opts["bands"], "threshold": opts["threshold"]}
+    if args.show:
+        index = AffiliationClusters(paths["cluster_index"], **params)
+        cluster_id = index.cluster_of(args.show)
+        if cluster_id is None:
+            print("該当するクラスタはありません")
+        else:
+            members = index.members(cluster_id, limit=args.limit)
+            print(f"クラスタ {cluster_id} ({len(members)} 件表示)")
+            for text in members:
+                print(f"  {text}")
+        index.close()
+        return
+    cluster_results(paths["results"], paths["cluster_index"], args.output or paths["affiliation_clusters"],
+                    annotated_path=paths["clustered_results"], batch_size=opts["batch_size"], **params)
+
+def cmd_arxiv_server(config, args):
+    from src.http_cache import serve
+
+    serve(config["paths"]["http_cache"], host=args.host, port=args.port)
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="build_dataset",
+        description="arXiv 著者・所属リンキングデータセットの構築",
+    )
+    parser.add_argument("--config", default=None, help="設定ファイル (既定: configs/base_config.yaml)")
+    parser.add_argument("--base-dir", default=None, help="paths.base_dir を上書きする")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("harvest", help="arXiv からソースを収集・展開する")
+    p.add_argument("--categories", nargs="+", default=None, help="対象カテゴリ (既定: config)")
+    p.add_argument("--cache-mode", choices=["record", "replay", "passthrough"], default=None,
+                   help="arXiv 応答の記録・再生 (既定: config)")
+    p.add_argument("--api-base", default=None, help="API / ソースの取得先 (代役サーバーの URL など)")
+    p.set_defaults(func=cmd_harvest)
+
+    p = sub.add_parser("extract", help="展開済みソースから著者・所属を抽出する")
+    p.add_argument("--workers", type=int, default=None, help="並列ワーカー数 (既定: config)")
+    p.add_argument("--time-budget", type=float, default=None, help="1論文あたりの制限秒数 (0 で無制限)")
+    p.add_argument("--memory-budget", type=float, default=None, help="1論文あたりのメモリ上限 MB (0 で無制限)")
+    p.add_argument("--schedule", choices=["cost", "listdir"], default=None, help="論文を配る順番 (既定: config)")
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser("census", help="ドキュメントクラスの分布を集計する")
+    p.set_defaults(func=cmd_census)
+
+    p = sub.add_parser("review", help="抽出結果を PDF / ソースと並べて検品する")
+    p.add_argument("--start-id", default=None, help="このID以降のみ検品する")
+    p.set_defaults(func=cmd_review)
+
+    p = sub.add_parser("export", help="配布用データセットを書き出す")
+    p.add_argument("--format", choices=["jsonl", "sqlite"], default="jsonl",
+                   help="jsonl: 配布用 JSONL / sqlite: 検索用 SQLite (差分追記)")
+    p.add_argument("--output", default=None, help="出力先 (既定: paths.export / paths.export_db)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("query", help="SQLite 版データセットを著者名・所属・クラスで検索する")
+    p.add_argument("--affiliation", default=None, help="所属の全文検索 (全語を含むもの)")
+    p.add_argument("--name", default=None, help="著者名の全文検索")
+    p.add_argument("--class", dest="doc_class", default=None, help="ドキュメントクラス (GLOB 可: 'revtex*')")
+    p.add_argument("--status", default=None, help="実行ログの status (SUCCESS / SKIPPED など)")
+    p.add_argument("--limit", type=int, default=50)
+    p.set_defaults(func=cmd_query)
+
+    p = sub.add_parser("evaluate", help="正解アノテーションと比較して P/R/F1 を出す")
+    p.add_argument("--gold", default=None, help="正解ファイル (既定: paths.gold)")
+    p.set_defaults(func=cmd_evaluate)
+
+    p = sub.add_parser("index", help="著者リンキング用の索引を差分更新し、候補を検索する")
+    p.add_argument("--query", default=None, help="候補を探す著者名")
+    p.add_argument("--affiliation", nargs="+", default=None, help="その著者の所属")
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(func=cmd_index)
+
+    p = sub.add_parser("registry", help="研究機関レジストリの索引を作り、所属を機関IDに対応づける")
+    p.add_argument("action", choices=["build", "match"], help="build: 索引の作成 / match: 抽出結果の所属を照合")
+    p.add_argument("--dump", default=None, help="ROR データダンプ (既定: paths.registry_dump)")
+    p.add_argument("--output", default=None, help="照合結果の出力先 (既定: paths.affiliation_matches)")
+    p.add_argument("--workers", type=int, default=None, help="照合の並列数 (既定: config)")
+    p.set_defaults(func=cmd_registry)
+
+    p = sub.add_parser("cluster", help="表記揺れのある所属をクラスタにまとめる (差分追加)")
+    p.add_argument("--output", default=None, help="所属ごとのクラスタ ID の出力先 (既定: paths.affiliation_clusters)")
+    p.add_argument("--show", default=None, help="この所属文字列が入るクラスタのメンバーを表示する")
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(func=cmd_cluster)
+
+    p = sub.add_parser("arxiv-server", help="記録済みの arXiv 応答を返す代役サーバーを起動する")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.set_defaults(func=cmd_arxiv_server)
+
+    return parser
+
+def main(argv=None):
+    from src.config import load_config
+
+    args = build_parser().parse_args(argv)
+    config = load_config(args.config, base_dir=args.base_dir)
+    args.func(config, args)
+
+if __name__ == "__main__":
+    main()
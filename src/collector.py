@@ -1,43 +1,46 @@
-import arxiv
 import os
 import tarfile
 import time
 from pathlib import Path
 import json
+from src.http_cache import CacheMiss
 
-# 共通の設定
+# 共通の設定 (build_dataset から呼ばれる場合は config の paths.raw_dir で上書きされる)
 DATA_RAW_DIR = Path("data/raw")
 
-def get_paper_metadata(arxiv_id):
+def get_paper_metadata(arxiv_id, client=None):
     """
     arXiv IDから論文のメタデータを取得する
+    client を省略すると、キャッシュなしで arXiv に直接問い合わせる
     """
-    client = arxiv.Client()
-    search = arxiv.Search(id_list=[arxiv_id])
+    from src.arxiv_client import ArxivClient
+
+    client = client or ArxivClient()
     
     try:
-        results = list(client.results(search))
-        if not results:
+        paper = client.get_paper(arxiv_id)
+        if paper is None:
             print(f"Error: 論文ID {arxiv_id} が見つかりませんでした。")
             return None
         
-        paper = results[0]
         print(f"取得成功: {paper.title}")
         return paper
     except Exception as e:
         print(f"メタデータ取得中にエラーが発生しました: {e}")
         return None
 
-def collect_multiple_papers(id_list):
+def collect_multiple_papers(id_list, raw_dir=DATA_RAW_DIR, sleep_seconds=2, client=None):
     """
     リスト内のすべての論文を順番にダウンロード・展開する
     """
     for arxiv_id in id_list:
-        paper = get_paper_metadata(arxiv_id)
+        sent = client.cache.network_requests if client else None
+        paper = get_paper_metadata(arxiv_id, client)
         if paper:
-            download_and_extract_source(paper)
-            # arXivサーバーへの負荷軽減のために2秒待機
-            time.sleep(2)
+            download_and_extract_source(paper, raw_dir)
+            # arXivサーバーへの負荷軽減のために待機 (キャッシュだけで済んだ場合は待たない)
+            if client is None or client.cache.network_requests != sent:
+                time.sleep(sleep_seconds)
 
 def find_paper_structure(directory):
     """
@@ -76,14 +79,22 @@ def find_paper_structure(directory):
     
     return root_file, author_file
 
-def download_and_extract_source(paper):
+def download_and_extract_source(paper, raw_dir=DATA_RAW_DIR):
     arxiv_id = paper.get_short_id()
-    paper_dir = DATA_RAW_DIR / arxiv_id
+    paper_dir = Path(raw_dir) / arxiv_id
     paper_dir.mkdir(parents=True, exist_ok=True)
 
     tar_path = paper_dir / f"{arxiv_id}.tar.gz"
     if not tar_path.exists():
-        paper.download_source(dirpath=str(paper_dir), filename=tar_path.name)
+        # replay で記録のない tarball (CacheMiss) や record での HTTP エラーは、この論文だけ飛ばす
+        try:
+            paper.download_source(dirpath=str(paper_dir), filename=tar_path.name)
+        except (CacheMiss, OSError) as e:
+            print(f" [Skip] Source not available for {arxiv_id}: {e}")
+            # 空のフォルダを残すと extract で root_not_found として記録され、次回の収集後も処理されない
+            if not any(paper_dir.iterdir()):
+                paper_dir.rmdir()
+            return
     
     try:
         with tarfile.open(tar_path) as tar:
@@ -112,10 +123,8 @@ def save_metadata(paper_dir, paper_info):
     with open(paper_dir / "metadata.json", "w", encoding="utf-8") as f:
         json.dump(paper_info, f, indent=4, ensure_ascii=False)
 
-if __name__ == "__main__":
-    from searcher import search_papers
-
-    arxiv_categories = [
+# 収集対象の arXiv カテゴリ一覧
+ARXIV_CATEGORIES = [
     # Computer Science
     "cs.AI", "cs.AR", "cs.CC", "cs.CE", "cs.CG", "cs.CL", "cs.CR", "cs.CV", "cs.CY", "cs.DB",
     "cs.DC", "cs.DL", "cs.DM", "cs.DS", "cs.ET", "cs.FL", "cs.GL", "cs.GR", "cs.GT", "cs.HC",
@@ -149,9 +158,26 @@ if __name__ == "__main__":
     "stat.AP", "stat.CO", "stat.ME", "stat.ML", "stat.OT", "stat.TH"
 ]
 
-    for target_category in arxiv_categories:
-        papers = search_papers(category=target_category, max_results=3)
+def harvest(raw_dir=DATA_RAW_DIR, categories=None, max_results=3, sleep_seconds=2, client=None):
+    """
+    【収集ステージ】
+    カテゴリごとに最新論文を検索し、ソースをダウンロード・展開する
+    client (src.arxiv_client.ArxivClient) を渡すと、その HTTP キャッシュ設定で通信する
+    """
+    from src.searcher import search_papers
+
+    for target_category in categories or ARXIV_CATEGORIES:
+        try:
+            papers = search_papers(category=target_category, max_results=max_results, client=client)
+        except (CacheMiss, OSError) as e:
+            print(f"Error: カテゴリ {target_category} の検索に失敗したため飛ばします ({e})")
+            continue
         id_list = [paper.get_short_id() for paper in papers]
-        collect_multiple_papers(id_list)
-    
-    print("\n=== All done! ===")
\ No newline at end of file
+        collect_multiple_papers(id_list, raw_dir, sleep_seconds, client)
+
+    if client:
+        print(f"HTTP キャッシュ ({client.cache.mode}): {client.cache.stats()}")
+    print("\n=== All done! ===")
+
+if __name__ == "__main__":
+    harvest()
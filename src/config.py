@@ -0,0 +1,89 @@
+import os
+import copy
+
+"""
+- configs/base_config.yaml の読み込み
+- パス設定の解決 (base_dir 起点)
+"""
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONFIG_PATH = os.path.join(REPO_ROOT, "configs", "base_config.yaml")
+
+# YAML に書かれていない項目はこの値で補う
+DEFAULTS = {
+    "paths": {
+        "base_dir": REPO_ROOT,
+        "raw_dir": "data/raw",
+        "manifest": "data/processed_manifest.json",
+        "results": "data/author_benchmarks.jsonl",
+        "log": "data/execution_log.jsonl",
+        "violations": "data/budget_violations.jsonl",
+        "profile": "data/run_profile.json",
+        "result_cache": "data/result_cache.sqlite",
+        "export": "data/export/author_benchmarks.jsonl",
+        "export_db": "data/export/author_benchmarks.sqlite",
+        "gold": "data/gold_annotations.jsonl",
+        "eval_report": "data/eval_report.json",
+        "author_index": "data/author_index.sqlite",
+        "registry_dump": "data/ror/ror-data.json",
+        "registry_index": "data/ror/index",
+        "affiliation_matches": "data/affiliation_matches.jsonl",
+        "cluster_index": "data/affiliation_clusters.sqlite",
+        "affiliation_clusters": "data/affiliation_clusters.jsonl",
+        "clustered_results": "data/author_benchmarks_clustered.jsonl",
+        "http_cache": "data/http_cache",
+        "timings": "data/paper_timings.jsonl",
+    },
+    "harvest": {"categories": [], "max_results": 3, "sleep_seconds": 2,
+                "cache_mode": "record", "cache_ttl_s": 86400, "request_delay_s": 3,
+                "api_base": "https://export.arxiv.org", "source_base": "https://export.arxiv.org"},
+    "extract": {"workers": 1, "batch_size": 100, "time_budget_s": 0, "memory_budget_mb": 0,
+                "schedule": "cost"},
+    "review": {"start_id": None},
+    "evaluate": {"name_threshold": 0.85, "affiliation_threshold": 0.75, "max_chars": 96,
+                 "batch_size": 4096, "worst_cases": 20},
+    "registry": {"min_score": 0.5, "max_postings": 2000, "workers": 1},
+    "cluster": {"num_perm": 64, "bands": 16, "threshold": 0.6, "batch_size": 10000},
+    "cache": {"clean_text_entries": 0, "affiliation_entries": 0, "result_cache_mb": 256},
+}
+
+def _merge(base, override):
+    """override の値で base を再帰的に上書きした新しい辞書を返す"""
+    merged = copy.deepcopy(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def resolve_paths(config):
+    """
+    paths セクションの相対パスを base_dir 起点の絶対パスに変換する。
+    base_dir が空ならリポジトリの直下を使う。
+    """
+    paths = config["paths"]
+    base_dir = os.path.expanduser(paths["base_dir"] or REPO_ROOT)
+    for key, value in paths.items():
+        if key == "base_dir" or not value:
+            continue
+        value = os.path.expanduser(value)
+        paths[key] = value if os.path.isabs(value) else os.path.join(base_dir, value)
+    paths["base_dir"] = base_dir
+    return config
+
+def load_config(path=None, base_dir=None):
+    """
+    設定ファイルを読み込み、既定値とマージして返す。
+    base_dir を渡すと YAML の paths.base_dir より優先される。
+    """
+    import yaml
+
+    path = path or DEFAULT_CONFIG_PATH
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = yaml.safe_load(f) or {}
+
+    config = _merge(DEFAULTS, raw)
+    if base_dir:
+        config["paths"]["base_dir"] = base_dir
+    return resolve_paths(config)
@@ -0,0 +1,291 @@
+import json
+from collections import defaultdict
+
+import numpy as np
+from src.normalize import normalize
+
+"""
+- 抽出結果 (author_benchmarks.jsonl) と正解アノテーションの比較
+- doc_class ごとの precision / recall / F1 (著者名・所属・著者→所属リンク)
+- 文字列類似度は論文をまたいで全ペアをまとめ、パディングした文字配列上で一括計算する
+"""
+
+def load_jsonl_by_id(path):
+    """arxiv_id -> 行。同じ論文が複数行ある場合は最後の行を採用する"""
+    records = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                data = json.loads(line)
+                records[data["arxiv_id"]] = data
+    return records
+
+# パディング用の番兵 (どの2-gram とも一致せず、並べ替えで行末に集まる値)
+_PAD_LEFT = 1 << 62
+_PAD_RIGHT = _PAD_LEFT + 1
+
+def encode_bigrams(strings, max_chars):
+    """
+    文字列を前後に空白を足して max_chars で切り、文字2-gram の「集合」を行ごとに並べた配列にする。
+    戻り値: (bigrams, lengths)  bigrams は (N, max_chars + 1) の int64 で、
+    各行の先頭 lengths[i] 個が重複のない2-gram (昇順)、残りはパディング。
+    """
+    width = max_chars + 2
+    padded = np.array([f" {s[:max_chars]} " for s in strings], dtype=f'<U{width}')
+    codes = padded.view(np.uint32).reshape(len(strings), width).astype(np.int64)
+    n_chars = np.char.str_len(padded)
+
+    bigrams = codes[:, :-1] * 0x110000 + codes[:, 1:]
+    bigrams[np.arange(width - 1)[None, :] >= (n_chars - 1)[:, None]] = _PAD_LEFT
+    # 行内で並べ替えて重複を番兵に置き換え、もう一度並べ替えて行末に寄せる
+    bigrams.sort(axis=1)
+    dup = np.zeros_like(bigrams, dtype=bool)
+    dup[:, 1:] = bigrams[:, 1:] == bigrams[:, :-1]
+    bigrams[dup] = _PAD_LEFT
+    bigrams.sort(axis=1)
+    lengths = np.count_nonzero(bigrams != _PAD_LEFT, axis=1)
+    return bigrams, lengths
+
+def indexed_similarity(left_idx, right_idx, bigrams, lengths, batch_size=4096):
+    """
+    encode_bigrams 済みの文字列表について、left_idx[k] 番と right_idx[k] 番の類似度 (0〜1) を計算する。
+    2-gram 集合の Dice 係数: 2|A∩B| / (|A| + |B|)
+    P 組のペアを (P, L, L) の一致判定で一括処理し、Python のペアごとのループは使わない。
+    同じ組み合わせは1回だけ計算し、長さの近いペア同士を同じバッチにしてパディングを減らす。
+    """
+    sims = np.ones(len(left_idx), dtype=np.float64)
+    # 完全一致 (同じ語彙 index) は計算不要
+    todo = left_idx != right_idx
+    n_vocab = len(lengths)
+    pair_keys, inverse = np.unique(left_idx[todo] * n_vocab + right_idx[todo], return_inverse=True)
+    uniq_left, uniq_right = np.divmod(pair_keys, n_vocab)
+    order = np.argsort(lengths[uniq_left] + lengths[uniq_right], kind='stable')
+
+    # 右側のパディングは左側と一致しないよう別の値にしておく
+    right_table = bigrams.copy()
+    right_table[right_table == _PAD_LEFT] = _PAD_RIGHT
+
+    uniq_sims = np.zeros(len(pair_keys), dtype=np.float64)
+    for start in range(0, len(order), batch_size):
+        sel = order[start:start + batch_size]
+        li = uniq_left[sel]
+        ri = uniq_right[sel]
+        # バッチ内の実際の最大長まで詰めてから比較する
+        a = bigrams[li, :int(lengths[li].max())]
+        b = right_table[ri, :int(lengths[ri].max())]
+        common = np.count_nonzero((a[:, :, None] == b[:, None, :]).reshape(len(sel), -1), axis=1)
+        uniq_sims[sel] = 2 * common / (lengths[li] + lengths[ri])
+
+    sims[todo] = uniq_sims[inverse.ravel()]
+    return sims
+
+def pair_similarity(left, right, max_chars=96, batch_size=4096):
+    """文字列ペアのリスト版。left[i] と right[i] の類似度を返す"""
+    vocab = {}
+    left_idx = np.array([vocab.setdefault(s, len(vocab)) for s in left], dtype=np.int64)
+    right_idx = np.array([vocab.setdefault(s, len(vocab)) for s in right], dtype=np.int64)
+    if not len(left_idx):
+        return np.zeros(0)
+    bigrams, lengths = encode_bigrams(list(vocab), max_chars)
+    return indexed_similarity(left_idx, right_idx, bigrams, lengths, batch_size)
+
+def greedy_match(sim, threshold):
+    """
+    類似度行列から、類似度の高い順に1対1で対応づける。
+    戻り値: {予測側index: 正解側index}
+    """
+    matches = {}
+    if sim.size == 0:
+        return matches
+    # 閾値を超える候補だけを類似度の降順に並べる (大規模論文でも全要素を回さない)
+    rows, cols = np.nonzero(sim >= threshold)
+    order = np.argsort(-sim[rows, cols], kind='stable')
+    used_gold = set()
+    for i, j in zip(rows[order].tolist(), cols[order].tolist()):
+        if i in matches or j in used_gold:
+            continue
+        matches[i] = j
+        used_gold.add(j)
+    return matches
+
+def _paper_items(record):
+    """論文1件から (正規化名のリスト, 正規化所属のリスト, リンク集合 (名前idx, 所属idx)) を作る"""
+    names, affils, links = [], [], set()
+    affil_index = {}
+    for author in (record or {}).get("authors", []):
+        names.append(normalize(author["name"]))
+        for affil in author.get("affiliations", []):
+            key = normalize(affil)
+            if key not in affil_index:
+                affil_index[key] = len(affils)
+                affils.append(key)
+            links.add((len(names) - 1, affil_index[key]))
+    return names, affils, links
+
+class _PairBatch:
+    """
+    全論文の比較ペアを1つの配列に集め、最後にまとめて類似度を計算する。
+    文字列は語彙表に1回だけ登録し、ペアは語彙の index で持つ。
+    """
+
+    def __init__(self):
+        self.vocab = {}
+        self.left, self.right, self.slots = [], [], []
+
+    def _index(self, text):
+        return self.vocab.setdefault(text, len(self.vocab))
+
+    def add_matrix(self, preds, golds):
+        start = len(self.left)
+        pred_idx = [self._index(p) for p in preds]
+        gold_idx = [self._index(g) for g in golds]
+        for p in pred_idx:
+            self.left.extend([p] * len(gold_idx))
+            self.right.extend(gold_idx)
+        self.slots.append((start, len(preds), len(golds)))
+        return len(self.slots) - 1
+
+    def compute(self, max_chars, batch_size):
+        flat = np.zeros(0)
+        if self.left:
+            bigrams, lengths = encode_bigrams(list(self.vocab), max_chars)
+            flat = indexed_similarity(
+                np.array(self.left, dtype=np.int64), np.array(self.right, dtype=np.int64),
+                bigrams, lengths, batch_size,
+            )
+        self.matrices = [
+            flat[start:start + n_pred * n_gold].reshape(n_pred, n_gold)
+            for start, n_pred, n_gold in self.slots
+        ]
+
+def _prf(tp, n_pred, n_gold):
+    precision = tp / n_pred if n_pred else 0.0
+    recall = tp / n_gold if n_gold else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 4), "recall": round(recall, 4), "f1": round(f1, 4),
+            "tp": tp, "pred": n_pred, "gold": n_gold}
+
+def evaluate(results_path, gold_path, name_threshold=0.85, affiliation_threshold=0.75,
+             max_chars=96, batch_size=4096, worst_cases=20):
+    """
+    【正解データとの比較】
+    正解に含まれる論文だけを対象に、著者名・所属・リンクの P/R/F1 を doc_class ごとに集計する。
+    抽出結果にない論文は全件取りこぼし (recall 0) として数える。
+    """
+    preds = load_jsonl_by_id(results_path)
+    golds = load_jsonl_by_id(gold_path)
+
+    # 1. 全論文の比較ペアを集める
+    batch = _PairBatch()
+    papers = []
+    for aid, gold in golds.items():
+        pred = preds.get(aid)
+        p_names, p_affils, p_links = _paper_items(pred)
+        g_names, g_affils, g_links = _paper_items(gold)
+        papers.append({
+            "arxiv_id": aid,
+            "doc_class": (pred or {}).get("doc_class") or gold.get("doc_class") or "Unknown",
+            "pred": (p_names, p_affils, p_links),
+            "gold": (g_names, g_affils, g_links),
+            "name_slot": batch.add_matrix(p_names, g_names),
+            "affil_slot": batch.add_matrix(p_affils, g_affils),
+        })
+
+    # 2. 類似度を一括計算
+    batch.compute(max_chars, batch_size)
+
+    # 3. 論文ごとに対応づけて数える
+    totals = defaultdict(lambda: defaultdict(lambda: [0, 0, 0]))
+    paper_reports = []
+    for paper in papers:
+        p_names, p_affils, p_links = paper["pred"]
+        g_names, g_affils, g_links = paper["gold"]
+        name_map = greedy_match(batch.matrices[paper["name_slot"]], name_threshold)
+        affil_map = greedy_match(batch.matrices[paper["affil_slot"]], affiliation_threshold)
+
+        # 予測リンクを正解側の index に写して照合
+        mapped_links = {
+            (name_map[n], affil_map[a]) for n, a in p_links
+            if n in name_map and a in affil_map
+        }
+        link_tp = len(mapped_links & g_links)
+
+        scores = {
+            "names": (len(name_map), len(p_names), len(g_names)),
+            "affiliations": (len(affil_map), len(p_affils), len(g_affils)),
+            "links": (link_tp, len(p_links), len(g_links)),
+        }
+        for kind, (tp, n_pred, n_gold) in scores.items():
+            for cls in (paper["doc_class"], "ALL"):
+                counts = totals[cls][kind]
+                counts[0] += tp
+                counts[1] += n_pred
+                counts[2] += n_gold
+
+        matched_gold_names = set(name_map.values())
+        inverse_name = {g: p for p, g in name_map.items()}
+        inverse_affil = {g: p for p, g in affil_map.items()}
+        paper_reports.append({
+            "arxiv_id": paper["arxiv_id"],
+            "doc_class": paper["doc_class"],
+            "link_f1": _prf(*scores["links"])["f1"],
+            "missing_names": [g_names[j] for j in range(len(g_names)) if j not in matched_gold_names],
+            "extra_names": [p_names[i] for i in range(len(p_names)) if i not in name_map],
+            "missing_links": sorted(
+                f"{g_names[n]} -> {g_affils[a]}" for n, a in g_links
+                if (n, a) not in mapped_links
+            ),
+            "extra_links": sorted(
+                f"{p_names[n]} -> {p_affils[a]}" for n, a in p_links
+                if (name_map.get(n), affil_map.get(a)) not in g_links
+            ),
+            "renamed": {
+                g_names[j]: p_names[inverse_name[j]] for j in inverse_name
+                if g_names[j] != p_names[inverse_name[j]]
+            },
+            "affiliation_variants": {
+                g_affils[j]: p_affils[inverse_affil[j]] for j in inverse_affil
+                if g_affils[j] != p_affils[inverse_affil[j]]
+            },
+        })
+
+    summary = {
+        cls: {kind: _prf(*counts) for kind, counts in kinds.items()}
+        for cls, kinds in totals.items()
+    }
+    # 取りこぼしも余分もない論文は、リンクF1 が低くても (両方とも空など) 載せない
+    paper_reports = [
+        r for r in paper_reports
+        if r["missing_names"] or r["extra_names"] or r["missing_links"] or r["extra_links"]
+    ]
+    paper_reports.sort(key=lambda r: (r["link_f1"], r["arxiv_id"]))
+    return {
+        "papers": len(papers),
+        "pairs_scored": len(batch.left),
+        "summary": summary,
+        "worst_cases": paper_reports[:worst_cases],
+    }
+
+def print_report(report):
+    """evaluate() の結果を表形式で表示する"""
+    print(f"\n--- 📊 評価結果 ({report['papers']} 論文 / {report['pairs_scored']} ペア) ---")
+    print(f"{'Document Class':<18} | {'kind':<12} | {'P':>6} | {'R':>6} | {'F1':>6} | {'gold':>6}")
+    print("-" * 70)
+    classes = sorted(c for c in report["summary"] if c != "ALL") + ["ALL"]
+    for cls in classes:
+        for kind, s in report["summary"].get(cls, {}).items():
+            print(f"{cls:<18} | {kind:<12} | {s['precision']:>6.3f} | {s['recall']:>6.3f} | {s['f1']:>6.3f} | {s['gold']:>6}")
+
+    if report["worst_cases"]:
+        print(f"\n--- 🔻 リンクF1 の低い論文 (上位 {len(report['worst_cases'])} 件) ---")
+        for case in report["worst_cases"]:
+            print(f"\n📄 {case['arxiv_id']} ({case['doc_class']})  link F1 = {case['link_f1']:.3f}")
+            for label, key in (("- 取りこぼし著者", "missing_names"), ("+ 余分な著者", "extra_names"),
+                               ("- 取りこぼしリンク", "missing_links"), ("+ 余分なリンク", "extra_links")):
+                for item in case[key][:10]:
+                    print(f"   {label}: {item}")
+
+def save_report(path, report):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    print(f"\nレポート: {path}")
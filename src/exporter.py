@@ -0,0 +1,242 @@
+import os
+import json
+import sqlite3
+from src.utils import load_manifest, META_SCHEMA, jsonl_rewritten, ingest_jsonl
+from src.normalize import normalize
+
+"""
+- 抽出結果(author_benchmarks.jsonl)から配布用データセットを書き出す
+- 著者名・所属で検索できる SQLite 版 (FTS5 の全文検索索引つき)
+"""
+
+def export_jsonl(results_path, manifest_path, export_path):
+    """
+    【配布用 JSONL の書き出し】
+    再実行で同じ論文が複数行ある場合は最後の行を採用し、
+    manifest 上で success になっている論文だけを arxiv_id 順に出力する。
+    結果ファイル全体はメモリに載せず、行のバイト位置だけを保持する。
+    """
+    if not os.path.exists(results_path):
+        print(f"Error: {results_path} が見つかりません。")
+        return 0
+
+    manifest = load_manifest(manifest_path)
+
+    # 1パス目: arxiv_id -> 最後に出現した行の位置
+    offsets = {}
+    with open(results_path, 'rb') as f:
+        while True:
+            pos = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            aid = json.loads(line).get("arxiv_id")
+            if manifest.get(aid, {}).get("status") == "success":
+                offsets[aid] = pos
+
+    # 2パス目: 採用行だけを順に書き出す
+    os.makedirs(os.path.dirname(export_path) or ".", exist_ok=True)
+    with open(results_path, 'rb') as src, open(export_path, 'wb') as dst:
+        for aid in sorted(offsets):
+            src.seek(offsets[aid])
+            dst.write(src.readline().rstrip(b'\r\n') + b'\n')
+
+    print(f"export: {len(offsets)} 件 -> {export_path}")
+    return len(offsets)
+
+# 正規化した SQLite データセットのスキーマ
+# affiliations は文字列で重複排除し、著者との対応は author_affiliations (所属の並び順つき) で持つ。
+# *_fts は外部コンテンツ方式の FTS5 索引で、トリガーで本体と同期する
+_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    paper_id INTEGER PRIMARY KEY,
+    arxiv_id TEXT NOT NULL UNIQUE,
+    doc_class TEXT,
+    status TEXT,
+    message TEXT,
+    author_count INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS idx_papers_class ON papers (doc_class, status);
+CREATE INDEX IF NOT EXISTS idx_papers_status ON papers (status);
+CREATE TABLE IF NOT EXISTS authors (
+    author_id INTEGER PRIMARY KEY,
+    paper_id INTEGER NOT NULL REFERENCES papers (paper_id),
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_authors_paper ON authors (paper_id, position);
+CREATE TABLE IF NOT EXISTS affiliations (
+    affiliation_id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS author_affiliations (
+    author_id INTEGER NOT NULL REFERENCES authors (author_id),
+    position INTEGER NOT NULL,
+    affiliation_id INTEGER NOT NULL REFERENCES affiliations (affiliation_id),
+    PRIMARY KEY (author_id, position)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_links_affiliation ON author_affiliations (affiliation_id, author_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS authors_fts USING fts5 (
+    name, content='authors', content_rowid='author_id', tokenize='unicode61 remove_diacritics 2');
+CREATE VIRTUAL TABLE IF NOT EXISTS affiliations_fts USING fts5 (
+    text, content='affiliations', content_rowid='affiliation_id', tokenize='unicode61 remove_diacritics 2');
+CREATE TRIGGER IF NOT EXISTS authors_ai AFTER INSERT ON authors BEGIN
+    INSERT INTO authors_fts (rowid, name) VALUES (new.author_id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS authors_ad AFTER DELETE ON authors BEGIN
+    INSERT INTO authors_fts (authors_fts, rowid, name) VALUES ('delete', old.author_id, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS affiliations_ai AFTER INSERT ON affiliations BEGIN
+    INSERT INTO affiliations_fts (rowid, text) VALUES (new.affiliation_id, new.text);
+END;
+"""
+
+class DatasetWriter:
+    """
+    【SQLite データセットの書き込み】
+    結果ファイル (成功した論文の著者・所属) と実行ログ (全論文の status) を
+    前回の続きから読み、batch_size 行ごとに1トランザクションでまとめて書き込む。
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_DB_SCHEMA + META_SCHEMA)
+        self._affiliation_ids = None
+
+    def _paper_id(self, arxiv_id):
+        self.conn.execute("INSERT OR IGNORE INTO papers (arxiv_id) VALUES (?)", (arxiv_id,))
+        return self.conn.execute("SELECT paper_id FROM papers WHERE arxiv_id = ?", (arxiv_id,)).fetchone()[0]
+
+    def _affiliation_id(self, text):
+        # 所属文字列 -> ID は初回に全件読み込み、以降はメモリ上で引く
+        if self._affiliation_ids is None:
+            self._affiliation_ids = dict(self.conn.execute("SELECT text, affiliation_id FROM affiliations"))
+        affiliation_id = self._affiliation_ids.get(text)
+        if affiliation_id is None:
+            affiliation_id = self.conn.execute("INSERT INTO affiliations (text) VALUES (?)", (text,)).lastrowid
+            self._affiliation_ids[text] = affiliation_id
+        return affiliation_id
+
+    def add_result(self, data):
+        """結果ファイルの1行分。同じ論文が再び現れたら著者を差し替える"""
+        paper_id = self._paper_id(data["arxiv_id"])
+        old = [r[0] for r in self.conn.execute("SELECT author_id FROM authors WHERE paper_id = ?", (paper_id,))]
+        if old:
+            self.conn.executemany("DELETE FROM author_affiliations WHERE author_id = ?", [(a,) for a in old])
+            self.conn.execute("DELETE FROM authors WHERE paper_id = ?", (paper_id,))
+
+        authors = data.get("authors", [])
+        self.conn.execute(
+            "UPDATE papers SET doc_class = ?, author_count = ? WHERE paper_id = ?",
+            (data.get("doc_class"), len(authors), paper_id),
+        )
+        links = []
+        for position, author in enumerate(authors):
+            author_id = self.conn.execute(
+                "INSERT INTO authors (paper_id, position, name) VALUES (?, ?, ?)",
+                (paper_id, position, author["name"]),
+            ).lastrowid
+            for i, affil in enumerate(author.get("affiliations", [])):
+                links.append((author_id, i, self._affiliation_id(affil)))
+        self.conn.executemany(
+            "INSERT INTO author_affiliations (author_id, position, affiliation_id) VALUES (?, ?, ?)", links
+        )
+
+    def add_log_entry(self, entry):
+        """実行ログの1行分。status は最後に記録されたものが残る"""
+        paper_id = self._paper_id(entry["arxiv_id"])
+        self.conn.execute(
+            "UPDATE papers SET status = ?, message = ?, doc_class = COALESCE(?, doc_class) WHERE paper_id = ?",
+            (entry.get("status"), entry.get("message"), entry.get("doc_class"), paper_id),
+        )
+
+    def ingest(self, path, kind, handler, batch_size=1000):
+        """path の追記分を1行ずつ handler に渡す。戻り値: 取り込んだ行数"""
+        def handle_batch(rows):
+            for row in rows:
+                handler(row)
+        return ingest_jsonl(self.conn, path, kind, handle_batch, batch_size)
+
+    def clear(self):
+        self.conn.execute("BEGIN")
+        for table in ("author_affiliations", "authors", "affiliations", "papers", "meta"):
+            self.conn.execute(f"DELETE FROM {table}")
+        self.conn.execute("INSERT INTO authors_fts (authors_fts) VALUES ('delete-all')")
+        self.conn.execute("INSERT INTO affiliations_fts (affiliations_fts) VALUES ('delete-all')")
+        self.conn.execute("COMMIT")
+        self._affiliation_ids = None
+
+    def close(self):
+        self.conn.execute("PRAGMA optimize")
+        self.conn.close()
+
+def export_sqlite(results_path, log_path, db_path, batch_size=1000):
+    """
+    【SQLite データセットの書き出し】
+    結果ファイルと実行ログを db_path に差分で取り込む (2回目以降は追記分だけを読む)。
+    戻り値: (取り込んだ結果行数, 取り込んだログ行数)
+    """
+    if not os.path.exists(results_path):
+        print(f"Error: {results_path} が見つかりません。")
+        return 0, 0
+
+    writer = DatasetWriter(db_path)
+    if jsonl_rewritten(writer.conn, results_path, "results") or jsonl_rewritten(writer.conn, log_path, "log"):
+        print("export: 入力ファイルが作り直されているため、全件を取り込み直します")
+        writer.clear()
+    results = writer.ingest(results_path, "results", writer.add_result, batch_size)
+    logs = writer.ingest(log_path, "log", writer.add_log_entry, batch_size)
+    papers, authors, affiliations = writer.conn.execute(
+        "SELECT (SELECT COUNT(*) FROM papers), (SELECT COUNT(*) FROM authors), (SELECT COUNT(*) FROM affiliations)"
+    ).fetchone()
+    writer.close()
+    print(f"export: 結果 {results} 行 / ログ {logs} 行を追加 -> {db_path}")
+    print(f"        論文 {papers} / 著者 {authors} / 所属 {affiliations}")
+    return results, logs
+
+def _fts_query(text):
+    """入力文字列を FTS5 の「全語を含む」クエリにする (記号は落とし、各語を引用符で囲む)"""
+    return " ".join(f'"{t}"' for t in normalize(text).split())
+
+def query_dataset(db_path, affiliation=None, name=None, doc_class=None, status=None, limit=50):
+    """
+    【データセットの検索】
+    affiliation / name は全文検索 (語順・大文字小文字・アクセントを問わず全語を含むもの)、
+    doc_class は GLOB パターン ("revtex*" など)、status は完全一致で絞り込む。
+    affiliation / name に語が1つもない ("&" など記号だけの) 場合は何にも一致しない。
+    結果は著者単位 (著者のいない論文は出てこない)。ORDER BY は付けない (全件を並べ替えると limit で打ち切れないため)。
+    戻り値: {"arxiv_id", "doc_class", "status", "name", "affiliation"} のリスト
+    """
+    if (affiliation and not _fts_query(affiliation)) or (name and not _fts_query(name)):
+        return []
+    conn = sqlite3.connect(db_path)
+    where, params = [], []
+    if affiliation:
+        # 所属の検索語は一致する所属が少ないことが多いので、所属の索引から著者をたどる
+        sql = ("SELECT p.arxiv_id, p.doc_class, p.status, a.name, af.text FROM author_affiliations l"
+               " JOIN authors a ON a.author_id = l.author_id"
+               " JOIN papers p ON p.paper_id = a.paper_id"
+               " JOIN affiliations af ON af.affiliation_id = l.affiliation_id")
+        where.append("l.affiliation_id IN (SELECT rowid FROM affiliations_fts WHERE affiliations_fts MATCH ?)")
+        params.append(_fts_query(affiliation))
+    else:
+        sql = ("SELECT p.arxiv_id, p.doc_class, p.status, a.name, af.text FROM authors a"
+               " JOIN papers p ON p.paper_id = a.paper_id"
+               " LEFT JOIN author_affiliations l ON l.author_id = a.author_id"
+               " LEFT JOIN affiliations af ON af.affiliation_id = l.affiliation_id")
+    if name:
+        where.append("a.author_id IN (SELECT rowid FROM authors_fts WHERE authors_fts MATCH ?)")
+        params.append(_fts_query(name))
+    if doc_class:
+        where.append("p.doc_class GLOB ?")
+        params.append(doc_class)
+    if status:
+        where.append("p.status = ?")
+        params.append(status)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    rows = conn.execute(sql + " LIMIT ?", params + [limit]).fetchall()
+    conn.close()
+    keys = ("arxiv_id", "doc_class", "status", "name", "affiliation")
+    return [dict(zip(keys, row)) for row in rows]
@@ -1,9 +1,60 @@
 import re
 from src.parser import LatexParser
+from src.cache import LRUCache
+
+# 抽出結果キャッシュ (src.result_cache) のキーに含まれる。
+# 抽出ロジックや clean_text の出力が変わる修正をしたら必ず上げること。
+EXTRACTOR_VERSION = 2
+
+# 抽出器が参照するコマンドの全体。文書ごとに parser.tokenize で1回だけ走査し、
+# 各 extract_* はそのイベント列を消費する (クラスを増やしても本文の走査回数は増えない)
+# 文書の地の文に現れるもの (著者・所属の本体) と、それらの引数の中だけで使うタグに分けて持つ
+TOP_LEVEL_COMMANDS = frozenset({
+    "author", "address", "curraddr", "affiliation", "altaffiliation", "additionalaffiliation",
+    "collaboration", "affil", "presentaddress",
+})
+# acmart の所属内タグ
+ACMART_TAGS = frozenset({"institution", "department", "city", "country", "state", "postcode", "streetaddress"})
+# sn-jnl の所属・氏名タグ
+SN_JNL_TAGS = frozenset({"orgdiv", "orgname", "fnm", "sur"})
+COMMANDS = TOP_LEVEL_COMMANDS | ACMART_TAGS | SN_JNL_TAGS
+
+class AffiliationSet:
+    """
+    著者1人分の所属の「順序付き集合」。
+    list で出現順を保ちつつ、set で重複判定を O(1) にする
+    （数千人規模の共同研究論文で `not in list` が二乗になるのを防ぐ）。
+    """
+    __slots__ = ("items", "_seen")
 
-class InformationExtractor:
     def __init__(self):
-        self.parser = LatexParser()
+        self.items = []
+        self._seen = set()
+
+    def add(self, value):
+        """未登録のときだけ追加する（重複排除）"""
+        if value not in self._seen:
+            self._seen.add(value)
+            self.items.append(value)
+
+    def append(self, value):
+        """重複を許して追加する（従来 list.append していた箇所用）"""
+        self._seen.add(value)
+        self.items.append(value)
+
+    def __contains__(self, value):
+        return value in self._seen
+
+    def __len__(self):
+        return len(self.items)
+
+class InformationExtractor:
+    def __init__(self, clean_text_cache=0, affiliation_cache=0):
+        self.parser = LatexParser(cache_size=clean_text_cache)
+        # acmart / elsarticle の所属タグ分解結果のメモ化（0 なら無効）
+        self.tag_caches = {}
+        if affiliation_cache:
+            self.tag_caches = {"acmart": LRUCache(affiliation_cache), "elsarticle": LRUCache(affiliation_cache)}
         # クラス名とメソッドの対応表
         # 基本となる抽出メソッドの定義
         self.dispatch_map = {
@@ -47,10 +98,50 @@ class InformationExtractor:
         """判定されたクラスに応じて抽出を実行するエントリポイント"""
         extract_method = self.dispatch_map.get(doc_class)
         if extract_method:
-            return extract_method(content)
+            return extract_method(self.parser.tokenize(content, COMMANDS))
         return None  # 未対応の場合は None
+
+    def cache_stats(self):
+        """run profile 用: 有効なキャッシュごとのヒット・ミス・追い出し数"""
+        stats = self.parser.cache_stats()
+        for kind, cache in self.tag_caches.items():
+            stats[f"{kind}_tags"] = cache.stats()
+        return stats
+
+    def _split_tags(self, kind, val, tags=None):
+        """
+        所属タグ分解のキャッシュ窓口。kind ("acmart" / "elsarticle") ごとに別のキャッシュを使う。
+        acmart は tokenize 済みの所属内タグ (LatexCommand のリスト) を tags で渡す。
+        """
+        if kind == "acmart":
+            func = lambda v: self._acmart_affiliation(v, tags)
+        else:
+            func = self._elsarticle_affiliation
+        cache = self.tag_caches.get(kind)
+        if cache is None:
+            return func(val)
+        return cache.get_or_compute(val, func)
+
+    def _acmart_affiliation(self, val, tags):
+        # affiliation内部の構造化タグ (\institution{...}等) の中身
+        tags = [t.arg for t in tags if t.name in ACMART_TAGS]
+
+        if tags:
+            # 各タグの中身を掃除してカンマ区切りで連結
+            return ", ".join([self.parser.clean_text(t) for t in tags if t.strip()])
+        # タグがない（古い、または変則的な書き方）場合は全体を掃除
+        # \textbf 等のコマンド名だけを消して中身を残す処理
+        return self.parser.clean_text(val)
+
+    def _elsarticle_affiliation(self, val):
+        # organization={...} や city={...} の中身だけを抽出して結合
+        kv_matches = self.parser.keyval_values(val)
+        if kv_matches:
+            return ", ".join([self.parser.clean_text(v) for v in kv_matches if v.strip()])
+        # タグがない場合は全体を掃除
+        return self.parser.clean_text(val)
     
-    def extract_amsart(self, content):
+    def extract_amsart(self, events):
         """
         [amsart 最終進化版 - リンキング・ベンチマーク特化]
         .cls の挙動に基づき、名前とあらゆる所属（現所属含む）を確実に紐付け、
@@ -58,11 +149,14 @@ class InformationExtractor:
         """
         # 1. 抽出対象：author, address, curraddr
         # \author[shortname]{fullname} の [shortname] も正確にキャッチする
-        pattern = re.compile(r'\\(author|address|curraddr)(?:\[(.*?)\])?\{(.*?)\}', re.DOTALL)
-        matches = pattern.findall(content)
+        matches = [(e.name, e.opt, e.arg) for e in events
+                   if e.parent < 0 and e.name in ("author", "address", "curraddr")]
 
         results = []
         pending_queue = [] 
+        # キュー内の誰かに所属が付いたか（毎回 any() で走査しないためのフラグ）
+        queue_has_affil = False
+        queue_epoch = 0
         
         # 紐付け用辞書 (正規化された名前 -> オブジェクト)
         name_map = {}
@@ -78,11 +172,14 @@ class InformationExtractor:
             if cmd == "author":
                 # a. 著者が出現 = 前の所属割当ブロックの完全終了 (cls内の挙動)
                 # 既に所属が1つでも入っている著者がキューにいたら、キューを空にする
-                if any(a["affiliations"] for a in pending_queue):
+                if queue_has_affil:
                     pending_queue = []
+                    queue_has_affil = False
+                    queue_epoch += 1
                 
                 # ベンチマーク形式：名前と所属リストのみ
-                author_obj = {"name": val_clean, "affiliations": []}
+                # epoch: どのキュー世代に属しているか（名指し割当がキュー内かの判定用）
+                author_obj = {"name": val_clean, "affiliations": AffiliationSet(), "epoch": queue_epoch}
                 results.append(author_obj)
                 pending_queue.append(author_obj)
                 
@@ -104,19 +201,24 @@ class InformationExtractor:
                 # A. オプション引数による名指し紐付け (\address[T. Yamada]{Univ})
                 if opt_clean and opt_clean in name_map:
                     target = name_map[opt_clean]
-                    if val_clean not in target["affiliations"]:
-                        target["affiliations"].append(val_clean)
+                    target["affiliations"].add(val_clean)
+                    if target["epoch"] == queue_epoch:
+                        queue_has_affil = True
                 
                 # B. キュー方式（待機リスト全員に配る）
                 else:
                     for author in pending_queue:
-                        if val_clean not in author["affiliations"]:
-                            author["affiliations"].append(val_clean)
+                        author["affiliations"].add(val_clean)
+                    if pending_queue:
+                        queue_has_affil = True
                 
         # 最終フィルタリング：所属が1つも取れなかった著者はベンチマークから除外（純度維持）
-        return [a for a in results if a["affiliations"]]
+        return [
+            {"name": a["name"], "affiliations": a["affiliations"].items}
+            for a in results if a["affiliations"]
+        ]
 
-    def extract_revtex(self, content):
+    def extract_revtex(self, events):
         """
         [REVTeX 4.2 最終進化版 - リンキング・ベンチマーク特化]
         名前とあらゆる所属情報を単一のリストに集約し、
@@ -124,11 +226,8 @@ class InformationExtractor:
         """
         # 1. 抽出対象：author, affiliation, altaffiliation
         # (collaborationは状態遷移のトリガーとして残すが、出力には含めない)
-        pattern = re.compile(
-            r'\\(author|affiliation|altaffiliation|collaboration)(?:\[.*?\])?\{(.*?)\}', 
-            re.DOTALL
-        )
-        matches = pattern.findall(content)
+        matches = [(e.name, e.arg) for e in events
+                   if e.parent < 0 and e.name in ("author", "affiliation", "altaffiliation", "collaboration")]
 
         results = []
         pending_queue = []       # 所属確定待ちの著者リスト
@@ -149,7 +248,7 @@ class InformationExtractor:
                 # ベンチマーク用オブジェクト：所属は一つにまとめる
                 author_obj = {
                     "name": val_clean, 
-                    "affiliations": []
+                    "affiliations": AffiliationSet()
                 }
                 results.append(author_obj)
                 pending_queue.append(author_obj)
@@ -160,11 +259,11 @@ class InformationExtractor:
                 # 待機中がいなければ、直前のグループに「第2所属」として付与
                 targets = pending_queue if pending_queue else last_assigned_group
                 for author in targets:
-                    if val_clean not in author["affiliations"]:
-                        author["affiliations"].append(val_clean)
+                    author["affiliations"].add(val_clean)
                 
                 if pending_queue:
-                    last_assigned_group = pending_queue[:]
+                    # キューは直後に新しいリストへ差し替えるので、コピーせずにそのまま引き継ぐ
+                    last_assigned_group = pending_queue
                     pending_queue = []
                 last_action = "affiliation"
 
@@ -172,8 +271,7 @@ class InformationExtractor:
                 # c. 個別割当：直近の「1人」に現所属や旧所属として追加
                 # これはグループ全体ではなく、特定の人物にのみ付随する情報
                 if results:
-                    if val_clean not in results[-1]["affiliations"]:
-                        results[-1]["affiliations"].append(val_clean)
+                    results[-1]["affiliations"].add(val_clean)
                 last_action = "altaffiliation"
 
             elif cmd == "collaboration":
@@ -183,11 +281,11 @@ class InformationExtractor:
 
         # 最終フィルタリング：所属が1つ以上取れた著者のみを採用
         return [
-            {"name": a["name"], "affiliations": a["affiliations"]}
+            {"name": a["name"], "affiliations": a["affiliations"].items}
             for a in results if a["affiliations"]
         ]
     
-    def extract_acmart(self, content):
+    def extract_acmart(self, events):
         """
         [acmart専用 - リンキング・ベンチマーク特化]
         直前の \author に所属を紐付ける「個人属性集約」ロジック。
@@ -195,15 +293,12 @@ class InformationExtractor:
         """
         # 1. 抽出対象：author, affiliation, additionalaffiliation
         # (email はベンチマークのノイズになるため抽出対象から除外)
-        pattern = re.compile(
-            r'\\(author|affiliation|additionalaffiliation)(?:\[.*?\])?\{(.*?)\}', 
-            re.DOTALL
-        )
-        matches = pattern.findall(content)
-
         results = []
-        
-        for cmd, val in matches:
+
+        for i, event in enumerate(events):
+            cmd, val = event.name, event.arg
+            if event.parent >= 0 or cmd not in ("author", "affiliation", "additionalaffiliation"):
+                continue
             # 常に parser.clean_text で LaTeX の装飾（肩番号や特殊コマンド）を剥ぐ
             if cmd == "author":
                 # 新しい著者が来たら「現在の箱」を作成
@@ -214,20 +309,8 @@ class InformationExtractor:
                 # 直近の著者に所属を追加する
                 if not results: continue
                 
-                # a. affiliation内部の構造化タグ (\institution{...}等) を抽出
-                tags = re.findall(
-                    r'\\(?:institution|department|city|country|state|postcode|streetaddress)\{(.*?)\}', 
-                    val, 
-                    re.DOTALL
-                )
-                
-                if tags:
-                    # 各タグの中身を掃除してカンマ区切りで連結
-                    clean_affil = ", ".join([self.parser.clean_text(t) for t in tags if t.strip()])
-                else:
-                    # タグがない（古い、または変則的な書き方）場合は全体を掃除
-                    # \textbf 等のコマンド名だけを消して中身を残す処理
-                    clean_affil = self.parser.clean_text(val)
+                # affiliation内部の構造化タグ (\institution{...}等) を分解して掃除
+                clean_affil = self._split_tags("acmart", val, self.parser.children(events, i))
                 
                 if clean_affil:
                     results[-1]["affiliations"].append(clean_affil)
@@ -238,15 +321,15 @@ class InformationExtractor:
             for a in results if a["affiliations"]
         ]
     
-    def extract_elsarticle(self, content):
+    def extract_elsarticle(self, events):
         """
         [elsarticle専用 - リンキング・ベンチマーク特化]
         IDラベル方式と直後付与方式を統合。
         organization={...} 等のタグをパースし、純粋な所属文字列を作成します。
         """
         # 1. 抽出対象：author, address, affiliation
-        pattern = re.compile(r'\\(author|address|affiliation)(?:\[(.*?)\])?\{(.*?)\}', re.DOTALL)
-        matches = pattern.findall(content)
+        matches = [(e.name, e.opt, e.arg) for e in events
+                   if e.parent < 0 and e.name in ("author", "address", "affiliation")]
 
         results = []
         id_map = {} 
@@ -255,126 +338,127 @@ class InformationExtractor:
             # a. 所属情報のクレンジング (Key-Value形式の解消)
             if cmd in ["address", "affiliation"]:
                 # organization={...} や city={...} の中身だけを抽出して結合
-                kv_matches = re.findall(r'[a-z]+=\{(.*?)\}', val, re.DOTALL)
-                if kv_matches:
-                    clean_val = ", ".join([self.parser.clean_text(v) for v in kv_matches if v.strip()])
-                else:
-                    # タグがない場合は全体を掃除
-                    clean_val = self.parser.clean_text(val)
+                clean_val = self._split_tags("elsarticle", val)
             else:
                 # 著者の場合は名前を掃除
                 clean_val = self.parser.clean_text(val)
 
             clean_label = self.parser.clean_text(label)
+            # ラベルの分解は1回だけ行う
+            labels = [l.strip() for l in clean_label.split(',')] if clean_label else []
 
             if cmd == "author":
                 # 著者オブジェクトの作成 (labelsは一時的に保持)
                 author_obj = {
                     "name": clean_val, 
-                    "affiliations": [], 
-                    "temp_labels": [l.strip() for l in clean_label.split(',')] if clean_label else []
+                    "affiliations": AffiliationSet(), 
+                    "temp_labels": labels
                 }
                 results.append(author_obj)
 
             elif cmd in ["address", "affiliation"]:
-                if clean_label:
+                if labels:
                     # ラベルがある場合は辞書に登録
-                    for l in clean_label.split(','):
-                        id_map[l.strip()] = clean_val
+                    for l in labels:
+                        id_map[l] = clean_val
                 else:
-                    # ラベルがない場合は直近の著者に即時付与
+                    # ラベルがない場合は直近の著者に即時付与（従来どおり重複も許容）
                     if results:
                         results[-1]["affiliations"].append(clean_val)
 
         # 2. IDラベルに基づく所属の「答え合わせ（リンキング）」
         for author in results:
-            if author["temp_labels"]:
-                for l in author["temp_labels"]:
-                    if l in id_map and id_map[l] not in author["affiliations"]:
-                        author["affiliations"].append(id_map[l])
+            for l in author["temp_labels"]:
+                if l in id_map:
+                    author["affiliations"].add(id_map[l])
         
         # 最終出力形式：名前と所属リストのみ（不要なtemp_labelsを除去）
         return [
-            {"name": a["name"], "affiliations": a["affiliations"]}
+            {"name": a["name"], "affiliations": a["affiliations"].items}
             for a in results if a["affiliations"]
         ]
     
-    import re
-
-def extract_sn_jnl(self, content):
-    
-    # 1. 所属辞書の作成
-    id_to_org = {}
-    affil_pattern = re.compile(r'\\affil(?:\[(.*?)\])?\{(.*?)\}', re.DOTALL)
-    affil_matches = affil_pattern.findall(content)
+    def extract_sn_jnl(self, events):
+        """
+        [sn-jnl専用 - リンキング・ベンチマーク特化]
+        \\affil[ID]{...} の辞書と \\author[ID]{...} を突き合わせます。
+        1人でも紐付けに失敗した論文は丸ごと除外します（純度維持）。
+        """
+        # イベント列を1回だけ見て、所属・著者・現所属に振り分ける
+        # (所属内の \orgdiv / \orgname、氏名内の \fnm / \sur は最初の出現だけを使う)
+        affil_events, author_events, present_event = [], [], None
+        for i, event in enumerate(events):
+            if event.parent >= 0:
+                continue
+            if event.name in ("affil", "author"):
+                tags = {}
+                for child in self.parser.children(events, i):
+                    tags.setdefault(child.name, child.arg)
+                (affil_events if event.name == "affil" else author_events).append((event.opt, event.arg, tags))
+            elif event.name == "presentaddress" and present_event is None:
+                present_event = event
+
+        # 1. 所属辞書の作成
+        id_to_org = {}
     
-    for aid, text in affil_matches:
-        org_div = re.search(r'\\orgdiv\{(.*?)\}', text, re.DOTALL)
-        org_name = re.search(r'\\orgname\{(.*?)\}', text, re.DOTALL)
-        
-        parts = []
-        if org_div: parts.append(self.parser.clean_text(org_div.group(1)))
-        if org_name: parts.append(self.parser.clean_text(org_name.group(1)))
+        for aid, text, tags in affil_events:
+            parts = []
+            if "orgdiv" in tags: parts.append(self.parser.clean_text(tags["orgdiv"]))
+            if "orgname" in tags: parts.append(self.parser.clean_text(tags["orgname"]))
         
-        clean_org = ", ".join(parts) if parts else self.parser.clean_text(text)
+            clean_org = ", ".join(parts) if parts else self.parser.clean_text(text)
         
-        # 所属にタグが残っていたら、その論文は処理不能として即終了
-        if "\\" in clean_org or "{" in clean_org:
-            return [] # または raise ExtractionError("Affiliation parse failed")
-
-        if aid:
-            for a in aid.split(','):
-                id_to_org[a.strip()] = clean_org
-
-    # 2. 著者の抽出と紐付け
-    results = []
-    author_pattern = re.compile(r'\\author\*?(?:\[(.*?)\])?\{(.*?)\}', re.DOTALL)
-    author_matches = author_pattern.findall(content)
+            # 所属にタグが残っていたら、その論文は処理不能として即終了
+            if "\\" in clean_org or "{" in clean_org:
+                return [] # または raise ExtractionError("Affiliation parse failed")
+
+            if aid:
+                for a in aid.split(','):
+                    id_to_org[a.strip()] = clean_org
+
+        # 2. 著者の抽出と紐付け
+        results = []
     
-    for aid, body in author_matches:
-        fnm_match = re.search(r'\\fnm\{(.*?)\}', body, re.DOTALL)
-        sur_match = re.search(r'\\sur\{(.*?)\}', body, re.DOTALL)
-        
-        if fnm_match and sur_match:
-            f_name = self.parser.clean_text(fnm_match.group(1))
-            l_name = self.parser.clean_text(sur_match.group(1))
-            full_name = f"{f_name} {l_name}".strip()
-        else:
-            full_name = self.parser.clean_text(body)
-
-        # 【厳格なバリデーション】
-        # 名前の一部にでもタグが残っていたら、この論文データ全体をボツにする
-        if "\\" in full_name or "{" in full_name or "}" in full_name:
-            # print(f"Validation failed for: {full_name}") # デバッグ用
-            return [] # 1人でも失敗したら論文ごとスキップ
-
-        author_affils = []
-        if aid:
-            for a in aid.split(','):
-                a_id = a.strip()
-                if a_id in id_to_org:
-                    author_affils.append(id_to_org[a_id])
-                else:
-                    # IDが辞書にない＝紐付け失敗なので、これもエラー対象
-                    return []
+        for aid, body, tags in author_events:
+            if "fnm" in tags and "sur" in tags:
+                f_name = self.parser.clean_text(tags["fnm"])
+                l_name = self.parser.clean_text(tags["sur"])
+                full_name = f"{f_name} {l_name}".strip()
+            else:
+                full_name = self.parser.clean_text(body)
+
+            # 【厳格なバリデーション】
+            # 名前の一部にでもタグが残っていたら、この論文データ全体をボツにする
+            if "\\" in full_name or "{" in full_name or "}" in full_name:
+                # print(f"Validation failed for: {full_name}") # デバッグ用
+                return [] # 1人でも失敗したら論文ごとスキップ
+
+            author_affils = []
+            if aid:
+                for a in aid.split(','):
+                    a_id = a.strip()
+                    if a_id in id_to_org:
+                        author_affils.append(id_to_org[a_id])
+                    else:
+                        # IDが辞書にない＝紐付け失敗なので、これもエラー対象
+                        return []
         
-        # 所属が一つも見つからない著者がいた場合も、不完全なデータなのでスキップ
-        if not author_affils:
-            return []
-
-        results.append({
-            "name": full_name,
-            "affiliations": author_affils
-        })
-
-    # 3. 現所属の処理
-    present_match = re.search(r'\\presentaddress\{(.*?)\}', content, re.DOTALL)
-    if present_match and results:
-        clean_present = self.parser.clean_text(present_match.group(1))
-        if "\\" in clean_present or "{" in clean_present:
-            return [] # 現所属のパース失敗も許容しない
-        if clean_present not in results[-1]["affiliations"]:
-            results[-1]["affiliations"].append(clean_present)
-
-    # 全ての著者が完璧に抽出できた場合のみ、結果を返す
-    return results
\ No newline at end of file
+            # 所属が一つも見つからない著者がいた場合も、不完全なデータなのでスキップ
+            if not author_affils:
+                return []
+
+            results.append({
+                "name": full_name,
+                "affiliations": author_affils
+            })
+
+        # 3. 現所属の処理
+        if present_event and results:
+            clean_present = self.parser.clean_text(present_event.arg)
+            if "\\" in clean_present or "{" in clean_present:
+                return [] # 現所属のパース失敗も許容しない
+            if clean_present not in results[-1]["affiliations"]:
+                results[-1]["affiliations"].append(clean_present)
+
+        # 全ての著者が完璧に抽出できた場合のみ、結果を返す
+        return results
\ No newline at end of file
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import hashlib
+import urllib.request
+import urllib.error
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+"""
+- arXiv API / ソース取得用の HTTP キャッシュ (記録・再生)
+- 応答はホスト名を除いた正規化 URL をキーにディスクへ保存する。
+  同じキャッシュを本物の arXiv にも、serve() で立てる代役サーバーにも使える
+"""
+
+MODES = ("record", "replay", "passthrough")
+
+class CacheMiss(Exception):
+    """replay モードで、記録されていない URL が要求された"""
+
+def normalize_url(url):
+    """
+    キャッシュキー用の正規化: ホスト名を落とし、クエリを名前順に並べ、値の前後の空白を除く。
+    例: "https://export.arxiv.org/api/query?max_results=3&search_query=cat:cs.AI "
+        -> "/api/query?max_results=3&search_query=cat%3Acs.AI"
+    """
+    parts = urlsplit(url)
+    query = sorted((k, v.strip()) for k, v in parse_qsl(parts.query, keep_blank_values=True))
+    path = parts.path or "/"
+    return f"{path}?{urlencode(query)}" if query else path
+
+class HttpCache:
+    """
+    【記録・再生キャッシュ】
+    mode:
+      record      記録があり ttl_s 以内ならそれを返す。古ければ ETag / Last-Modified で条件付き再取得し、
+                  304 なら記録を延命、200 なら差し替える。通信に失敗したら古い記録で代用する
+      replay      記録だけを返す。記録がなければ CacheMiss (通信は一切しない)
+      passthrough 毎回通信し、記録もしない
+    ttl_s <= 0 なら記録は期限切れにならない。
+    """
+
+    def __init__(self, cache_dir, mode="record", ttl_s=86400, delay_seconds=3.0, timeout=60.0,
+                 user_agent="arxiv-author-benchmark"):
+        if mode not in MODES:
+            raise ValueError(f"unknown http cache mode: {mode} (choose from {', '.join(MODES)})")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.ttl_s = ttl_s
+        # arXiv API の利用規約 (3秒に1リクエスト) に合わせた、実通信どうしの最小間隔
+        self.delay_seconds = delay_seconds
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self._last_request = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.network_requests = 0
+        if mode != "passthrough":
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, digest)
+        return base + ".json", base + ".body"
+
+    def load(self, key):
+        """正規化 URL の記録を (meta, body) で返す。なければ (None, None)"""
+        meta_path, body_path = self._paths(key)
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None, None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            body = f.read()
+        return meta, body
+
+    def _store(self, key, url, status, headers, body):
+        meta_path, body_path = self._paths(key)
+        meta = {
+            "key": key,
+            "url": url,
+            "status": status,
+            "content_type": headers.get("Content-Type", "application/octet-stream"),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        # 途中で落ちても壊れた記録が残らないよう、一時ファイルから置き換える (本体 -> メタの順)
+        with open(body_path + ".tmp", 'wb') as f:
+            f.write(body)
+        os.replace(body_path + ".tmp", body_path)
+        self._write_meta(meta_path, meta)
+        return meta
+
+    def _write_meta(self, meta_path, meta):
+        with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def _request(self, url, headers):
+        wait = self._last_request + self.delay_seconds - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self.network_requests += 1
+        req = urllib.request.Request(url, headers={"User-Agent": self.user_agent, **headers})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.headers, resp.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return 304, e.headers, b""
+            raise
+        finally:
+            self._last_request = time.monotonic()
+
+    def get(self, url, ttl_s=None):
+        """url の応答本体 (bytes) を返す。ttl_s を渡すとこの要求だけ既定の TTL を上書きする"""
+        if self.mode == "passthrough":
+            return self._request(url, {})[2]
+
+        key = normalize_url(url)
+        meta, body = self.load(key)
+        if self.mode == "replay":
+            if meta is None:
+                raise CacheMiss(f"no recorded response for {key}")
+            self.hits += 1
+            return body
+
+        ttl_s = self.ttl_s if ttl_s is None else ttl_s
+        if meta is not None and (ttl_s <= 0 or time.time() - meta["fetched_at"] < ttl_s):
+            self.hits += 1
+            return body
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            status, resp_headers, resp_body = self._request(url, headers)
+        except (urllib.error.URLError, OSError) as e:
+            if meta is None:
+                raise
+            print(f"Warning: {key} の再検証に失敗したため記録済みの応答を使います ({e})")
+            self.hits += 1
+            return body
+
+        if status == 304 and meta is not None:
+            self.revalidated += 1
+            meta["fetched_at"] = time.time()
+            self._write_meta(self._paths(key)[0], meta)
+            return body
+        self.misses += 1
+        self._store(key, url, status, resp_headers, resp_body)
+        return resp_body
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated,
+                "network_requests": self.network_requests}
+
+def make_server(cache_dir, host="127.0.0.1", port=8080):
+    """記録済みの応答を返す HTTP サーバーを作る (port=0 なら空いているポート)。起動は serve() が行う"""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    cache = HttpCache(cache_dir, mode="replay")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            meta, body = cache.load(normalize_url(self.path))
+            if meta is None:
+                self.send_error(404, "not recorded")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", meta["content_type"])
+            self.send_header("Content-Length", str(len(body)))
+            if meta.get("etag"):
+                self.send_header("ETag", meta["etag"])
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+def serve(cache_dir, host="127.0.0.1", port=8080):
+    """
+    【代役サーバー】
+    記録済みの Atom フィードとソース tarball を HTTP で返す (記録にない URL は 404)。
+    ArxivClient の api_base / source_base をこのサーバーに向ければ、
+    harvest -> extract の全行程をネットワークなしで再現性のある形で計測できる。
+    """
+    server = make_server(cache_dir, host, port)
+    print(f"arXiv 代役サーバー: http://{host}:{server.server_address[1]}/ ({cache_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
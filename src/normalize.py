@@ -0,0 +1,68 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+"""
+- 著者名・所属文字列の比較用正規化
+- 名前の分解 (姓・名の頭文字) と音韻キー (Soundex)
+"""
+
+_PUNCT = re.compile(r'[^\w\s]')
+_SPACE = re.compile(r'\s+')
+
+# 姓として扱わない末尾の敬称・世代表記
+_NAME_SUFFIXES = {"jr", "sr", "ii", "iii", "iv"}
+
+@lru_cache(maxsize=200000)
+def normalize(text):
+    """アクセント・大文字小文字・記号・空白の揺れを吸収した比較用文字列"""
+    text = text or ""
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _PUNCT.sub(' ', text.lower())
+    return _SPACE.sub(' ', text).strip()
+
+def split_name(name):
+    """
+    著者名を (正規化済みの姓, 名の頭文字) に分ける。
+    "Yamada, Taro" の形式はカンマの前を姓とみなす。名がなければ頭文字は ""。
+    """
+    name = name or ""
+    if "," in name:
+        last, _, first = name.partition(",")
+        last_tokens = normalize(last).split()
+        first_tokens = normalize(first).split()
+        surname = last_tokens[-1] if last_tokens else ""
+    else:
+        tokens = [t for t in normalize(name).split() if t not in _NAME_SUFFIXES]
+        surname = tokens[-1] if tokens else ""
+        first_tokens = tokens[:-1]
+    initial = first_tokens[0][0] if first_tokens else ""
+    return surname, initial
+
+_SOUNDEX_CODES = {}
+for _letters, _digit in (("bfpv", "1"), ("cgjkqsxz", "2"), ("dt", "3"), ("l", "4"), ("mn", "5"), ("r", "6")):
+    for _c in _letters:
+        _SOUNDEX_CODES[_c] = _digit
+
+def soundex(word):
+    """
+    American Soundex (例: "Robert" / "Rupert" -> "r163")。
+    英字を含まない語 (漢字の姓など) は "" を返す。
+    """
+    letters = [c for c in normalize(word) if "a" <= c <= "z"]
+    if not letters:
+        return ""
+    code = letters[0]
+    prev = _SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = _SOUNDEX_CODES.get(c, "")
+        if digit and digit != prev:
+            code += digit
+            if len(code) == 4:
+                break
+        # h / w は直前の子音を引き継ぎ、母音は区切りになる
+        if c not in "hw":
+            prev = digit
+    return code.ljust(4, "0")
@@ -2,8 +2,7 @@ import os
 import re
 from collections import Counter
 
-# WSL内部の絶対パスを指定
-SOURCE_DIR = "/home/edoardoyuto/arxiv-author-benchmark/data/raw" 
+# 走査対象は configs/base_config.yaml の paths.raw_dir から受け取る
 
 def strip_latex_comments(text):
     """LaTeXのコメント（% ...）を削除し、実質的なコードだけにする"""
@@ -12,19 +11,19 @@ def strip_latex_comments(text):
     text = text.replace('___ESCAPED_PERCENT___', '%')
     return text
 
-def analyze_classes_recursive():
+def analyze_classes_recursive(source_dir):
     class_counter = Counter()
     processed_folders = 0
     total_tex_files = 0
     
     # パスの存在確認
-    if not os.path.exists(SOURCE_DIR):
-        print(f"エラー: パスが見つかりません -> {SOURCE_DIR}")
+    if not os.path.exists(source_dir):
+        print(f"エラー: パスが見つかりません -> {source_dir}")
         return
 
-    print(f"--- スキャン開始: {SOURCE_DIR} ---")
+    print(f"--- スキャン開始: {source_dir} ---")
 
-    for root, dirs, files in os.walk(SOURCE_DIR):
+    for root, dirs, files in os.walk(source_dir):
         tex_files = [f for f in files if f.endswith(".tex")]
         if not tex_files:
             continue
@@ -71,4 +70,5 @@ def analyze_classes_recursive():
     print(f"不明: {class_counter['(Unknown/No Class)']}")
 
 if __name__ == "__main__":
-    analyze_classes_recursive()
\ No newline at end of file
+    from src.config import load_config
+    analyze_classes_recursive(load_config()["paths"]["raw_dir"])
\ No newline at end of file
@@ -1,6 +1,132 @@
 import re
+from collections import namedtuple
+from functools import lru_cache
+from src.cache import LRUCache
+
+# tokenize が返すイベント1件分
+# name: コマンド名 (\author* の * は落とす) / opt: [...] の中身 ("" なら無し) / arg: {...} の中身
+# offset: "\" の位置 / end: 引数の閉じ括弧の直後 / parent: 引数内に含まれている場合は外側のイベント番号 (なければ -1)
+LatexCommand = namedtuple("LatexCommand", ["name", "opt", "arg", "offset", "end", "parent"])
+
+# 括弧の対応を数えるときに見るもの: エスケープ (\{ など) / 括弧 / 段落区切り
+_ARG_SCAN = re.compile(r'\\.|[{}\[\]]|\n[ \t]*\n', re.DOTALL)
+# コマンドと引数の間に許す空白 (改行1つまで)
+_ARG_GAP = re.compile(r'[ \t]*\n?[ \t]*')
+_KEYVAL = re.compile(r'[a-z]+=(?=\{)')
+
+@lru_cache(maxsize=16)
+def _command_pattern(names):
+    # 長い名前を先に並べ、\affil が \affiliation の先頭にマッチしないよう後ろに英字が続かないことも確認する
+    alternatives = "|".join(re.escape(n) for n in sorted(names, key=len, reverse=True))
+    return re.compile(r'\\(' + alternatives + r')(?![a-zA-Z])\*?')
+
+def _find_closing(text, pos):
+    """
+    text[pos] の "{" または "[" に対応する閉じ括弧の位置を返す (なければ -1)。
+    [...] の中の {...} は読み飛ばす。引数は段落区切り (空行) をまたげないので、そこで打ち切る。
+    """
+    closer = "}" if text[pos] == "{" else "]"
+    braces = brackets = 0
+    for m in _ARG_SCAN.finditer(text, pos):
+        tok = m.group()
+        if tok == "{":
+            braces += 1
+        elif tok == "}":
+            braces -= 1
+            if braces < 0:
+                return -1
+            if braces == 0 and closer == "}":
+                return m.start()
+        elif tok == "[" and braces == 0:
+            brackets += 1
+        elif tok == "]" and braces == 0 and closer == "]":
+            brackets -= 1
+            if brackets == 0:
+                return m.start()
+        elif tok[0] == "\n":
+            return -1
+    return -1
 
 class LatexParser:
+    def __init__(self, cache_size=0):
+        # cache_size > 0 のときだけ clean_text をメモ化する（オプトイン）
+        # 大規模共同研究の論文では同じ所属文字列が何百回も現れるため
+        self.clean_text_cache = None
+        if cache_size and cache_size > 0:
+            self.clean_text_cache = LRUCache(cache_size)
+            self.clean_text = self._cached_clean_text
+
+    def _cached_clean_text(self, text):
+        if not text: return ""
+        return self.clean_text_cache.get_or_compute(text, LatexParser.clean_text)
+
+    def cache_stats(self):
+        if self.clean_text_cache is None:
+            return {}
+        return {"clean_text": self.clean_text_cache.stats()}
+
+    @staticmethod
+    def tokenize(content, names):
+        """
+        【コマンドの切り出し】
+        content を1回だけ走査し、names に含まれるコマンドの出現を
+        LatexCommand (name, opt, arg, offset, end, parent) のリストとして出現順に返す。
+        引数は括弧の対応を数えて切り出すので、\\author{A \\textit{B}} のような入れ子も途中で切れない。
+        引数内に現れたコマンドもイベントになり、parent で外側のイベントを指す。
+        {...} 引数を持たない出現と、括弧が閉じない出現は無視する。
+        """
+        events = []
+        enclosing = []  # (引数の終わり, イベント番号) のスタック
+        for m in _command_pattern(names).finditer(content):
+            pos = _ARG_GAP.match(content, m.end()).end()
+            opt = ""
+            if content.startswith("[", pos):
+                close = _find_closing(content, pos)
+                if close < 0:
+                    continue
+                opt = content[pos + 1:close]
+                pos = _ARG_GAP.match(content, close + 1).end()
+            if not content.startswith("{", pos):
+                continue
+            close = _find_closing(content, pos)
+            if close < 0:
+                continue
+
+            offset = m.start()
+            while enclosing and enclosing[-1][0] <= offset:
+                enclosing.pop()
+            parent = enclosing[-1][1] if enclosing else -1
+            events.append(LatexCommand(m.group(1), opt, content[pos + 1:close], offset, close + 1, parent))
+            enclosing.append((close + 1, len(events) - 1))
+        return events
+
+    @staticmethod
+    def children(events, index):
+        """events[index] の引数の直下に現れたイベント (孫は含まない)"""
+        end = events[index].end
+        found = []
+        j = index + 1
+        while j < len(events) and events[j].offset < end:
+            if events[j].parent == index:
+                found.append(events[j])
+            j += 1
+        return found
+
+    @staticmethod
+    def keyval_values(text):
+        """organization={...}, city={...} 形式の値を、括弧の対応を数えて順に取り出す"""
+        values = []
+        pos = 0
+        while True:
+            m = _KEYVAL.search(text, pos)
+            if not m:
+                return values
+            close = _find_closing(text, m.end())
+            if close < 0:
+                return values
+            values.append(text[m.end() + 1:close])
+            pos = close + 1
+
     @staticmethod
     def strip_comments(text):
         # 現状のロジックで概ねOKですが、改行の扱いに注意
@@ -1,100 +1,243 @@
 import os
 import json
+import time
 from src.utils import load_manifest, save_manifest, append_to_jsonl, get_tex_paths
-from src.extractor import InformationExtractor
-
-# パス設定
-BASE_DIR = "/home/edoardoyuto/arxiv-author-benchmark"
-SOURCE_DIR = os.path.join(BASE_DIR, "data/raw")
-MANIFEST_PATH = os.path.join(BASE_DIR, "data/processed_manifest.json")
-RESULTS_PATH = os.path.join(BASE_DIR, "data/author_benchmarks.jsonl")
-LOG_PATH = os.path.join(BASE_DIR, "data/execution_log.jsonl")
-
-def run_pipeline():
-    extractor = InformationExtractor()
-    manifest = load_manifest(MANIFEST_PATH)
-    arxiv_ids = [d for d in os.listdir(SOURCE_DIR) if os.path.isdir(os.path.join(SOURCE_DIR, d))]
-    
-    print(f"---  抽出開始: {len(arxiv_ids)} フォルダ ---")
-    counts = {"success": 0, "skipped": 0, "error": 0}
-
-    for aid in arxiv_ids:
-        if aid in manifest: continue
-
-        folder_path = os.path.join(SOURCE_DIR, aid)
-        root_path, author_path = get_tex_paths(folder_path)
-        
-        if not root_path or not os.path.exists(root_path):
-            record_log(aid, "ERROR", "判定用TeXファイルが見つかりません")
-            manifest[aid] = {"status": "error", "reason": "root_not_found"}
-            counts["error"] += 1
-            continue
-
-        try:
-            # --- ドキュメントクラスの判定 ---
-            with open(root_path, 'r', encoding='utf-8', errors='ignore') as f:
-                root_content = extractor.parser.strip_comments(f.read())
-            doc_class = extractor.detect_class(root_content)
-
-            # --- 著者情報の読み込み ---
-            # クラス判定用と著者情報用が別ファイルなら開き直す
-            if root_path != author_path and os.path.exists(author_path):
-                with open(author_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    author_content = extractor.parser.strip_comments(f.read())
-            else:
-                author_content = root_content
-
-            # --- クラスに応じた抽出処理 (自動振り分け) ---
-            # extractor.extract() が dispatch_map を見て適切なメソッドを呼び出す
+from src.extractor import InformationExtractor, EXTRACTOR_VERSION
+from src.scheduler import Schedule
+
+def process_paper(extractor, source_dir, aid, result_cache=None):
+    """
+    【論文1件の抽出】
+    戻り値: (output, log_entry, manifest_entry, count_key)
+    output は成功時のみ結果行（辞書）、それ以外は None。
+    ファイル書き込みは行わない（並列実行時も書き込みは親プロセスに集約する）。
+    result_cache (src.result_cache.ResultCache) を渡すと、
+    著者領域が同一の論文は抽出を行わずキャッシュの結果を使う。
+    """
+    folder_path = os.path.join(source_dir, aid)
+    root_path, author_path = get_tex_paths(folder_path)
+
+    if not root_path or not os.path.exists(root_path):
+        log_entry = make_log_entry(aid, "ERROR", "判定用TeXファイルが見つかりません")
+        return None, log_entry, {"status": "error", "reason": "root_not_found"}, "error"
+
+    try:
+        # --- ドキュメントクラスの判定 ---
+        with open(root_path, 'r', encoding='utf-8', errors='ignore') as f:
+            root_content = extractor.parser.strip_comments(f.read())
+        doc_class = extractor.detect_class(root_content)
+
+        # --- 著者情報の読み込み ---
+        # クラス判定用と著者情報用が別ファイルなら開き直す
+        if root_path != author_path and os.path.exists(author_path):
+            with open(author_path, 'r', encoding='utf-8', errors='ignore') as f:
+                author_content = extractor.parser.strip_comments(f.read())
+        else:
+            author_content = root_content
+
+        # --- 抽出結果キャッシュの確認 (v1/v2 などフロントマターが同一の論文) ---
+        cache_hit = False
+        if result_cache is not None and doc_class in extractor.dispatch_map:
+            from src.result_cache import region_key
+            cache_key = region_key(author_content, doc_class, EXTRACTOR_VERSION)
+            cache_hit, authors_data = result_cache.get(cache_key)
+
+        # --- クラスに応じた抽出処理 (自動振り分け) ---
+        # extractor.extract() が dispatch_map を見て適切なメソッドを呼び出す
+        if not cache_hit:
             authors_data = extractor.extract(doc_class, author_content)
+            if result_cache is not None and doc_class in extractor.dispatch_map:
+                result_cache.put(cache_key, doc_class, authors_data)
+
+        if authors_data:
+            # 【成功】
+            output = {"arxiv_id": aid, "doc_class": doc_class, "authors": authors_data}
+            msg = "抽出成功 (キャッシュ)" if cache_hit else "抽出成功"
+            log_entry = make_log_entry(aid, "SUCCESS", msg, doc_class, len(authors_data), cache_hit)
+            return output, log_entry, {"status": "success", "class": doc_class}, "success"
+
+        elif doc_class in extractor.dispatch_map:
+            # 【失敗】対応クラスなのに抽出できなかった（正規表現の不一致など）
+            msg = f"{doc_class}形式ですが、著者を特定できませんでした"
+            log_entry = make_log_entry(aid, "FAILED", msg, doc_class, cache_hit=cache_hit)
+            return None, log_entry, {"status": "failed", "reason": "pattern_mismatch"}, "error"
+
+        else:
+            # 【スキップ】そもそもまだ対応していないクラス
+            msg = f"未対応のクラスです: {doc_class}"
+            log_entry = make_log_entry(aid, "SKIPPED", msg, doc_class)
+            return None, log_entry, {"status": "skipped", "class": doc_class or "unknown"}, "skipped"
+
+    except MemoryError:
+        log_entry = make_log_entry(aid, "OOM", "メモリ確保に失敗しました")
+        return None, log_entry, {"status": "oom"}, "oom"
+
+    except Exception as e:
+        log_entry = make_log_entry(aid, "ERROR", f"システムエラー: {str(e)}")
+        return None, log_entry, {"status": "error"}, "error"
+
+def _run_inline(extractor, source_dir, aids, result_cache, timings):
+    """メインプロセスでの逐次実行。論文ごとの所要時間を timings に記録する"""
+    for aid in aids:
+        started = time.perf_counter()
+        outcome = process_paper(extractor, source_dir, aid, result_cache)
+        timings[aid] = time.perf_counter() - started
+        yield outcome
+
+def run_pipeline(config=None):
+    """
+    【抽出ステージ】
+    workers が 2 以上、または時間・メモリ予算が設定されていれば
+    監視付きワーカー (src.supervisor.SupervisedPool) で実行する。
+    extract.schedule が "cost" なら、見積もりコストの大きい論文から順に配る (src.scheduler)。
+    """
+    if config is None:
+        from src.config import load_config
+        config = load_config()
 
-            if authors_data:
-                # 【成功】
-                output = {"arxiv_id": aid, "doc_class": doc_class, "authors": authors_data}
-                append_to_jsonl(RESULTS_PATH, output)
-                record_log(aid, "SUCCESS", "抽出成功", doc_class, len(authors_data))
-                manifest[aid] = {"status": "success", "class": doc_class}
-                counts["success"] += 1
-                print(f"success[{doc_class}] {aid}: {len(authors_data)} authors.")
-            
-            elif doc_class in extractor.dispatch_map:
-                # 【失敗】対応クラスなのに抽出できなかった（正規表現の不一致など）
-                msg = f"{doc_class}形式ですが、著者を特定できませんでした"
-                record_log(aid, "FAILED", msg, doc_class)
-                manifest[aid] = {"status": "failed", "reason": "pattern_mismatch"}
-                counts["error"] += 1
-            
-            else:
-                # 【スキップ】そもそもまだ対応していないクラス
-                msg = f"未対応のクラスです: {doc_class}"
-                record_log(aid, "SKIPPED", msg, doc_class)
-                manifest[aid] = {"status": "skipped", "class": doc_class or "unknown"}
-                counts["skipped"] += 1
-
-        except Exception as e:
-            record_log(aid, "ERROR", f"システムエラー: {str(e)}")
-            manifest[aid] = {"status": "error"}
-            counts["error"] += 1
-
-    save_manifest(MANIFEST_PATH, manifest)
+    paths = config["paths"]
+    source_dir = paths["raw_dir"]
+    workers = max(1, int(config["extract"]["workers"]))
+    batch_size = max(1, int(config["extract"]["batch_size"]))
+    time_budget_s = config["extract"]["time_budget_s"]
+    memory_budget_mb = config["extract"]["memory_budget_mb"]
+    extractor_options = {
+        "clean_text_cache": config["cache"]["clean_text_entries"],
+        "affiliation_cache": config["cache"]["affiliation_entries"],
+    }
+    # 抽出結果キャッシュ (result_cache_mb が 0 なら無効)
+    result_cache_mb = config["cache"]["result_cache_mb"]
+    result_cache_path = paths["result_cache"] if result_cache_mb else None
+    started_at = time.time()
+
+    manifest = load_manifest(paths["manifest"])
+    arxiv_ids = [d for d in os.listdir(source_dir) if os.path.isdir(os.path.join(source_dir, d))]
+    pending = [aid for aid in arxiv_ids if aid not in manifest]
+
+    print(f"---  抽出開始: {len(arxiv_ids)} フォルダ (未処理 {len(pending)} / workers={workers}) ---")
+    schedule = Schedule(source_dir, pending, InformationExtractor(), paths["timings"], config["extract"]["schedule"])
+    counts = {"success": 0, "skipped": 0, "error": 0, "timeout": 0, "oom": 0}
+    cache_hits = 0
+
+    result_cache = None
+    if workers == 1 and not time_budget_s and not memory_budget_mb:
+        extractor = InformationExtractor(**extractor_options)
+        if result_cache_path:
+            from src.result_cache import ResultCache
+            result_cache = ResultCache(result_cache_path)
+        timings = {}
+        outcomes = _run_inline(extractor, source_dir, schedule.order, result_cache, timings)
+        pool = None
+    else:
+        from src.supervisor import SupervisedPool
+        pool = SupervisedPool(workers, source_dir, time_budget_s, memory_budget_mb,
+                              extractor_options, result_cache_path)
+        timings = pool.timings
+        outcomes = pool.imap_unordered(schedule.order)
+
+    dispatch_started = time.monotonic()
+    try:
+        for done, (output, log_entry, manifest_entry, count_key) in enumerate(outcomes, 1):
+            aid = log_entry["arxiv_id"]
+            if output:
+                append_to_jsonl(paths["results"], output)
+                print(f"success[{output['doc_class']}] {aid}: {len(output['authors'])} authors.")
+            append_to_jsonl(paths["log"], log_entry)
+            manifest[aid] = manifest_entry
+            counts[count_key] += 1
+            cache_hits += log_entry.get("cache_hit", False)
+            schedule.record(paths["timings"], aid, log_entry["doc_class"], timings.get(aid, 0.0),
+                            log_entry.get("cache_hit", False), count_key)
+
+            # 途中で落ちても再開できるよう、一定件数ごとに manifest を保存
+            if done % batch_size == 0:
+                save_manifest(paths["manifest"], manifest)
+    finally:
+        # 途中で例外が出てもワーカーを確実に止める
+        if pool is not None:
+            outcomes.close()
+    makespan_s = time.monotonic() - dispatch_started
+
+    save_manifest(paths["manifest"], manifest)
     print(f"\n--- 🏁 完了レポート ---")
     print(f" 成功 : {counts['success']} 件 / スキップ : {counts['skipped']} 件 / 失敗 : {counts['error']} 件")
+    if result_cache_path:
+        print(f" キャッシュ再利用 : {cache_hits} 件")
+    if pool is not None:
+        print(f" 時間超過 : {counts['timeout']} 件 / メモリ超過 : {counts['oom']} 件 / ワーカー再起動 : {pool.restarts} 回")
+        report_violations(paths["violations"], pool.violations)
+    schedule_summary = schedule.report(workers, makespan_s, timings)
+
+    if pool is not None:
+        cache_stats = pool.cache_stats()
+    else:
+        from src.cache import merge_cache_stats
+        stats = extractor.cache_stats()
+        if result_cache is not None:
+            stats["result_cache"] = result_cache.stats()
+        cache_stats = merge_cache_stats([stats])
+
+    # キャッシュの容量予算を超えた分は、使われていない古い結果から捨てる
+    if result_cache_path:
+        from src.result_cache import ResultCache
+        result_cache = result_cache or ResultCache(result_cache_path)
+        removed = result_cache.prune(result_cache_mb)
+        if removed:
+            print(f" 結果キャッシュ: 容量予算 {result_cache_mb}MB 超過のため {removed} 件を削除")
+        result_cache.close()
+    save_run_profile(paths["profile"], {
+        "started_at": started_at,
+        "elapsed_s": round(time.time() - started_at, 2),
+        "workers": workers,
+        "papers": len(pending),
+        "counts": counts,
+        "schedule": schedule_summary,
+        "cache": cache_stats,
+    })
+    return counts
+
+def save_run_profile(path, profile):
+    """
+    【run profile】
+    直近の実行の所要時間・件数・キャッシュ統計を JSON で保存する。
+    """
+    for name, s in profile["cache"].items():
+        print(f" cache[{name}] hit率 {s['hit_rate']:.1%} / 追い出し {s['evictions']} 件 / 約 {s['nbytes'] / 1024 / 1024:.1f}MB")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=4)
+
+def report_violations(path, violations):
+    """
+    【予算超過レポート】
+    時間・メモリ予算を超えて打ち切られた論文を一覧表示し、JSONL に追記する。
+    """
+    if not violations:
+        return
+    print(f"\n--- ⏱ 予算超過 ({len(violations)} 件) ---")
+    print(f"{'arXiv ID':<20} | {'status':<8} | {'elapsed(s)':>10} | {'peak RSS(MB)':>12}")
+    for v in sorted(violations, key=lambda v: v["elapsed_s"], reverse=True):
+        print(f"{v['arxiv_id']:<20} | {v['status']:<8} | {v['elapsed_s']:>10} | {v['peak_rss_mb']:>12}")
+
+    # 過去の実行分に追記して、問題のある論文を横断的に追えるようにする
+    for v in violations:
+        append_to_jsonl(path, v)
+    print(f"レポート: {path}")
 
-def record_log(aid, status, message, doc_class=None, count=0):
+def make_log_entry(aid, status, message, doc_class=None, count=0, cache_hit=False):
     """
     【統合ログ作成】
-    status: "SUCCESS", "ERROR", "SKIPPED"
+    status: "SUCCESS", "ERROR", "SKIPPED", "FAILED", "TIMEOUT", "OOM"
     message: 成功時のメッセージ、または失敗・スキップの理由
+    cache_hit: 抽出結果キャッシュから返した場合 True
     """
-    log_entry = {
+    return {
         "arxiv_id": aid,
         "status": status,
         "message": message,
         "doc_class": doc_class,
-        "author_count": count
+        "author_count": count,
+        "cache_hit": cache_hit
     }
-    # 事務局(utils)の append_to_jsonl を使って保存
-    append_to_jsonl(LOG_PATH, log_entry)
 
 if __name__ == "__main__":
-    run_pipeline()
\ No newline at end of file
+    run_pipeline()
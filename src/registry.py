@@ -0,0 +1,346 @@
+import os
+import json
+import math
+import hashlib
+
+import numpy as np
+from src.normalize import normalize
+
+"""
+- 研究機関レジストリ (ROR 形式の JSON ダンプ) による所属の正規化
+- 索引はトークンの転置リストを numpy 配列としてディレクトリに保存し、
+  各ワーカーは np.load(mmap_mode='r') で読むだけにする (作り直さない)
+"""
+
+# 索引ディレクトリに .npy として保存する配列
+INDEX_FILES = ("token_hash", "token_idf", "post_offsets", "post_names",
+               "name_org", "name_weight", "org_id", "org_name", "org_place")
+
+def _token_hash(token):
+    """プロセスをまたいで安定な 64bit ハッシュ (組み込みの hash() は実行ごとに変わる)"""
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+def _tokens(text):
+    return normalize(text).split()
+
+def _org_records(path):
+    """
+    ROR ダンプから (id, 表示名, 名前リスト, 所在地トークン) を読み出す。
+    v1 スキーマ (name / aliases / acronyms / labels / addresses) と
+    v2 スキーマ (names[].value / locations[].geonames_details) の両方に対応する。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("items", [])
+
+    for org in data:
+        if org.get("status", "active") != "active":
+            continue
+        if "names" in org:
+            names = [n["value"] for n in org["names"] if n.get("value")]
+            display = next((n["value"] for n in org["names"] if "ror_display" in n.get("types", [])), names[0] if names else "")
+            places = []
+            for loc in org.get("locations", []):
+                details = loc.get("geonames_details", {})
+                places += [details.get("name", ""), details.get("country_name", "")]
+        else:
+            display = org.get("name", "")
+            names = [display] + org.get("aliases", []) + org.get("acronyms", [])
+            names += [l.get("label", "") for l in org.get("labels", [])]
+            places = [a.get("city", "") for a in org.get("addresses", [])]
+            places.append(org.get("country", {}).get("country_name", ""))
+        names = [n for n in dict.fromkeys(names) if n]
+        if names:
+            yield org["id"], display, names, " ".join(p for p in places if p)
+
+def build_index(dump_path, index_dir):
+    """
+    【索引の作成】
+    機関の各名前 (正式名・別名・略称・多言語ラベル) を1エントリとし、
+    トークン -> 名前エントリ の転置リストと IDF を配列にして index_dir に保存する。
+    """
+    org_ids, org_names, org_places = [], [], []
+    name_org, name_tokens = [], []
+    for org_idx, (org_id, display, names, place) in enumerate(_org_records(dump_path)):
+        org_ids.append(org_id)
+        org_names.append(display)
+        org_places.append(" ".join(_tokens(place)))
+        for name in names:
+            tokens = set(_tokens(name))
+            if tokens:
+                name_org.append(org_idx)
+                name_tokens.append(tokens)
+
+    # トークン -> 名前エントリ の転置リスト
+    postings = {}
+    for name_idx, tokens in enumerate(name_tokens):
+        for t in tokens:
+            postings.setdefault(t, []).append(name_idx)
+
+    n_names = max(1, len(name_tokens))
+    vocab = sorted(postings, key=_token_hash)
+    token_hash = np.array([_token_hash(t) for t in vocab], dtype=np.int64)
+    token_idf = np.array([math.log(1 + n_names / len(postings[t])) for t in vocab], dtype=np.float32)
+    idf = dict(zip(vocab, token_idf.tolist()))
+
+    post_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    post_offsets[1:] = np.cumsum([len(postings[t]) for t in vocab])
+    post_names = np.fromiter((n for t in vocab for n in postings[t]), dtype=np.int32, count=int(post_offsets[-1]))
+
+    name_weight = np.array([sum(idf[t] for t in tokens) for tokens in name_tokens], dtype=np.float32)
+
+    os.makedirs(index_dir, exist_ok=True)
+    arrays = {
+        "token_hash": token_hash,
+        "token_idf": token_idf,
+        "post_offsets": post_offsets,
+        "post_names": post_names,
+        "name_org": np.array(name_org, dtype=np.int32),
+        "name_weight": name_weight,
+        "org_id": np.array(org_ids, dtype=str),
+        "org_name": np.array(org_names, dtype=str),
+        "org_place": np.array(org_places, dtype=str),
+    }
+    for key, arr in arrays.items():
+        np.save(os.path.join(index_dir, f"{key}.npy"), arr)
+    print(f"registry: {len(org_ids)} 機関 / {len(name_tokens)} 名前 / {len(vocab)} トークン -> {index_dir}")
+    return len(org_ids)
+
+# 照合中に覚えておくトークン・区間の数の上限 (超えたら捨てて作り直す)
+TOKEN_CACHE_SIZE = 1000000
+SEGMENT_CACHE_SIZE = 100000
+
+class RegistryMatcher:
+    """
+    【所属 -> 機関ID の照合】
+    所属文字列をカンマで区切った各部分について、トークンを共有する機関名を転置リストで集め、
+    IDF 重み付き Dice 係数 2·w(共通) / (w(部分) + w(機関名)) で採点する。
+    所在地 (市・国) のトークンが所属文字列に含まれていれば同点を崩すために少し加点する。
+    """
+
+    def __init__(self, index_dir, min_score=0.5, max_postings=2000):
+        # np.memmap のままだとスライスごとに memmap オブジェクトが作られて遅いので ndarray として見る
+        arrays = {key: np.asarray(np.load(os.path.join(index_dir, f"{key}.npy"), mmap_mode='r'))
+                  for key in INDEX_FILES}
+        self.token_hash = arrays["token_hash"]
+        self.token_idf = arrays["token_idf"]
+        self.post_offsets = arrays["post_offsets"]
+        self.post_names = arrays["post_names"]
+        self.name_org = arrays["name_org"]
+        self.name_weight = arrays["name_weight"]
+        self.org_id = arrays["org_id"]
+        self.org_name = arrays["org_name"]
+        self.org_place = arrays["org_place"]
+        self.min_score = min_score
+        # 出現数の多すぎるトークン ("university" 等) は候補集めには使わず、
+        # 集めた候補がそのトークンを含むかどうかだけを二分探索で調べる
+        self.max_postings = max_postings
+        # 索引にない語は最も珍しい語として区間側の重みに数える
+        self.unknown_idf = float(self.token_idf.max()) if len(self.token_idf) else 1.0
+        # トークン -> 語彙番号 (索引にない語は -1)
+        self._vocab = {}
+        # 機関 -> 所在地トークン
+        self._places = {}
+        # 区間 -> (スコア, 名前エントリ)。"Department of Physics" や "Japan" のような区間は
+        # 所属をまたいで何度も現れる
+        self._segment_scores = {}
+
+    def _token_ids(self, segments):
+        """区間のトークンを並び順のまま語彙番号にした配列 (索引にない語は -1)。未知のトークンはまとめて二分探索する"""
+        ids = self._vocab
+        new = list({t for tokens in segments for t in tokens if t not in ids})
+        if len(ids) + len(new) > TOKEN_CACHE_SIZE:
+            # 捨てた後は、このバッチのトークンをすべて引き直す
+            ids.clear()
+            new = list({t for tokens in segments for t in tokens})
+        if new:
+            hashes = np.array([_token_hash(t) for t in new], dtype=np.int64)
+            pos = np.minimum(np.searchsorted(self.token_hash, hashes), len(self.token_hash) - 1)
+            ids.update(zip(new, np.where(self.token_hash[pos] == hashes, pos, -1).tolist()))
+        return np.array([ids[t] for tokens in segments for t in tokens], dtype=np.int64)
+
+    def _score_segments(self, segments):
+        """
+        区間 (トークン集合) のリストに対する (スコア, 名前エントリ) の最良値のリスト。
+        区間ごとに numpy を呼ぶと小さな配列の処理で遅くなるので、全区間の候補を
+        (区間, 名前エントリ) の組として1つの配列にまとめて採点する。
+        """
+        n = len(segments)
+        results = [(0.0, -1)] * n
+        if not len(self.token_hash):
+            return results
+        counts = [len(tokens) for tokens in segments]
+        tok = self._token_ids(segments)
+        seg = np.repeat(np.arange(n), counts)
+        known = tok >= 0
+        tok_idf = np.where(known, self.token_idf[tok].astype(np.float64), self.unknown_idf)
+        # 索引にない語は最も珍しい語として区間側の重みに数える
+        seg_weight = np.add.reduceat(tok_idf, np.cumsum(counts) - counts).astype(np.float32)
+        post_start = self.post_offsets[tok]
+        post_len = self.post_offsets[tok + 1] - post_start
+        rare = known & (post_len <= self.max_postings)
+        # 一般語だけの区間 ("Graduate School of Science" 等) は機関名の決め手にならない
+        has_rare = np.bincount(seg[rare], minlength=n) > 0
+        frequent = known & ~rare & has_rare[seg]
+
+        if not rare.any():
+            return results
+        lengths = post_len[rare]
+        names = self.post_names[_ranges(post_start[rare], post_start[rare] + lengths)].astype(np.int64)
+        seg_ids = np.repeat(seg[rare], lengths)
+        weights = np.repeat(tok_idf[rare], lengths)
+        # (区間, 名前エントリ) の組ごとに共通トークンの重みを合計する。組は区間番号・名前エントリ番号の昇順に並ぶ
+        n_names = max(1, len(self.name_weight))
+        pairs, inverse = np.unique(seg_ids * n_names + names, return_inverse=True)
+        common = np.bincount(inverse.ravel(), weights=weights)
+        pair_seg = pairs // n_names
+        pair_name = pairs % n_names
+        bounds = np.searchsorted(pair_seg, np.arange(n + 1))
+
+        # 一般語は候補集めには使わず、候補がその語を含むかだけを転置リストの二分探索で調べる。
+        # 区間内で何番目の一般語か (level) と語ごとにまとめ、level の順に足す
+        freq_seg, freq_tok = seg[frequent], tok[frequent]
+        level = np.arange(len(freq_seg)) - np.searchsorted(freq_seg, freq_seg)
+        order = np.lexsort((freq_seg, freq_tok, level))
+        freq_seg, freq_tok, level = freq_seg[order], freq_tok[order], level[order]
+        changed = (freq_tok[1:] != freq_tok[:-1]) | (level[1:] != level[:-1])
+        group_starts = np.flatnonzero(np.r_[len(freq_seg) > 0, changed])
+        for start, end in zip(group_starts.tolist(), np.r_[group_starts[1:], len(freq_seg)].tolist()):
+            t = int(freq_tok[start])
+            posting = self.post_names[self.post_offsets[t]:self.post_offsets[t + 1]]
+            segs = freq_seg[start:end]
+            idx = _ranges(bounds[segs], bounds[segs + 1])
+            candidates = pair_name[idx]
+            pos = np.minimum(np.searchsorted(posting, candidates), len(posting) - 1)
+            common[idx] += float(self.token_idf[t]) * (posting[pos] == candidates)
+
+        scores = 2 * common / (seg_weight[pair_seg] + self.name_weight[pair_name])
+        # 区間ごとの最大値と、それを取る最初の組 (同点なら名前エントリ番号の小さい方)
+        scored = np.flatnonzero(has_rare)
+        best = np.maximum.reduceat(scores, bounds[scored])
+        is_best = scores == np.repeat(best, bounds[scored + 1] - bounds[scored])
+        hits = np.flatnonzero(is_best)
+        _, first = np.unique(pair_seg[hits], return_index=True)
+        for i, score, name_idx in zip(scored.tolist(), best.tolist(), pair_name[hits[first]].tolist()):
+            results[i] = (score, name_idx)
+        return results
+
+    def _best(self, segment_lists):
+        """区間のリストごとに、最もスコアの高い (スコア, 名前エントリ)。未採点の区間はまとめて採点する"""
+        cache = self._segment_scores
+        todo = list({s for segments in segment_lists for s in segments if s not in cache})
+        if len(cache) + len(todo) > SEGMENT_CACHE_SIZE:
+            # 捨てた後は、このバッチの区間をすべて採点し直す
+            cache.clear()
+            todo = list({s for segments in segment_lists for s in segments})
+        if todo:
+            cache.update(zip(todo, self._score_segments(todo)))
+        best = []
+        for segments in segment_lists:
+            best_score, best_name = 0.0, -1
+            for s in segments:
+                score, name_idx = cache[s]
+                if score > best_score:
+                    best_score, best_name = score, name_idx
+            best.append((best_score, best_name))
+        return best
+
+    def match_many(self, affiliations):
+        """
+        所属文字列のリストをまとめて照合する。
+        戻り値: 各所属について {"institution_id", "institution_name", "score"} または None (min_score 未満)
+        """
+        segment_lists = []
+        for affiliation in affiliations:
+            segments = (frozenset(_tokens(seg)) for seg in (affiliation or "").split(","))
+            segment_lists.append([s for s in segments if s])
+        best = self._best(segment_lists)
+
+        # 全体を1区間とした場合も試す (カンマを含む機関名用)。満点が出ていれば結果は変わらない
+        unions = [frozenset().union(*segments) for segments in segment_lists]
+        retry = [i for i, segments in enumerate(segment_lists) if len(segments) > 1 and best[i][0] < 1.0]
+        for i, (score, name_idx) in zip(retry, self._best([[unions[i]] for i in retry])):
+            if score > best[i][0]:
+                best[i] = (score, name_idx)
+
+        return [self._result(score, name_idx, all_tokens) for (score, name_idx), all_tokens in zip(best, unions)]
+
+    def match(self, affiliation):
+        """所属文字列1件を照合する。1件ごとに numpy の固定費がかかるので、まとめて照合するなら match_many を使う"""
+        return self.match_many([affiliation])[0]
+
+    def _result(self, best_score, best_name, all_tokens):
+        if best_name < 0:
+            return None
+        org = int(self.name_org[best_name])
+        place = self._places.get(org)
+        if place is None:
+            place = self._places[org] = str(self.org_place[org]).split()
+        if place and any(p in all_tokens for p in place):
+            best_score = min(1.0, best_score + 0.05)
+        if best_score < self.min_score:
+            return None
+        return {
+            "institution_id": str(self.org_id[org]),
+            "institution_name": str(self.org_name[org]),
+            "score": round(best_score, 4),
+        }
+
+def _ranges(starts, ends):
+    """[starts[k], ends[k]) の添字を連結した配列"""
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return np.arange(int(lengths.sum())) + offsets
+
+# --- 並列照合用: ワーカーごとに索引を mmap で開く ---
+MATCH_BATCH = 2000
+_worker_matcher = None
+
+def _init_worker(index_dir, min_score, max_postings):
+    global _worker_matcher
+    _worker_matcher = RegistryMatcher(index_dir, min_score, max_postings)
+
+def _match_in_worker(affiliations):
+    return list(zip(affiliations, _worker_matcher.match_many(affiliations)))
+
+def match_results(results_path, index_dir, output_path, min_score=0.5, max_postings=2000, workers=1):
+    """
+    【抽出結果の所属を一括照合】
+    結果ファイル中の所属文字列 (重複なし) をすべて照合し、
+    {"affiliation", "institution_id", "institution_name", "score"} を1行ずつ書き出す。
+    照合できなかった所属は institution_id が null になる。
+    """
+    affiliations = {}
+    with open(results_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                for author in json.loads(line).get("authors", []):
+                    for affil in author.get("affiliations", []):
+                        affiliations[affil] = None
+    affiliations = list(affiliations)
+
+    # match_many はまとめて渡すほど速いので、ワーカーにも MATCH_BATCH 件ずつ渡す
+    batches = [affiliations[i:i + MATCH_BATCH] for i in range(0, len(affiliations), MATCH_BATCH)]
+    if workers > 1:
+        import multiprocessing
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(index_dir, min_score, max_postings)) as pool:
+            matched = pool.imap(_match_in_worker, batches)
+            return _write_matches(output_path, (pair for batch in matched for pair in batch))
+
+    matcher = RegistryMatcher(index_dir, min_score, max_postings)
+    return _write_matches(output_path, (pair for batch in batches for pair in zip(batch, matcher.match_many(batch))))
+
+def _write_matches(output_path, matched):
+    total = found = 0
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for affil, result in matched:
+            row = {"affiliation": affil, "institution_id": None, "institution_name": None, "score": 0.0}
+            if result:
+                row.update(result)
+                found += 1
+            total += 1
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    print(f"registry match: {found} / {total} 件の所属を機関に対応づけ -> {output_path}")
+    return found, total
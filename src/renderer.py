@@ -2,28 +2,21 @@ import os
 import json
 import subprocess
 from pathlib import Path
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
 from src.utils import get_tex_paths
 
 '''
 抽出された情報の確認と、元ファイル、PDFを開く
-START_ID に任意のIDを入力すると、そのID以降のファイルのみ開く
+start_id に任意のIDを入力すると、そのID以降のファイルのみ開く
+selenium はここでしか使わないので、関数内で遅延 import する
 '''
 
-# パス設定
-BASE_DIR = "/home/edoardoyuto/arxiv-author-benchmark"
-RESULTS_PATH = os.path.join(BASE_DIR, "data/author_benchmarks.jsonl")
-SOURCE_DIR = os.path.join(BASE_DIR, "data/raw")
-START_ID = "2601.20549v1"
-# ...（パス設定までは同じ）
-START_ID = "2601.20549v1"
-
-def render_with_selenium():
-    if not os.path.exists(RESULTS_PATH):
-        print(f"Error: {RESULTS_PATH} が見つかりません。")
+def render_with_selenium(results_path, source_dir, start_id=None):
+    if not os.path.exists(results_path):
+        print(f"Error: {results_path} が見つかりません。")
         return
 
+    from selenium import webdriver
+
     # Selenium設定
     options = webdriver.ChromeOptions()
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
@@ -34,15 +27,15 @@ def render_with_selenium():
     driver = webdriver.Chrome(options=options)
 
     # --- 修正ポイント1: フラグの初期値をループの外に置く ---
-    # START_ID が指定されていない(None)なら最初から表示、指定があればスキップから開始
-    is_skipping = True if START_ID else False
+    # start_id が指定されていない(None)なら最初から表示、指定があればスキップから開始
+    is_skipping = True if start_id else False
 
     print("\n" + "="*80)
-    print(f" 🔍 検品開始 (START_ID: {START_ID or '最初から'})")
+    print(f" 🔍 検品開始 (START_ID: {start_id or '最初から'})")
     print("="*80)
 
     try:
-        with open(RESULTS_PATH, 'r', encoding='utf-8') as f:
+        with open(results_path, 'r', encoding='utf-8') as f:
             for line in f:
                 if not line.strip():
                     continue
@@ -50,9 +43,9 @@ def render_with_selenium():
                 data = json.loads(line)
                 aid = data.get("arxiv_id")
                 
-                # --- 修正ポイント2: START_ID に到達したか判定 ---
+                # --- 修正ポイント2: start_id に到達したか判定 ---
                 if is_skipping:
-                    if aid == START_ID:
+                    if aid == start_id:
                         is_skipping = False # 到達したので、これ以降はスキップしない
                     else:
                         continue # まだ到達していないので、この行の処理を飛ばして次へ
@@ -68,7 +61,7 @@ def render_with_selenium():
 
                 driver.get(f"https://arxiv.org/pdf/{aid}.pdf")
                 
-                folder_path = os.path.join(SOURCE_DIR, aid)
+                folder_path = os.path.join(source_dir, aid)
                 _, author_path = get_tex_paths(folder_path)
                 
                 if author_path and os.path.exists(author_path):
@@ -82,4 +75,10 @@ def render_with_selenium():
         driver.quit()
 
 if __name__ == "__main__":
-    render_with_selenium()
\ No newline at end of file
+    from src.config import load_config
+    config = load_config()
+    render_with_selenium(
+        config["paths"]["results"],
+        config["paths"]["raw_dir"],
+        config["review"]["start_id"],
+    )
\ No newline at end of file
@@ -0,0 +1,107 @@
+import re
+import json
+import time
+import hashlib
+import sqlite3
+from src.extractor import TOP_LEVEL_COMMANDS
+
+"""
+- 抽出結果の永続キャッシュ (SQLite)
+- キー: 著者領域テキストのハッシュ + doc_class + 抽出器バージョン
+  arXiv の v1 / v2 や再投稿でフロントマターが同一なら、抽出をやり直さない
+"""
+
+# 著者領域の目印: 抽出器が地の文で拾うコマンド (所属内タグはこれらの引数の中にしか現れない)
+REGION_KEYWORDS = tuple("\\" + name for name in sorted(TOP_LEVEL_COMMANDS))
+
+_PARAGRAPH_BREAK = re.compile(r'\n[ \t]*\n')
+
+def author_region(content):
+    """
+    【著者領域の切り出し】
+    最初の著者系コマンドから、最後の著者系コマンドを含む段落の終わりまでを返す。
+    抽出器のマッチはすべてこの範囲で始まり、また parser.tokenize は引数を
+    段落区切り (空行) で打ち切るため、この範囲が同一なら抽出結果も同一になる。
+    """
+    starts = [i for i in (content.find(k) for k in REGION_KEYWORDS) if i >= 0]
+    if not starts:
+        return ""
+    start = min(starts)
+    last = max(content.rfind(k) for k in REGION_KEYWORDS)
+    brk = _PARAGRAPH_BREAK.search(content, last)
+    end = brk.start() if brk else len(content)
+    return content[start:end]
+
+def region_key(content, doc_class, version):
+    """キャッシュキー (sha256 の16進表現)"""
+    h = hashlib.sha256()
+    h.update(f"{version}\0{doc_class}\0".encode('utf-8'))
+    h.update(author_region(content).encode('utf-8', errors='surrogatepass'))
+    return h.hexdigest()
+
+class ResultCache:
+    """
+    【抽出結果キャッシュ】
+    複数ワーカーから同時に読み書きされるため、WAL モード + busy_timeout で開く。
+    接続はプロセスごとに作る (fork 後のワーカー内で生成すること)。
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " doc_class TEXT,"
+            " authors TEXT,"
+            " nbytes INTEGER,"
+            " used_at REAL)"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """(見つかったか, 抽出結果) を返す。抽出結果が None / [] のものも記録されている"""
+        row = self.conn.execute("SELECT authors FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self.conn.execute("UPDATE results SET used_at = ? WHERE key = ?", (time.time(), key))
+        return True, json.loads(row[0])
+
+    def put(self, key, doc_class, authors):
+        payload = json.dumps(authors, ensure_ascii=False)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results (key, doc_class, authors, nbytes, used_at) VALUES (?, ?, ?, ?, ?)",
+            (key, doc_class, payload, len(payload), time.time()),
+        )
+
+    def prune(self, max_mb):
+        """
+        保存済み結果の合計サイズが max_mb を超えていれば、
+        最後に使われたのが古いものから削除する。削除件数を返す。
+        """
+        budget = max_mb * 1024 * 1024
+        total = self.conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM results").fetchone()[0]
+        if total <= budget:
+            return 0
+        removed = 0
+        rows = self.conn.execute("SELECT key, nbytes FROM results ORDER BY used_at").fetchall()
+        self.conn.execute("BEGIN")
+        for key, nbytes in rows:
+            if total <= budget:
+                break
+            self.conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= nbytes
+            removed += 1
+        self.conn.execute("COMMIT")
+        return removed
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self.conn.close()
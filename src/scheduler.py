@@ -0,0 +1,176 @@
+import os
+import json
+import heapq
+from src.utils import get_tex_paths, append_to_jsonl
+
+"""
+- 抽出ステージの実行順の決定 (コストの大きい論文から先に配る)
+- 論文ごとのコストは .tex のサイズと doc_class から見積もり、過去の実測 (paths.timings) で補正する
+"""
+
+# 履歴がないときの既定値: 固定費 (秒) と 1MB あたりの秒数
+# 本文は 1MB あたり 10ms 程度で済むが、REVTeX の大規模共同研究論文は著者・所属コマンドが密で
+# 1MB あたり 0.5 秒近くかかる (scripts/bench_extractors.py)。REVTeX 系は両者の間の値にしておく
+DEFAULT_OVERHEAD_S = 0.001
+DEFAULT_RATE = 0.01
+UNSUPPORTED_RATE = 0.005
+DEFAULT_CLASS_RATES = {
+    "revtex4": 0.1, "revtex4-1": 0.1, "revtex4-2": 0.1,
+    "apsrev4-1": 0.1, "apsrev4-2": 0.1, "aastex631": 0.1, "aastex7": 0.1,
+}
+# クラス別の係数を履歴から推定するのに必要な件数
+MIN_SAMPLES = 5
+# 履歴に残す論文数の上限 (古いものから捨てる)
+MAX_HISTORY = 200000
+
+def paper_features(source_dir, aid, extractor):
+    """見積もりに使う (root / author の .tex の合計バイト数, doc_class)。本文は先頭 64KB だけ読む"""
+    root_path, author_path = get_tex_paths(os.path.join(source_dir, aid))
+    tex_bytes = 0
+    for path in {root_path, author_path}:
+        if path and os.path.exists(path):
+            tex_bytes += os.path.getsize(path)
+    doc_class = "Unknown"
+    if root_path and os.path.exists(root_path):
+        with open(root_path, 'r', encoding='utf-8', errors='ignore') as f:
+            doc_class = extractor.detect_class(f.read(65536))
+    return tex_bytes, doc_class
+
+class CostModel:
+    """
+    【コストモデル】
+    予測秒数 = 固定費 + 係数[doc_class] × MB。
+    同じ論文の実測が履歴にあればそれをそのまま使う (manifest を消して再実行した場合など)。
+    係数は履歴のうちキャッシュを使わなかった論文の 実測合計 / MB 合計 で推定する。
+    """
+
+    def __init__(self, supported_classes, history_path=None):
+        self.supported = set(supported_classes)
+        self.overhead_s = DEFAULT_OVERHEAD_S
+        self.class_rates = dict(DEFAULT_CLASS_RATES)
+        self.known = {}
+        self.samples = 0
+        if history_path and os.path.exists(history_path):
+            self._fit(history_path)
+
+    def _fit(self, history_path):
+        # 同じ論文は最後の行だけを使う (並びは最後に記録された順)
+        latest = {}
+        lines = 0
+        with open(history_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                latest.pop(row["arxiv_id"], None)
+                latest[row["arxiv_id"]] = row
+                lines += 1
+        rows = list(latest.values())[-MAX_HISTORY:]
+        # 追記だけだと再実行のたびに履歴が伸びて読み込みが重くなるので、ここで詰め直す
+        if lines > len(rows):
+            compact_history(history_path, rows)
+
+        sums = {}
+        for row in rows:
+            self.known[row["arxiv_id"]] = row["elapsed_s"]
+            if row.get("cache_hit") or not row.get("tex_bytes"):
+                continue
+            s = sums.setdefault(row["doc_class"], [0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += max(row["elapsed_s"] - self.overhead_s, 0.0)
+            s[2] += row["tex_bytes"] / 1e6
+        for doc_class, (n, seconds, mb) in sums.items():
+            if n >= MIN_SAMPLES and mb > 0:
+                self.class_rates[doc_class] = seconds / mb
+        self.samples = len(self.known)
+
+    def rate(self, doc_class):
+        if doc_class in self.class_rates:
+            return self.class_rates[doc_class]
+        return DEFAULT_RATE if doc_class in self.supported else UNSUPPORTED_RATE
+
+    def predict(self, aid, tex_bytes, doc_class):
+        if aid in self.known:
+            return self.known[aid]
+        return self.overhead_s + self.rate(doc_class) * tex_bytes / 1e6
+
+def compact_history(path, rows):
+    """履歴を rows だけに書き直す (一時ファイルに書いてから置き換える)"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+def makespan(costs, workers):
+    """
+    costs をこの順に「空いたワーカーから取る」方式で配ったときの完了時刻
+    (SupervisedPool の配り方と同じ) を返す。
+    """
+    loads = [0.0] * max(1, workers)
+    for cost in costs:
+        heapq.heapreplace(loads, loads[0] + cost)
+    return max(loads)
+
+class Schedule:
+    """
+    【実行順の決定】
+    pending の論文ごとにコストを見積もり、大きい順 (LPT) に並べる。
+    SupervisedPool は空いたワーカーに1件ずつ渡すので、先頭から順に流すだけで
+    「重い論文を先に、軽い論文で隙間を埋める」動的な割り振りになる。
+    """
+
+    def __init__(self, source_dir, pending, extractor, history_path=None, order="cost"):
+        self.source_dir = source_dir
+        self.extractor = extractor
+        self.model = CostModel(extractor.dispatch_map, history_path)
+        self.features = {}
+        self.predicted = {}
+        self.listdir_order = list(pending)
+        self.order_name = order
+        if order == "cost":
+            # 並べ替えに全件の見積もりが要るので、配る前にまとめて読む
+            for aid in pending:
+                self._estimate(aid)
+            self.order = sorted(pending, key=lambda aid: (-self.predicted[aid], aid))
+        else:
+            # listdir 順なら見積もりは後回しにして、record() で1件ずつ読む
+            self.order = list(pending)
+
+    def _estimate(self, aid):
+        if aid not in self.features:
+            self.features[aid] = paper_features(self.source_dir, aid, self.extractor)
+            self.predicted[aid] = self.model.predict(aid, *self.features[aid])
+        return self.features[aid]
+
+    def report(self, workers, actual_makespan_s, timings):
+        """予測と実測の makespan・総作業量を表示し、run profile 用の辞書を返す"""
+        # listdir 順では、処理し終えた論文の分だけ見積もりがある
+        predicted = [self.predicted[aid] for aid in self.order if aid in self.predicted]
+        summary = {
+            "order": self.order_name,
+            "history_samples": self.model.samples,
+            "predicted_makespan_s": round(makespan(predicted, workers), 3),
+            "listdir_makespan_s": round(makespan(
+                [self.predicted[aid] for aid in self.listdir_order if aid in self.predicted], workers), 3),
+            "actual_makespan_s": round(actual_makespan_s, 3),
+            "predicted_work_s": round(sum(predicted), 3),
+            "actual_work_s": round(sum(timings.values()), 3),
+        }
+        print(f" makespan : 予測 {summary['predicted_makespan_s']:.2f}s"
+              f" (listdir 順なら {summary['listdir_makespan_s']:.2f}s) / 実測 {summary['actual_makespan_s']:.2f}s")
+        print(f" 総作業量 : 予測 {summary['predicted_work_s']:.2f}s / 実測 {summary['actual_work_s']:.2f}s"
+              f" (履歴 {self.model.samples} 論文)")
+        return summary
+
+    def record(self, path, aid, doc_class, elapsed_s, cache_hit, status):
+        """実測を履歴に追記する (次回以降の見積もりに使う。同じ論文は最後の行が優先される)"""
+        tex_bytes, estimated_class = self._estimate(aid)
+        append_to_jsonl(path, {
+            "arxiv_id": aid,
+            "doc_class": doc_class or estimated_class,
+            "tex_bytes": tex_bytes,
+            "elapsed_s": round(elapsed_s, 4),
+            "cache_hit": cache_hit,
+            "status": status,
+        })
@@ -1,18 +1,13 @@
-import arxiv
-def search_papers(category="cs.AI", max_results=5):
+def search_papers(category="cs.AI", max_results=5, client=None):
     """
     指定したカテゴリから最新の論文オブジェクトのリストを返す
+    client を省略すると、キャッシュなしで arXiv に直接問い合わせる
     """
+    from src.arxiv_client import ArxivClient
+
     print(f"Searching for {max_results} papers in category: {category}...")
-    client = arxiv.Client()
-    search = arxiv.Search(
-        query=f"cat:{category}",
-        max_results=max_results,
-        sort_by=arxiv.SortCriterion.SubmittedDate
-    )
-    
-    # 後の処理で使いやすいようにリストにして返す
-    return list(client.results(search))
+    client = client or ArxivClient()
+    return client.search(f"cat:{category}", max_results=max_results, sort_by="submittedDate")
 
 if __name__ == "__main__":
     # テスト用：検索してタイトルだけ表示
@@ -0,0 +1,252 @@
+import os
+import time
+import multiprocessing
+from multiprocessing.connection import wait
+
+"""
+- 抽出ワーカーの監視 (1論文ごとの時間・メモリ予算)
+- 予算を超えたワーカーは kill して新しいワーカーに差し替える
+"""
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def read_rss_mb(pid):
+    """
+    /proc/<pid>/statm から常駐メモリ(RSS)をMB単位で読む。
+    /proc がない環境では None を返し、メモリ監視は行わない。
+    """
+    try:
+        with open(f"/proc/{pid}/statm", 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, IndexError, ValueError):
+        return None
+
+def read_private_mb(pid):
+    """
+    /proc/<pid>/smaps_rollup の Private_Clean + Private_Dirty (そのプロセスだけが持つページ) をMB単位で読む。
+    fork したワーカーの RSS には親から引き継いで共有しているページが含まれるので、予算の判定にはこちらを使う。
+    smaps_rollup がない環境 (Linux 4.14 より前など) では None を返す。
+    """
+    try:
+        kb = 0
+        with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+            for line in f:
+                if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                    kb += int(line.split()[1])
+        return kb / 1024
+    except (OSError, IndexError, ValueError):
+        return None
+
+def _worker_main(conn, source_dir, extractor_options, result_cache_path):
+    """ワーカープロセス本体: 1件ずつ受け取り、結果・キャッシュ統計・所要時間を返す"""
+    from src.extractor import InformationExtractor
+    from src.processor import process_paper, make_log_entry
+
+    extractor = InformationExtractor(**extractor_options)
+    # SQLite の接続は fork をまたげないので、ワーカー内で開く
+    result_cache = None
+    if result_cache_path:
+        from src.result_cache import ResultCache
+        result_cache = ResultCache(result_cache_path)
+    while True:
+        try:
+            aid = conn.recv()
+        except EOFError:
+            break
+        if aid is None:
+            break
+        started = time.perf_counter()
+        try:
+            outcome = process_paper(extractor, source_dir, aid, result_cache)
+        except MemoryError:
+            # process_paper 内の except で拾えなかった確保失敗も oom として返す
+            outcome = (None, make_log_entry(aid, "OOM", "メモリ確保に失敗しました"), {"status": "oom"}, "oom")
+        stats = extractor.cache_stats()
+        if result_cache is not None:
+            stats["result_cache"] = result_cache.stats()
+        conn.send((outcome, stats, time.perf_counter() - started))
+
+class _Slot:
+    """ワーカー1つ分の状態 (プロセス・通信路・処理中の論文)"""
+
+    def __init__(self, ctx, source_dir, extractor_options, result_cache_path):
+        self.conn, child_conn = ctx.Pipe()
+        self.proc = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, source_dir, extractor_options, result_cache_path),
+            daemon=True,
+        )
+        self.proc.start()
+        child_conn.close()
+        self.aid = None
+        self.started_at = None
+        self.peak_rss_mb = 0.0
+        # smaps_rollup が読めない環境用: 起動直後 (論文を渡す前) の RSS を基準にする
+        self.baseline_rss_mb = None
+        # ワーカーから最後に届いたキャッシュ統計 (kill されても直前までの値は残る)
+        self.cache_stats = {}
+
+    def memory_mb(self):
+        """ワーカー自身が確保したメモリ量の見積もり (親と共有しているページは数えない)"""
+        private = read_private_mb(self.proc.pid)
+        if private is not None:
+            return private
+        rss = read_rss_mb(self.proc.pid)
+        if rss is None:
+            return None
+        if self.baseline_rss_mb is None:
+            self.baseline_rss_mb = rss
+        return max(0.0, rss - self.baseline_rss_mb)
+
+    def assign(self, aid):
+        if self.baseline_rss_mb is None and read_private_mb(self.proc.pid) is None:
+            self.baseline_rss_mb = read_rss_mb(self.proc.pid)
+        self.aid = aid
+        self.started_at = time.monotonic()
+        self.peak_rss_mb = 0.0
+        self.conn.send(aid)
+
+    def release(self):
+        self.aid = None
+        self.started_at = None
+
+    def kill(self):
+        self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.proc.join(timeout=1)
+        if self.proc.is_alive():
+            self.proc.kill()
+            self.proc.join()
+        self.conn.close()
+
+class SupervisedPool:
+    """
+    【監視付きワーカープール】
+    各ワーカーには1論文ずつ渡し、親プロセスが経過時間とワーカー固有のメモリ量を監視する。
+    time_budget_s / memory_budget_mb を超えたワーカーは kill され、
+    その論文は status "timeout" / "oom" の結果として返される。
+    0 または None の予算は無制限として扱う。
+    extractor_options は各ワーカーの InformationExtractor にそのまま渡される。
+    result_cache_path を渡すと、各ワーカーが同じ抽出結果キャッシュを共有する。
+    """
+
+    def __init__(self, workers, source_dir, time_budget_s=0, memory_budget_mb=0,
+                 extractor_options=None, result_cache_path=None, poll_interval=0.1):
+        self.workers = max(1, int(workers))
+        self.source_dir = source_dir
+        self.time_budget_s = time_budget_s or 0
+        self.memory_budget_mb = memory_budget_mb or 0
+        self.extractor_options = extractor_options or {}
+        self.result_cache_path = result_cache_path
+        self.poll_interval = poll_interval
+        self.violations = []
+        self.restarts = 0
+        # 論文ごとの所要時間 (ワーカー内の実測。打ち切った論文は打ち切りまでの時間)
+        self.timings = {}
+        self._ctx = multiprocessing.get_context()
+        self._slots = []
+        self._retired_stats = []
+
+    def _new_slot(self):
+        return _Slot(self._ctx, self.source_dir, self.extractor_options, self.result_cache_path)
+
+    def cache_stats(self):
+        """全ワーカー (再起動前のものを含む) のキャッシュ統計を合算する"""
+        from src.cache import merge_cache_stats
+
+        return merge_cache_stats(self._retired_stats + [s.cache_stats for s in self._slots])
+
+    def _violation(self, slot, status, message):
+        """予算超過を記録し、process_paper と同じ形の結果を作る"""
+        from src.processor import make_log_entry
+
+        elapsed = time.monotonic() - slot.started_at
+        self.timings[slot.aid] = elapsed
+        self.violations.append({
+            "arxiv_id": slot.aid,
+            "status": status,
+            "elapsed_s": round(elapsed, 2),
+            "peak_rss_mb": round(slot.peak_rss_mb, 1),
+            "time_budget_s": self.time_budget_s,
+            "memory_budget_mb": self.memory_budget_mb,
+        })
+        log_entry = make_log_entry(slot.aid, status.upper(), message)
+        manifest_entry = {"status": status, "elapsed_s": round(elapsed, 2)}
+        return None, log_entry, manifest_entry, status
+
+    def _check_budget(self, slot):
+        """予算を超えていれば超過の種類 ("timeout" / "oom") とメッセージを返す"""
+        if self.memory_budget_mb:
+            used = slot.memory_mb()
+            if used is not None:
+                slot.peak_rss_mb = max(slot.peak_rss_mb, used)
+                if used > self.memory_budget_mb:
+                    return "oom", f"メモリ予算 {self.memory_budget_mb}MB を超過 ({used:.0f}MB)"
+        if self.time_budget_s:
+            elapsed = time.monotonic() - slot.started_at
+            if elapsed > self.time_budget_s:
+                return "timeout", f"時間予算 {self.time_budget_s}s を超過 ({elapsed:.1f}s)"
+        return None, None
+
+    def imap_unordered(self, aids):
+        """論文IDを受け取り、終わった順に process_paper 形式の結果を返す。渡された順に配る"""
+        queue = list(reversed(aids))
+        slots = self._slots = [self._new_slot() for _ in range(min(self.workers, len(queue)) or 1)]
+
+        try:
+            while queue or any(s.aid is not None for s in slots):
+                # 1. 空いているワーカーに次の論文を渡す
+                for slot in slots:
+                    if slot.aid is None and queue:
+                        slot.assign(queue.pop())
+
+                # 2. 結果が届いたワーカーから回収する
+                busy = {s.conn: s for s in slots if s.aid is not None}
+                for conn in wait(list(busy), timeout=self.poll_interval):
+                    yield self._receive(slots, busy[conn])
+
+                # 3. 処理中のワーカーの予算を確認し、超過していれば差し替える
+                for slot in list(slots):
+                    if slot.aid is None:
+                        continue
+                    # wait() の後に結果を送り終えたワーカーは、予算を見ずにその結果を使う
+                    if slot.conn.poll():
+                        yield self._receive(slots, slot)
+                        continue
+                    status, message = self._check_budget(slot)
+                    if status:
+                        outcome = self._violation(slot, status, message)
+                        self._replace(slots, slot)
+                        yield outcome
+        finally:
+            for slot in slots:
+                slot.stop()
+
+    def _receive(self, slots, slot):
+        """結果の届いたワーカーから1件回収する"""
+        try:
+            outcome, slot.cache_stats, self.timings[slot.aid] = slot.conn.recv()
+        except (EOFError, OSError):
+            # 予算監視より先にワーカーが落ちた (カーネルの OOM killer など)
+            outcome = self._violation(slot, "oom", f"ワーカーが異常終了しました (exitcode={slot.proc.exitcode})")
+            self._replace(slots, slot)
+            return outcome
+        if outcome[3] == "oom":
+            self._violation(slot, "oom", outcome[1]["message"])
+            self._replace(slots, slot)
+        else:
+            slot.release()
+        return outcome
+
+    def _replace(self, slots, slot):
+        self._retired_stats.append(slot.cache_stats)
+        slot.kill()
+        slots[slots.index(slot)] = self._new_slot()
+        self.restarts += 1
@@ -1,6 +1,7 @@
 import os
 import json
 import csv
+import hashlib
 
 """
 - 抽出したファイルを保存(manifesit.json)
@@ -92,4 +93,94 @@ def get_tex_paths(folder_path):
         author_path = root_path
 
     # 【重要】関数の最後で必ずタプルとして返す
-    return root_path, author_path
\ No newline at end of file
+    return root_path, author_path
+
+
+# --- SQLite 索引への JSONL の差分取り込み (author_index / exporter / affiliation_clusters で共通) ---
+
+META_SCHEMA = "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+
+def get_meta(conn, key, default=None):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+def set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+# 取り込んだ範囲の指紋に使う、先頭と取り込み位置の直前のバイト数
+FINGERPRINT_BYTES = 4096
+
+def jsonl_fingerprint(path, offset):
+    """
+    path の先頭 offset バイトの指紋 (先頭と末尾の FINGERPRINT_BYTES バイトの sha1)。
+    取り込み済みの範囲が書き換わっていないかを、全体を読み直さずに確かめるために使う。
+    offset の直前が改行でなければ (行の途中を指していれば) None
+    """
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        h.update(f.read(min(offset, FINGERPRINT_BYTES)))
+        f.seek(max(0, offset - FINGERPRINT_BYTES))
+        tail = f.read(offset - f.tell())
+    if offset and not tail.endswith(b"\n"):
+        return None
+    h.update(tail)
+    return h.hexdigest()
+
+def jsonl_rewritten(conn, path, kind):
+    """
+    前回取り込んだ時点から path が作り直されたか。
+    前回の位置より短い、別のファイル、または取り込み済みの範囲の指紋が違う (作り直して前より長くなった場合など)。
+    True なら呼び出し側で索引を消してから取り込み直す。
+    """
+    if not os.path.exists(path):
+        return False
+    offset = int(get_meta(conn, f"{kind}_offset", 0))
+    source = get_meta(conn, f"{kind}_source")
+    if offset > os.path.getsize(path) or (source is not None and source != os.path.abspath(path)):
+        return True
+    if not offset:
+        return False
+    fingerprint = jsonl_fingerprint(path, offset)
+    stored = get_meta(conn, f"{kind}_fingerprint")
+    return fingerprint is None or (stored is not None and fingerprint != stored)
+
+def ingest_jsonl(conn, path, kind, handle_batch, batch_size=1000):
+    """
+    【差分取り込み】
+    meta の "<kind>_offset" (バイト位置) から path の末尾までを読み、
+    batch_size 行ずつ handle_batch(rows) に渡して1トランザクションでコミットする。
+    書き込み途中の最終行 (改行で終わっていない行) は次回に回す。
+    conn は isolation_level=None で開いたもの。戻り値: 取り込んだ行数
+    """
+    if not os.path.exists(path):
+        return 0
+    if jsonl_rewritten(conn, path, kind):
+        set_meta(conn, f"{kind}_offset", 0)
+    offset = int(get_meta(conn, f"{kind}_offset", 0))
+
+    def commit(rows, offset):
+        conn.execute("BEGIN")
+        if rows:
+            handle_batch(rows)
+        set_meta(conn, f"{kind}_offset", offset)
+        set_meta(conn, f"{kind}_source", os.path.abspath(path))
+        set_meta(conn, f"{kind}_fingerprint", jsonl_fingerprint(path, offset))
+        conn.execute("COMMIT")
+
+    added = 0
+    rows = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            if not line.strip():
+                continue
+            rows.append(json.loads(line))
+            if len(rows) >= batch_size:
+                commit(rows, offset)
+                added += len(rows)
+                rows = []
+    commit(rows, offset)
+    return added + len(rows)
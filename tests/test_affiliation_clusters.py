@@ -0,0 +1,94 @@
+import json
+
+from src.affiliation_clusters import AffiliationClusters, cluster_results, split_affiliation
+
+MIT_PHYSICS = ["Dept. of Physics, MIT, Cambridge, MA", "Department of Physics, Massachusetts Institute of Technology"]
+
+def paper(aid, *authors):
+    return {"arxiv_id": aid, "doc_class": "revtex4-2",
+            "authors": [{"name": name, "affiliations": affils} for name, affils in authors]}
+
+def write_jsonl(path, rows, mode='w'):
+    with open(path, mode, encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def test_split_affiliation():
+    assert split_affiliation(MIT_PHYSICS[0]) == (["department", "physics"], ["mit"])
+    assert split_affiliation(MIT_PHYSICS[1]) == (["department", "physics"], ["mit"])
+    assert split_affiliation("University of Tokyo, Japan") == ([], ["tokyo"])
+    assert split_affiliation("Tokyo University") == ([], ["tokyo"])
+    # 機関名の区間がなければ全体が部局側
+    assert split_affiliation("Theory Group, 12345 Somewhere") == (["theory", "group", "somewhere"], [])
+
+def test_variants_cluster_together(tmp_path):
+    index = AffiliationClusters(str(tmp_path / "clusters.sqlite"))
+    texts = MIT_PHYSICS + [
+        "Department of Chemistry, MIT",
+        "Dept. of Physics, University of Tokyo",
+        "Department of Physics, Univ. of Tokyo, Japan",
+    ]
+    assert index.add(texts) == 5
+    ids = [index.cluster_of(t) for t in texts]
+    assert ids[0] == ids[1]
+    assert ids[3] == ids[4]
+    # 部局か機関が違えば別のクラスタ
+    assert len({ids[0], ids[2], ids[3]}) == 3
+    assert index.stats() == {"affiliations": 5, "clusters": 3}
+    # 登録済みの所属は追加しない
+    assert index.add(texts) == 0
+    index.close()
+
+def test_incremental_add_to_existing_db(tmp_path):
+    db = str(tmp_path / "clusters.sqlite")
+    results = tmp_path / "results.jsonl"
+    write_jsonl(results, [paper("p1", ("A", [MIT_PHYSICS[0], "CERN"]))])
+    index = AffiliationClusters(db)
+    assert index.update(str(results)) == 2
+    first = {t: index.cluster_of(t) for t in (MIT_PHYSICS[0], "CERN")}
+    index.close()
+
+    # 追記分だけを読み、前回のリーダーのクラスタに入る。付いた ID は変わらない
+    write_jsonl(results, [paper("p2", ("B", [MIT_PHYSICS[1], "Dept. of Chemistry, MIT"]))], mode='a')
+    index = AffiliationClusters(db)
+    assert index.update(str(results)) == 2
+    assert index.update(str(results)) == 0
+    assert index.cluster_of(MIT_PHYSICS[1]) == first[MIT_PHYSICS[0]]
+    assert {t: index.cluster_of(t) for t in first} == first
+    assert index.cluster_of("Dept. of Chemistry, MIT") not in first.values()
+    assert index.members(first[MIT_PHYSICS[0]]) == MIT_PHYSICS
+    index.close()
+
+def test_annotate_adds_cluster_ids(tmp_path):
+    results = tmp_path / "results.jsonl"
+    write_jsonl(results, [
+        paper("p1", ("A", [MIT_PHYSICS[0], "CERN"]), ("B", [])),
+        paper("p2", ("C", [MIT_PHYSICS[1]])),
+    ])
+    added, clusters = cluster_results(str(results), str(tmp_path / "clusters.sqlite"),
+                                      str(tmp_path / "clusters.jsonl"), str(tmp_path / "annotated.jsonl"))
+    assert (added, clusters) == (3, 2)
+
+    rows = read_jsonl(tmp_path / "annotated.jsonl")
+    assert [r["arxiv_id"] for r in rows] == ["p1", "p2"]
+    a, b = rows[0]["authors"]
+    (c,) = rows[1]["authors"]
+    assert a["affiliations"] == [MIT_PHYSICS[0], "CERN"]
+    assert len(a["affiliation_cluster_ids"]) == 2
+    assert a["affiliation_cluster_ids"][0] != a["affiliation_cluster_ids"][1]
+    assert b["affiliation_cluster_ids"] == []
+    assert c["affiliation_cluster_ids"] == [a["affiliation_cluster_ids"][0]]
+
+    sizes = {r["affiliation"]: r["cluster_size"] for r in read_jsonl(tmp_path / "clusters.jsonl")}
+    assert sizes == {MIT_PHYSICS[0]: 2, MIT_PHYSICS[1]: 2, "CERN": 1}
+
+    # 索引にない所属は None
+    index = AffiliationClusters(str(tmp_path / "clusters.sqlite"))
+    write_jsonl(tmp_path / "other.jsonl", [paper("p3", ("D", ["Nowhere Lab"]))])
+    assert index.annotate(str(tmp_path / "other.jsonl"), str(tmp_path / "other_annotated.jsonl")) == 1
+    assert read_jsonl(tmp_path / "other_annotated.jsonl")[0]["authors"][0]["affiliation_cluster_ids"] == [None]
+    index.close()
@@ -0,0 +1,61 @@
+import sys
+
+from src.cache import LRUCache, merge_cache_stats
+
+def test_counters_and_eviction_order():
+    calls = []
+
+    def compute(key):
+        calls.append(key)
+        return key.upper()
+
+    cache = LRUCache(2)
+    assert cache.get_or_compute("a", compute) == "A"
+    assert cache.get_or_compute("b", compute) == "B"
+    # a を使ったので、次に追い出されるのは b
+    assert cache.get_or_compute("a", compute) == "A"
+    assert cache.get_or_compute("c", compute) == "C"
+    assert cache.get_or_compute("a", compute) == "A"
+    assert cache.get_or_compute("b", compute) == "B"
+    assert calls == ["a", "b", "c", "b"]
+    assert cache.stats() == {
+        "hits": 2, "misses": 4, "evictions": 2, "size": 2, "maxsize": 2,
+        # 残っているのは a と b
+        "nbytes": sum(sys.getsizeof(k) + sys.getsizeof(k.upper()) for k in ("a", "b")),
+    }
+
+def test_cached_none_is_a_hit():
+    cache = LRUCache(4)
+    assert cache.get_or_compute("x", lambda key: None) is None
+    assert cache.get_or_compute("x", lambda key: 1 / 0) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_merge_stats_from_several_workers():
+    def stats(hits, misses, evictions, size, nbytes):
+        return {"hits": hits, "misses": misses, "evictions": evictions, "size": size, "maxsize": 100,
+                "nbytes": nbytes}
+
+    workers = [
+        {"clean_text": stats(6, 2, 0, 2, 100), "acmart": stats(0, 0, 0, 0, 0)},
+        {"clean_text": stats(3, 1, 1, 1, 50)},
+        # 統計を返さずに終わったワーカー
+        None,
+    ]
+    merged = merge_cache_stats(workers)
+    assert merged == {
+        "clean_text": {"hits": 9, "misses": 3, "evictions": 1, "size": 3, "maxsize": 200, "nbytes": 150,
+                       "hit_rate": 0.75},
+        # 1度も引かれていないキャッシュの hit_rate は 0
+        "acmart": {"hits": 0, "misses": 0, "evictions": 0, "size": 0, "maxsize": 100, "nbytes": 0,
+                   "hit_rate": 0.0},
+    }
+    assert merge_cache_stats([]) == {}
+
+def test_merge_real_caches():
+    caches = [LRUCache(1), LRUCache(1)]
+    for cache, keys in zip(caches, (["a", "a", "b"], ["c"])):
+        for key in keys:
+            cache.get_or_compute(key, str.upper)
+    merged = merge_cache_stats([{"c": cache.stats()} for cache in caches])["c"]
+    assert (merged["hits"], merged["misses"], merged["evictions"], merged["size"]) == (1, 3, 1, 2)
+    assert merged["hit_rate"] == 0.25
@@ -0,0 +1,130 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+from src.evaluator import evaluate, greedy_match, pair_similarity
+
+def reference_dice(a, b, max_chars):
+    """2-gram 集合の Dice 係数を素朴に計算する (encode_bigrams / indexed_similarity の仕様そのもの)"""
+    if a == b:
+        return 1.0
+    grams = []
+    for s in (a, b):
+        s = f" {s[:max_chars]} "
+        grams.append({s[i:i + 2] for i in range(len(s) - 1)})
+    return 2 * len(grams[0] & grams[1]) / (len(grams[0]) + len(grams[1]))
+
+def random_char(rng):
+    # NUL は numpy の U 型で落ち、サロゲートは単独では文字にならないので除く
+    while True:
+        code = rng.randint(1, 0x2FFFF)
+        if not 0xD800 <= code <= 0xDFFF:
+            return chr(code)
+
+def random_text(rng):
+    # 重なりが出るよう少ない文字 (ASCII・アクセント付き・かな漢字・BMP 外の文字) を主に使う
+    alphabet = "ab ab.-" + "éüøñ" + "東京大学かな" + "\U0001F600\U00010348"
+    n = rng.choice([0, 1, 2, 5, 12, 40])
+    return "".join(rng.choice(alphabet) if rng.random() < 0.8 else random_char(rng) for _ in range(n))
+
+@pytest.mark.parametrize("max_chars", [16, 96])
+def test_dice_matches_plain_python(max_chars):
+    rng = random.Random(0)
+    left = [random_text(rng) for _ in range(400)]
+    right = [random_text(rng) for _ in range(400)]
+    # 同じ文字列どうし・同じ組み合わせの繰り返しも混ぜる
+    right[:20] = left[:20]
+    left[20:40], right[20:40] = left[40:60], right[40:60]
+    # バッチの境目をまたぐよう小さなバッチで計算する
+    sims = pair_similarity(left, right, max_chars=max_chars, batch_size=7)
+    expected = [reference_dice(a, b, max_chars) for a, b in zip(left, right)]
+    assert sims.tolist() == pytest.approx(expected, abs=1e-12)
+
+def test_pair_similarity_empty():
+    assert pair_similarity([], []).shape == (0,)
+
+def test_greedy_match_takes_highest_first():
+    sim = np.array([
+        [0.90, 0.95, 0.10],
+        [0.92, 0.20, 0.10],
+        [0.80, 0.70, 0.60],
+    ])
+    # 0.95 (0->1) が先に決まり、0.92 (1->0)。行2 は残った列2 が閾値未満
+    assert greedy_match(sim, 0.65) == {0: 1, 1: 0}
+    assert greedy_match(sim, 0.5) == {0: 1, 1: 0, 2: 2}
+    assert greedy_match(sim, 0.99) == {}
+    assert greedy_match(np.zeros((0, 3)), 0.5) == {}
+
+def test_greedy_match_ties_follow_row_major_order():
+    sim = np.full((2, 2), 0.9)
+    assert greedy_match(sim, 0.5) == {0: 0, 1: 1}
+
+def write_jsonl(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+def paper(aid, doc_class, *authors):
+    return {"arxiv_id": aid, "doc_class": doc_class,
+            "authors": [{"name": name, "affiliations": affils} for name, affils in authors]}
+
+GOLD = [
+    paper("p1", "amsart", ("Taro Yamada", ["University of Tokyo"]), ("Ann Lee", ["MIT"])),
+    paper("p2", "amsart", ("John Smith", ["CERN"]), ("Bo Kim", ["KEK"])),
+    paper("p3", "revtex4-2", ("Eve Kim", ["KAIST"])),
+    paper("p4", "revtex4-2", ("Zed Ray", ["X Lab"])),
+]
+PREDS = [
+    paper("p1", "amsart", ("Taro Yamada", ["University of Tokyo"]), ("Ann Lee", ["MIT"])),
+    # 著者を1人取りこぼし、余分なリンクを1本付けた
+    paper("p2", "amsart", ("John Smith", ["CERN", "KEK"])),
+    # 表記ゆれは類似度で対応づく (取りこぼしにも余分にもならない)
+    paper("p3", "revtex4-2", ("Eve Kimm", ["KAIST"])),
+    # p4 は抽出結果なし。正解にない論文は数えない
+    paper("p9", "acmart", ("Nobody", ["Nowhere"])),
+]
+
+@pytest.fixture
+def report(tmp_path):
+    write_jsonl(tmp_path / "gold.jsonl", GOLD)
+    write_jsonl(tmp_path / "results.jsonl", PREDS)
+    return evaluate(str(tmp_path / "results.jsonl"), str(tmp_path / "gold.jsonl"))
+
+def prf(report, cls, kind):
+    s = report["summary"][cls][kind]
+    return s["tp"], s["pred"], s["gold"], s["precision"], s["recall"], s["f1"]
+
+def test_per_class_scores(report):
+    assert report["papers"] == 4
+    # 名前 2x2 + 1x2 + 1x1、所属 2x2 + 2x2 + 1x1
+    assert report["pairs_scored"] == 16
+    assert set(report["summary"]) == {"amsart", "revtex4-2", "ALL"}
+
+    assert prf(report, "amsart", "names") == (3, 3, 4, 1.0, 0.75, 0.8571)
+    assert prf(report, "amsart", "affiliations") == (4, 4, 4, 1.0, 1.0, 1.0)
+    assert prf(report, "amsart", "links") == (3, 4, 4, 0.75, 0.75, 0.75)
+
+    for kind in ("names", "affiliations", "links"):
+        assert prf(report, "revtex4-2", kind) == (1, 1, 2, 1.0, 0.5, 0.6667)
+
+    assert prf(report, "ALL", "names") == (4, 4, 6, 1.0, 0.6667, 0.8)
+    assert prf(report, "ALL", "affiliations") == (5, 5, 6, 1.0, 0.8333, 0.9091)
+    assert prf(report, "ALL", "links") == (4, 5, 6, 0.8, 0.6667, 0.7273)
+
+def test_worst_cases_only_lists_papers_with_errors(report):
+    # p1 (完全一致) と p3 (表記ゆれのみ) は載らない。リンクF1 の低い順
+    assert [(c["arxiv_id"], c["link_f1"]) for c in report["worst_cases"]] == [("p4", 0.0), ("p2", 0.5)]
+    p4, p2 = report["worst_cases"]
+    assert p4["doc_class"] == "revtex4-2"
+    assert p4["missing_names"] == ["zed ray"] and p4["extra_names"] == []
+    assert p2["missing_names"] == ["bo kim"]
+    assert p2["missing_links"] == ["bo kim -> kek"]
+    assert p2["extra_links"] == ["john smith -> kek"]
+
+def test_worst_cases_limit(tmp_path):
+    write_jsonl(tmp_path / "gold.jsonl", GOLD)
+    write_jsonl(tmp_path / "results.jsonl", PREDS)
+    report = evaluate(str(tmp_path / "results.jsonl"), str(tmp_path / "gold.jsonl"), worst_cases=1)
+    assert [c["arxiv_id"] for c in report["worst_cases"]] == ["p4"]
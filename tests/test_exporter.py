@@ -0,0 +1,124 @@
+import json
+import sqlite3
+
+from src.author_index import AuthorIndex
+from src.exporter import export_sqlite, query_dataset
+from src.processor import make_log_entry
+from src.utils import ingest_jsonl, jsonl_rewritten, META_SCHEMA
+
+def paper(aid, doc_class, *authors):
+    return {"arxiv_id": aid, "doc_class": doc_class,
+            "authors": [{"name": name, "affiliations": affils} for name, affils in authors]}
+
+def write_jsonl(path, rows, mode='w'):
+    with open(path, mode, encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+PAPERS = [
+    paper("2401.00001", "revtex4-2", ("Taro Yamada", ["University of Tokyo"]), ("Ann Lee", ["MIT", "CERN"])),
+    paper("2401.00002", "amsart", ("José Müller", ["Universität Zürich"])),
+]
+LOG = [
+    make_log_entry("2401.00001", "SUCCESS", "ok", "revtex4-2", 2),
+    make_log_entry("2401.00002", "SUCCESS", "ok", "amsart", 1),
+    make_log_entry("2401.00003", "SKIPPED", "unsupported", "foo", 0),
+]
+
+def export(tmp_path):
+    return export_sqlite(str(tmp_path / "results.jsonl"), str(tmp_path / "log.jsonl"), str(tmp_path / "db.sqlite"))
+
+def names(db_path, **filters):
+    return sorted(r["name"] for r in query_dataset(db_path, **filters))
+
+def test_second_export_reads_only_appended_lines(tmp_path):
+    write_jsonl(tmp_path / "results.jsonl", PAPERS)
+    write_jsonl(tmp_path / "log.jsonl", LOG)
+    assert export(tmp_path) == (2, 3)
+    assert export(tmp_path) == (0, 0)
+
+    write_jsonl(tmp_path / "results.jsonl", [paper("2401.00004", "acmart", ("Eve Kim", ["KAIST"]))], mode='a')
+    write_jsonl(tmp_path / "log.jsonl", [make_log_entry("2401.00004", "SUCCESS", "ok", "acmart", 1)], mode='a')
+    # 書き込み途中の行は次回に回す
+    with open(tmp_path / "results.jsonl", 'a', encoding='utf-8') as f:
+        f.write('{"arxiv_id": "2401.0')
+    assert export(tmp_path) == (1, 1)
+    db = str(tmp_path / "db.sqlite")
+    assert names(db) == ["Ann Lee", "Ann Lee", "Eve Kim", "José Müller", "Taro Yamada"]
+
+def test_replaced_paper_drops_old_authors_from_search(tmp_path):
+    write_jsonl(tmp_path / "results.jsonl", PAPERS)
+    write_jsonl(tmp_path / "log.jsonl", LOG)
+    export(tmp_path)
+    write_jsonl(tmp_path / "results.jsonl", [paper("2401.00001", "revtex4-2", ("Taro Yamada", ["Kyoto University"]))],
+                mode='a')
+    export(tmp_path)
+    db = str(tmp_path / "db.sqlite")
+    assert query_dataset(db, name="Ann Lee") == []
+    assert query_dataset(db, name="yamada") == [{
+        "arxiv_id": "2401.00001", "doc_class": "revtex4-2", "status": "SUCCESS",
+        "name": "Taro Yamada", "affiliation": "Kyoto University",
+    }]
+    # FTS 索引にも古い著者が残っていない
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM authors_fts WHERE authors_fts MATCH 'lee'").fetchone()[0] == 0
+    assert conn.execute("SELECT author_count FROM papers WHERE arxiv_id = '2401.00001'").fetchone()[0] == 1
+    conn.close()
+
+def test_query_filters(tmp_path):
+    write_jsonl(tmp_path / "results.jsonl", PAPERS)
+    write_jsonl(tmp_path / "log.jsonl", LOG)
+    export(tmp_path)
+    db = str(tmp_path / "db.sqlite")
+    # アクセント・大文字小文字・語順を問わない
+    assert names(db, name="muller jose") == ["José Müller"]
+    assert names(db, affiliation="universitat zurich") == ["José Müller"]
+    assert names(db, affiliation="cern") == ["Ann Lee"]
+    assert names(db, doc_class="revtex*") == ["Ann Lee", "Ann Lee", "Taro Yamada"]
+    assert names(db, doc_class="revtex*", affiliation="tokyo") == ["Taro Yamada"]
+    assert names(db, status="SUCCESS", doc_class="ams*") == ["José Müller"]
+    assert names(db, status="SKIPPED") == []
+    # 記号だけの検索語は何にも一致しない (FTS の構文エラーにもならない)
+    assert query_dataset(db, affiliation="&") == []
+    assert query_dataset(db, name="- ()") == []
+
+def test_rewritten_longer_results_file_is_reingested(tmp_path):
+    write_jsonl(tmp_path / "results.jsonl", PAPERS)
+    write_jsonl(tmp_path / "log.jsonl", LOG)
+    export(tmp_path)
+    # data/ を消して抽出し直したら、前回より長い別の内容になった
+    rerun = [paper(f"2402.{i:05d}", "amsart", (f"Author {i}", [f"Institute {i}"])) for i in range(6)]
+    write_jsonl(tmp_path / "results.jsonl", rerun)
+    export(tmp_path)
+    db = str(tmp_path / "db.sqlite")
+    assert names(db) == [f"Author {i}" for i in range(6)]
+
+def test_rewritten_file_detected_when_offset_is_on_a_line_boundary(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    conn = sqlite3.connect(str(tmp_path / "meta.sqlite"), isolation_level=None)
+    conn.executescript(META_SCHEMA)
+    seen = []
+    write_jsonl(path, [{"arxiv_id": "a"}, {"arxiv_id": "b"}])
+    assert ingest_jsonl(conn, path, "results", seen.extend) == 2
+    assert not jsonl_rewritten(conn, path, "results")
+    # 同じ長さの行で作り直すと、前回の位置はちょうど行の境目になる
+    write_jsonl(path, [{"arxiv_id": "c"}, {"arxiv_id": "d"}, {"arxiv_id": "e"}])
+    assert jsonl_rewritten(conn, path, "results")
+    assert ingest_jsonl(conn, path, "results", seen.extend) == 3
+    assert [r["arxiv_id"] for r in seen] == ["a", "b", "c", "d", "e"]
+    # 追記だけなら作り直しとはみなさない
+    write_jsonl(path, [{"arxiv_id": "f"}], mode='a')
+    assert not jsonl_rewritten(conn, path, "results")
+    conn.close()
+
+def test_author_index_rebuilds_rewritten_longer_file(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    write_jsonl(path, PAPERS)
+    index = AuthorIndex(str(tmp_path / "index.sqlite"))
+    assert index.update(path) == 2
+    rerun = [paper(f"2402.{i:05d}", "amsart", (f"Author Number{i}", [f"Institute {i}"])) for i in range(6)]
+    write_jsonl(path, rerun)
+    assert index.update(path) == 6
+    ids = {r[0] for r in index.conn.execute("SELECT DISTINCT arxiv_id FROM records")}
+    assert ids == {p["arxiv_id"] for p in rerun}
+    index.close()
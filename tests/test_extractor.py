@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from src.extractor import AffiliationSet, InformationExtractor
+
+# 重複した所属・再割当・名指し割当を含む小さな論文。
+# 期待値は AffiliationSet 導入前の抽出器の出力そのもの (並び順・重複の有無まで同じであること)
+DOCS = {
+    "revtex4-2": r"""\documentclass{revtex4-2}
+\author{A. One}
+\affiliation{Inst X}
+\affiliation{Inst Y}
+\author{B. Two}
+\author{C. Three}
+\affiliation{Inst Y}
+\affiliation{Inst X}
+\affiliation{Inst Y}
+\altaffiliation{Inst Z}
+\altaffiliation{Inst Z}
+\collaboration{Some Collaboration}
+\author{D. Four}
+\affiliation{Inst X}
+\author{E. Five}
+""",
+    "amsart": r"""\documentclass{amsart}
+\author{Taro Yamada}
+\author[J. Smith]{John Smith}
+\address{Univ A}
+\curraddr{Univ B}
+\address{Univ A}
+\author{Ann Lee}
+\address[Yamada]{Univ C}
+\address[J. Smith]{Univ A}
+\address{Univ D}
+\author{Bo Kim}
+\address[Lee]{Univ E}
+\author{Cy Park}
+\address{Univ F}
+""",
+    "elsarticle": r"""\documentclass{elsarticle}
+\author[a,b]{First Author}
+\author[b, a]{Second Author}
+\author[c]{Third Author}
+\author{Fourth Author}
+\address{Lab Q}
+\address{Lab Q}
+\address[a]{Lab A}
+\address[b]{Lab B}
+\address[c,a]{Lab C}
+""",
+    "acmart": r"""\documentclass{acmart}
+\author{One}
+\affiliation{Place A}
+\affiliation{Place A}
+\additionalaffiliation{Place B}
+\author{Two}
+\author{Three}
+\affiliation{Place B}
+""",
+}
+
+EXPECTED = {
+    "revtex4-2": [
+        {"name": "A. One", "affiliations": ["Inst X", "Inst Y"]},
+        {"name": "B. Two", "affiliations": ["Inst Y", "Inst X"]},
+        {"name": "C. Three", "affiliations": ["Inst Y", "Inst X", "Inst Z"]},
+        {"name": "D. Four", "affiliations": ["Inst X"]},
+    ],
+    "amsart": [
+        {"name": "Taro Yamada", "affiliations": ["Univ A", "Univ B", "Univ C"]},
+        {"name": "John Smith", "affiliations": ["Univ A", "Univ B"]},
+        {"name": "Ann Lee", "affiliations": ["Univ D", "Univ E"]},
+        {"name": "Bo Kim", "affiliations": ["Univ F"]},
+        {"name": "Cy Park", "affiliations": ["Univ F"]},
+    ],
+    "elsarticle": [
+        {"name": "First Author", "affiliations": ["Lab C", "Lab B"]},
+        {"name": "Second Author", "affiliations": ["Lab B", "Lab C"]},
+        {"name": "Third Author", "affiliations": ["Lab C"]},
+        # ラベルのない所属は従来どおり重複したまま付く
+        {"name": "Fourth Author", "affiliations": ["Lab Q", "Lab Q"]},
+    ],
+    "acmart": [
+        {"name": "One", "affiliations": ["Place A", "Place A", "Place B"]},
+        {"name": "Three", "affiliations": ["Place B"]},
+    ],
+}
+
+@pytest.mark.parametrize("doc_class", sorted(DOCS))
+def test_output_is_byte_identical_to_list_based_extractor(doc_class):
+    result = InformationExtractor().extract(doc_class, DOCS[doc_class])
+    assert json.dumps(result, ensure_ascii=False) == json.dumps(EXPECTED[doc_class], ensure_ascii=False)
+
+def test_affiliation_set_keeps_first_seen_order():
+    s = AffiliationSet()
+    for value in ["b", "a", "b", "c", "a"]:
+        s.add(value)
+    assert s.items == ["b", "a", "c"]
+    assert len(s) == 3
+    assert "c" in s and "d" not in s
+
+def test_affiliation_set_append_keeps_duplicates():
+    s = AffiliationSet()
+    s.append("a")
+    s.append("a")
+    s.add("a")
+    s.add("b")
+    assert s.items == ["a", "a", "b"]
@@ -0,0 +1,209 @@
+import io
+import json
+import os
+import tarfile
+import threading
+import urllib.error
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from src.arxiv_client import ArxivClient, is_arxiv
+from src.collector import harvest
+from src.http_cache import CacheMiss, HttpCache, make_server, normalize_url
+
+class Origin:
+    """本物の arXiv の代わりに、正規化 URL -> (本体, ETag) を返すサーバー。ETag が一致すれば 304"""
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+
+    def handler(self):
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                key = normalize_url(self.path)
+                origin.requests.append((key, self.headers.get("If-None-Match")))
+                if key not in origin.pages:
+                    self.send_error(404)
+                    return
+                body, etag = origin.pages[key]
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/atom+xml")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+@contextmanager
+def running(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+@pytest.fixture
+def origin():
+    origin = Origin()
+    with running(ThreadingHTTPServer(("127.0.0.1", 0), origin.handler())) as base:
+        origin.base = base
+        yield origin
+
+def cache(tmp_path, mode, **kwargs):
+    return HttpCache(str(tmp_path / "cache"), mode=mode, delay_seconds=0, **kwargs)
+
+def age(cache, url, seconds):
+    # 記録の取得時刻を過去にずらして TTL 切れにする
+    meta_path = cache._paths(normalize_url(url))[0]
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    meta["fetched_at"] -= seconds
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+def test_normalize_url():
+    assert normalize_url("https://export.arxiv.org/api/query?max_results=3&search_query=cat:cs.AI ") == \
+        "/api/query?max_results=3&search_query=cat%3Acs.AI"
+    assert normalize_url("http://127.0.0.1:8080/api/query?search_query=cat:cs.AI&max_results=3") == \
+        "/api/query?max_results=3&search_query=cat%3Acs.AI"
+    assert normalize_url("http://127.0.0.1:8080") == "/"
+
+def test_record_then_replay(tmp_path, origin):
+    origin.pages["/e-print/1"] = (b"one", '"v1"')
+    url = origin.base + "/e-print/1"
+    recorder = cache(tmp_path, "record")
+    assert recorder.get(url) == b"one"
+    assert recorder.get(url) == b"one"
+    assert recorder.stats() == {"hits": 1, "misses": 1, "revalidated": 0, "network_requests": 1}
+
+    # 再生は記録だけを使い、通信しない (ホスト名が違っても同じ記録)
+    origin.pages.clear()
+    player = cache(tmp_path, "replay")
+    assert player.get("https://export.arxiv.org/e-print/1") == b"one"
+    with pytest.raises(CacheMiss):
+        player.get(origin.base + "/e-print/2")
+    assert player.network_requests == 0
+    assert len(origin.requests) == 1
+
+def test_passthrough_always_requests_and_never_stores(tmp_path, origin):
+    origin.pages["/e-print/1"] = (b"one", '"v1"')
+    client = cache(tmp_path, "passthrough")
+    assert client.get(origin.base + "/e-print/1") == b"one"
+    assert client.get(origin.base + "/e-print/1") == b"one"
+    assert client.network_requests == 2
+    assert not os.path.exists(tmp_path / "cache")
+
+def test_record_raises_http_error_when_nothing_is_stored(tmp_path, origin):
+    with pytest.raises(urllib.error.HTTPError):
+        cache(tmp_path, "record").get(origin.base + "/e-print/missing")
+
+def test_ttl_revalidation(tmp_path, origin):
+    url = origin.base + "/api/query?search_query=cat:cs.AI"
+    origin.pages[normalize_url(url)] = (b"feed 1", '"v1"')
+    recorder = cache(tmp_path, "record", ttl_s=60)
+    assert recorder.get(url) == b"feed 1"
+    fetched_at = recorder.load(normalize_url(url))[0]["fetched_at"]
+
+    # 期限切れ + 変更なし: 304 で記録を延命する
+    age(recorder, url, 120)
+    assert recorder.get(url) == b"feed 1"
+    assert origin.requests[-1] == (normalize_url(url), '"v1"')
+    assert recorder.revalidated == 1
+    assert recorder.load(normalize_url(url))[0]["fetched_at"] >= fetched_at
+    # 延命した記録は期限内なので通信しない
+    sent = recorder.network_requests
+    assert recorder.get(url) == b"feed 1"
+    assert recorder.network_requests == sent
+
+    # 期限切れ + 変更あり: 200 で記録を差し替える
+    origin.pages[normalize_url(url)] = (b"feed 2", '"v2"')
+    age(recorder, url, 120)
+    assert recorder.get(url) == b"feed 2"
+    assert recorder.load(normalize_url(url))[0]["etag"] == '"v2"'
+    assert cache(tmp_path, "replay").get(url) == b"feed 2"
+
+    # ttl_s=0 の要求は期限切れにならない
+    age(recorder, url, 10 ** 6)
+    sent = recorder.network_requests
+    assert recorder.get(url, ttl_s=0) == b"feed 2"
+    assert recorder.network_requests == sent
+
+def test_network_error_falls_back_to_stored_copy(tmp_path, origin):
+    origin.pages["/e-print/1"] = (b"one", '"v1"')
+    recorder = cache(tmp_path, "record", ttl_s=60, timeout=5)
+    assert recorder.get(origin.base + "/e-print/1") == b"one"
+    age(recorder, origin.base + "/e-print/1", 120)
+    # 同じパスを、誰も待ち受けていないポートで要求する
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+    dead = f"http://127.0.0.1:{server.server_address[1]}"
+    server.server_close()
+    assert recorder.get(dead + "/e-print/1") == b"one"
+    with pytest.raises(urllib.error.URLError):
+        recorder.get(dead + "/e-print/2")
+
+def test_stand_in_server_replays_recording(tmp_path, origin):
+    origin.pages["/e-print/1"] = (b"one", '"v1"')
+    cache(tmp_path, "record").get(origin.base + "/e-print/1")
+    with running(make_server(str(tmp_path / "cache"), port=0)) as base:
+        client = HttpCache(None, mode="passthrough", delay_seconds=0)
+        assert client.get(base + "/e-print/1") == b"one"
+        with pytest.raises(urllib.error.HTTPError) as e:
+            client.get(base + "/e-print/2")
+        assert e.value.code == 404
+
+def tarball(tex):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        data = tex.encode('utf-8')
+        info = tarfile.TarInfo("main.tex")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+def feed(*ids):
+    entries = "".join(f"<entry><id>http://arxiv.org/abs/{aid}</id><title>Paper {aid}</title></entry>"
+                      for aid in ids)
+    return f'<feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>'.encode('utf-8')
+
+def test_harvest_skips_papers_without_source(tmp_path, origin):
+    ids = ["2401.00001v1", "2401.00002v1"]
+    client = ArxivClient(api_base=origin.base, source_base=origin.base)
+    origin.pages[normalize_url(client.api_base + "/api/query?" + "&".join([
+        "search_query=cat:cs.AI", "start=0", "max_results=2", "sortBy=submittedDate", "sortOrder=descending"]))] = \
+        (feed(*ids), '"f"')
+    for aid in ids:
+        origin.pages[normalize_url(f"/api/query?id_list={aid}&max_results=1")] = (feed(aid), f'"{aid}"')
+    origin.pages[f"/e-print/{ids[0]}"] = (tarball("\\documentclass{amsart}\n\\author{A}"), '"t"')
+
+    # record: 2本目の tarball は 404。その論文だけ飛ばす
+    client.cache = cache(tmp_path, "record")
+    harvest(str(tmp_path / "raw"), ["cs.AI"], max_results=2, sleep_seconds=0, client=client)
+    assert sorted(os.listdir(tmp_path / "raw")) == [ids[0]]
+    assert os.path.exists(tmp_path / "raw" / ids[0] / "metadata.json")
+
+    # replay: 記録のない tarball (CacheMiss) と記録のないカテゴリの検索も止まらずに飛ばす
+    client.cache = cache(tmp_path, "replay")
+    harvest(str(tmp_path / "raw2"), ["cs.AI", "math.AG"], max_results=2, sleep_seconds=0, client=client)
+    assert sorted(os.listdir(tmp_path / "raw2")) == [ids[0]]
+
+def test_is_arxiv():
+    assert is_arxiv("https://export.arxiv.org")
+    assert is_arxiv("http://arxiv.org/")
+    assert not is_arxiv("http://127.0.0.1:8080")
+    assert not is_arxiv("https://notarxiv.org")
@@ -0,0 +1,106 @@
+import pytest
+
+from src.extractor import InformationExtractor
+from src.parser import LatexParser
+
+NAMES = frozenset({"author", "affiliation", "address", "institution", "textit"})
+
+def tokenize(content):
+    return LatexParser.tokenize(content, NAMES)
+
+def test_nested_arguments_are_not_truncated():
+    events = tokenize(r"\author{A \textit{B}} \affiliation{\institution{X {Y}} Z}")
+    assert [(e.name, e.arg) for e in events] == [
+        ("author", r"A \textit{B}"),
+        ("textit", "B"),
+        ("affiliation", r"\institution{X {Y}} Z"),
+        ("institution", "X {Y}"),
+    ]
+
+def test_escaped_braces_do_not_count():
+    events = tokenize(r"\author{A \{ B}")
+    assert [e.arg for e in events] == [r"A \{ B"]
+
+def test_unterminated_brace_is_ignored():
+    assert tokenize(r"\author{A \affiliation{B") == []
+    # 閉じない出現を飛ばしても、後続の出現は拾う
+    events = tokenize("\\author{A\n\n\\author{C}")
+    assert [(e.name, e.arg) for e in events] == [("author", "C")]
+
+def test_optional_argument_may_contain_braces():
+    events = tokenize(r"\author[{a]}]{Name}")
+    assert [(e.opt, e.arg) for e in events] == [("{a]}", "Name")]
+
+def test_starred_command():
+    events = tokenize(r"\author*[1]{Name}")
+    assert [(e.name, e.opt, e.arg) for e in events] == [("author", "1", "Name")]
+
+def test_longer_command_names_are_not_prefix_matched():
+    assert tokenize(r"\authorx{A} \affil{B}") == []
+
+def test_parent_points_to_enclosing_event():
+    events = tokenize(r"\affiliation{\institution{X \textit{Y}}\address{Z}} \author{W}")
+    assert [(e.name, e.parent) for e in events] == [
+        ("affiliation", -1), ("institution", 0), ("textit", 1), ("address", 0), ("author", -1),
+    ]
+    # children は直下のイベントだけ (孫の \textit は含まない)
+    assert [e.name for e in LatexParser.children(events, 0)] == ["institution", "address"]
+
+def test_argument_cannot_span_blank_line():
+    assert tokenize("\\author{A\n\nB}") == []
+    assert tokenize("\\author{A\n  \t\nB}") == []
+    # 改行1つはまたげる (コマンドと引数の間も同じ)
+    assert [e.arg for e in tokenize("\\author{A\nB}")] == ["A\nB"]
+    assert [e.arg for e in tokenize("\\author\n{A}")] == ["A"]
+    assert tokenize("\\author\n\n{A}") == []
+
+def test_keyval_values_with_nested_braces():
+    assert LatexParser.keyval_values("organization={A {B}},city={C}") == ["A {B}", "C"]
+
+# クラスの系統ごとに、入れ子の引数を含む小さな論文 (\documentclass 行は各クラス名で付ける)
+AMSART = (r"""\author[A. Doe]{Alice \textsc{Doe}}
+\address[A. Doe]{Dept. of Math., \textit{Univ. of {X}}}
+\author{Bob Roe}
+\address{Inst. Y}""", [
+    {"name": "Alice Doe", "affiliations": ["Dept. of Math., Univ. of X"]},
+    {"name": "Bob Roe", "affiliations": ["Inst. Y"]},
+])
+REVTEX = (r"""\author{Carol \textbf{Ng}$^{1}$}
+\affiliation{Lab {Z}, \textit{City}}
+\author{Dan Wu}
+\altaffiliation{Also at \textit{W}}""", [
+    {"name": "Carol Ng", "affiliations": ["Lab Z, City"]},
+    {"name": "Dan Wu", "affiliations": ["Also at W"]},
+])
+ACMART = (r"""\author{Eve \textit{Kim}}
+\affiliation{\institution{Univ. of \textit{Q}}\city{Town}\country{Land}}""", [
+    {"name": "Eve Kim", "affiliations": ["Univ. of Q, Town, Land"]},
+])
+ELSARTICLE = (r"""\author[a]{Fay \textit{Lo}}
+\address[a]{organization={Inst. of {R}},city={Burg}}""", [
+    {"name": "Fay Lo", "affiliations": ["Inst. of R, Burg"]},
+])
+SN_JNL = (r"""\author*[1]{\fnm{Gus} \sur{\textit{Oh}}}
+\affil[1]{\orgdiv{Dept. {S}}, \orgname{Univ. T}}""", [
+    {"name": "Gus Oh", "affiliations": ["Dept. S, Univ. T"]},
+])
+
+CLASS_DOCS = {
+    "amsart": AMSART, "amsproc": AMSART,
+    "revtex4": REVTEX, "revtex4-1": REVTEX, "revtex4-2": REVTEX, "apsrev4-1": REVTEX, "apsrev4-2": REVTEX,
+    "aastex631": REVTEX, "aastex7": REVTEX, "aa": REVTEX,
+    "acmart": ACMART, "acmsmall": ACMART, "aamas": ACMART,
+    "elsarticle": ELSARTICLE, "cas-dc": ELSARTICLE,
+    "sn-jnl": SN_JNL,
+}
+
+def test_every_dispatched_class_has_a_document():
+    assert set(CLASS_DOCS) == set(InformationExtractor().dispatch_map)
+
+@pytest.mark.parametrize("doc_class", sorted(CLASS_DOCS))
+def test_extract_each_class(doc_class):
+    body, expected = CLASS_DOCS[doc_class]
+    content = "\\documentclass{%s}\n%s" % (doc_class, body)
+    extractor = InformationExtractor()
+    assert extractor.detect_class(content) == doc_class
+    assert extractor.extract(doc_class, content) == expected
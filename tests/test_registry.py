@@ -0,0 +1,186 @@
+import json
+import math
+import random
+
+import numpy as np
+import pytest
+
+import src.registry
+from src.normalize import normalize
+from src.registry import RegistryMatcher, build_index
+
+# 同じ機関を v1 スキーマ (name / aliases / acronyms / labels / addresses) と
+# v2 スキーマ (names[].value / locations[].geonames_details) で書いた小さな ROR ダンプ
+ORGS = [
+    # (id, 表示名, 別名, 略称, 多言語ラベル, 市, 国)
+    ("https://ror.org/mit", "Massachusetts Institute of Technology", [], ["MIT"], [], "Cambridge", "United States"),
+    ("https://ror.org/tokyo", "University of Tokyo", ["Todai"], ["UTokyo"], ["東京大学"], "Tokyo", "Japan"),
+    ("https://ror.org/kyoto", "Kyoto University", [], ["KU"], [], "Kyoto", "Japan"),
+    ("https://ror.org/cam", "University of Cambridge", [], [], [], "Cambridge", "United Kingdom"),
+    # 同名の機関 (同点は索引で先にある名前が勝つ)
+    ("https://ror.org/iop-prague", "Institute of Physics", [], [], [], "Prague", "Czechia"),
+    ("https://ror.org/iop-zagreb", "Institute of Physics", [], [], [], "Zagreb", "Croatia"),
+    ("https://ror.org/tech", "Technical University of Munich", [], ["TUM"], [], "Munich", "Germany"),
+]
+WITHDRAWN = ("https://ror.org/old", "Old Institute of Technology")
+
+def v1_dump():
+    orgs = [{
+        "id": oid, "name": name, "aliases": aliases, "acronyms": acronyms,
+        "labels": [{"label": l} for l in labels],
+        "addresses": [{"city": city}], "country": {"country_name": country}, "status": "active",
+    } for oid, name, aliases, acronyms, labels, city, country in ORGS]
+    orgs.append({"id": WITHDRAWN[0], "name": WITHDRAWN[1], "status": "withdrawn"})
+    return orgs
+
+def v2_dump():
+    items = [{
+        "id": oid,
+        "names": ([{"value": name, "types": ["ror_display", "label"]}]
+                  + [{"value": a, "types": ["alias"]} for a in aliases]
+                  + [{"value": a, "types": ["acronym"]} for a in acronyms]
+                  + [{"value": l, "types": ["label"]} for l in labels]),
+        "locations": [{"geonames_details": {"name": city, "country_name": country}}],
+        "status": "active",
+    } for oid, name, aliases, acronyms, labels, city, country in ORGS]
+    items.append({"id": WITHDRAWN[0], "names": [{"value": WITHDRAWN[1], "types": ["ror_display"]}],
+                  "status": "withdrawn"})
+    return {"items": items}
+
+@pytest.fixture(params=["v1", "v2"])
+def index_dir(request, tmp_path):
+    dump = tmp_path / "ror.json"
+    dump.write_text(json.dumps(v1_dump() if request.param == "v1" else v2_dump(), ensure_ascii=False), encoding="utf-8")
+    build_index(str(dump), str(tmp_path / "index"))
+    return str(tmp_path / "index")
+
+class ReferenceScorer:
+    """索引を使わず、名前エントリを1件ずつ比べる素朴な実装 (RegistryMatcher の仕様そのもの)"""
+
+    def __init__(self, min_score=0.5, max_postings=2000):
+        self.entries = []  # (機関の添字, トークン集合)
+        for org, (oid, name, aliases, acronyms, labels, city, country) in enumerate(ORGS):
+            for n in dict.fromkeys([name] + aliases + acronyms + labels):
+                tokens = set(normalize(n).split())
+                if tokens:
+                    self.entries.append((org, tokens))
+        df = {}
+        for _, tokens in self.entries:
+            for t in tokens:
+                df[t] = df.get(t, 0) + 1
+        self.df = df
+        self.idf = {t: float(np.float32(math.log(1 + len(self.entries) / n))) for t, n in df.items()}
+        self.unknown_idf = max(self.idf.values())
+        self.min_score = min_score
+        self.max_postings = max_postings
+
+    def score_segment(self, tokens):
+        seg_weight = sum(self.idf.get(t, self.unknown_idf) for t in tokens)
+        rare = {t for t in tokens if t in self.df and self.df[t] <= self.max_postings}
+        scores = []
+        for i, (_, name_tokens) in enumerate(self.entries):
+            if not rare & name_tokens:
+                continue
+            common = sum(self.idf[t] for t in tokens & name_tokens)
+            name_weight = sum(self.idf[t] for t in name_tokens)
+            scores.append((2 * common / (seg_weight + name_weight), i))
+        if not scores:
+            return 0.0, -1
+        best = max(s for s, _ in scores)
+        # 同点 (丸め誤差の範囲) なら名前エントリの番号が小さい方
+        return best, min(i for s, i in scores if s >= best - 1e-9)
+
+    def match(self, affiliation):
+        segments = [frozenset(normalize(seg).split()) for seg in affiliation.split(",")]
+        segments = [s for s in segments if s]
+        best_score, best_name = 0.0, -1
+        for tokens in segments:
+            score, i = self.score_segment(tokens)
+            if score > best_score + 1e-9:
+                best_score, best_name = score, i
+        all_tokens = frozenset().union(*segments)
+        if len(segments) > 1 and best_score < 1.0:
+            score, i = self.score_segment(all_tokens)
+            if score > best_score + 1e-9:
+                best_score, best_name = score, i
+        if best_name < 0:
+            return None
+        org = ORGS[self.entries[best_name][0]]
+        place = normalize(f"{org[5]} {org[6]}").split()
+        if any(p in all_tokens for p in place):
+            best_score = min(1.0, best_score + 0.05)
+        if best_score < self.min_score:
+            return None
+        return org[0], best_score
+
+def random_affiliations(n, seed=0):
+    words = ["University", "of", "Tokyo", "Kyoto", "Cambridge", "Institute", "Physics", "Technology",
+             "Massachusetts", "Department", "MIT", "Japan", "Munich", "Technical", "Zagreb", "Dept.",
+             "School", "Unknownword", "Todai", "東京大学", "KU", "Germany"]
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        parts = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 3))]
+        out.append(", ".join(parts))
+    return out
+
+def assert_same(result, expected):
+    if expected is None:
+        assert result is None
+    else:
+        assert result is not None
+        assert result["institution_id"] == expected[0]
+        assert result["score"] == pytest.approx(round(expected[1], 4), abs=1e-4)
+
+def test_known_affiliations(index_dir):
+    matcher = RegistryMatcher(index_dir)
+    cases = {
+        "Department of Physics, Massachusetts Institute of Technology, Cambridge, MA": "https://ror.org/mit",
+        "MIT": "https://ror.org/mit",
+        "Dept. of Physics, University of Tokyo, Japan": "https://ror.org/tokyo",
+        "東京大学": "https://ror.org/tokyo",
+        "TUM, Garching": "https://ror.org/tech",
+        "Kyoto University": "https://ror.org/kyoto",
+    }
+    results = matcher.match_many(list(cases))
+    assert [r["institution_id"] for r in results] == list(cases.values())
+    assert matcher.match("Department of Chemistry") is None
+    assert matcher.match("") is None
+    # 取り下げられた機関は索引に入らない
+    assert matcher.match("Old Institute of Technology")["institution_id"] != WITHDRAWN[0]
+
+def test_tie_goes_to_first_name_entry(index_dir):
+    # 同名の2機関は同点。所在地の加点は選ばれた機関の所在地が含まれるときだけ
+    matcher = RegistryMatcher(index_dir)
+    assert matcher.match("Institute of Physics") == {
+        "institution_id": "https://ror.org/iop-prague", "institution_name": "Institute of Physics", "score": 1.0,
+    }
+
+def test_min_score(index_dir):
+    loose = RegistryMatcher(index_dir, min_score=0.1)
+    strict = RegistryMatcher(index_dir, min_score=0.99)
+    result = loose.match("Tokyo Institute")
+    assert result is not None and result["score"] < 0.99
+    assert strict.match("Tokyo Institute") is None
+    assert strict.match("Kyoto University")["institution_id"] == "https://ror.org/kyoto"
+
+@pytest.mark.parametrize("max_postings", [1, 2, 2000])
+def test_matches_reference_scorer(index_dir, max_postings):
+    # max_postings が小さいと "university" や "of" は一般語の経路 (二分探索での包含判定) を通る
+    affiliations = random_affiliations(400)
+    for min_score in (0.0, 0.5):
+        matcher = RegistryMatcher(index_dir, min_score=min_score, max_postings=max_postings)
+        reference = ReferenceScorer(min_score=min_score, max_postings=max_postings)
+        for affiliation, result in zip(affiliations, matcher.match_many(affiliations)):
+            assert_same(result, reference.match(affiliation))
+
+def test_cache_eviction_keeps_results(index_dir, monkeypatch):
+    affiliations = random_affiliations(300, seed=1)
+    expected = RegistryMatcher(index_dir).match_many(affiliations)
+    monkeypatch.setattr(src.registry, "SEGMENT_CACHE_SIZE", 10)
+    monkeypatch.setattr(src.registry, "TOKEN_CACHE_SIZE", 5)
+    matcher = RegistryMatcher(index_dir)
+    results = []
+    for start in range(0, len(affiliations), 7):
+        results += matcher.match_many(affiliations[start:start + 7])
+    assert results == expected
@@ -0,0 +1,84 @@
+import pytest
+
+from src.extractor import EXTRACTOR_VERSION, TOP_LEVEL_COMMANDS, InformationExtractor
+from src.processor import process_paper
+from src.result_cache import ResultCache, author_region, region_key
+
+# 著者領域 (\author 〜 最後の著者系コマンドを含む段落) の前後に本文がある小さな論文
+FRONT = r"""\author{A. One} % corresponding author
+\affiliation{Inst X}
+\author{B. Two}
+\affiliation{Inst Y}"""
+
+def paper(front=FRONT, title="On Things", body="We study things.", comment="% compiled with pdflatex"):
+    return "\n".join([
+        r"\documentclass{revtex4-2}",
+        comment,
+        r"\begin{document}",
+        r"\title{%s}" % title,
+        front,
+        "",
+        r"\begin{abstract}%s\end{abstract}" % body,
+        r"\section{Introduction}",
+        body,
+        r"\end{document}",
+    ])
+
+def key(content, doc_class="revtex4-2", version=EXTRACTOR_VERSION):
+    # process_paper と同じく、コメントを除いてからキーを作る
+    return region_key(InformationExtractor().parser.strip_comments(content), doc_class, version)
+
+def test_region_covers_only_the_front_matter():
+    region = author_region(InformationExtractor().parser.strip_comments(paper()))
+    assert region.startswith(r"\author{A. One}")
+    assert region.endswith(r"\affiliation{Inst Y}")
+    assert author_region(r"\documentclass{article} no authors") == ""
+
+def test_same_front_matter_gives_same_key():
+    base = key(paper())
+    assert key(paper(title="On Other Things")) == base
+    assert key(paper(body="A revised body for v2.")) == base
+    assert key(paper(comment="% v2: fixed typos")) == base
+    assert key(paper(front=FRONT.replace("% corresponding author", "% contact: a@example.org"))) == base
+
+@pytest.mark.parametrize("command", sorted(TOP_LEVEL_COMMANDS))
+def test_change_inside_any_author_command_changes_key(command):
+    front = FRONT + "\n\\%s{Value}" % command
+    assert key(paper(front=front)) != key(paper(front=front.replace("{Value}", "{Other value}")))
+
+def test_doc_class_and_version_change_key():
+    content = paper()
+    assert key(content, "revtex4-1") != key(content)
+    assert key(content, version=EXTRACTOR_VERSION + 1) != key(content)
+
+def write_paper(source_dir, aid, content):
+    folder = source_dir / aid
+    folder.mkdir(parents=True)
+    (folder / "main.tex").write_text(content, encoding='utf-8')
+
+def test_hit_is_logged_and_returns_fresh_result(tmp_path):
+    source_dir = tmp_path / "raw"
+    write_paper(source_dir, "2401.00001v1", paper())
+    write_paper(source_dir, "2401.00001v2", paper(title="On Things (revised)", body="Revised body."))
+    extractor = InformationExtractor()
+    fresh = process_paper(extractor, str(source_dir), "2401.00001v2")
+
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    first = process_paper(extractor, str(source_dir), "2401.00001v1", cache)
+    assert first[1]["cache_hit"] is False
+    # v2 は抽出器を呼ばずにキャッシュから返す
+    extractor.extract = None
+    output, log_entry, manifest_entry, count_key = process_paper(extractor, str(source_dir), "2401.00001v2", cache)
+    cache.close()
+
+    assert log_entry["cache_hit"] is True
+    assert log_entry["status"] == "SUCCESS"
+    assert log_entry["message"] == "抽出成功 (キャッシュ)"
+    assert output == fresh[0]
+    assert output["authors"] == [
+        {"name": "A. One", "affiliations": ["Inst X"]},
+        {"name": "B. Two", "affiliations": ["Inst Y"]},
+    ]
+    assert (manifest_entry, count_key) == (fresh[2], fresh[3])
+    assert log_entry["author_count"] == fresh[1]["author_count"] == 2
+    assert cache.stats() == {"hits": 1, "misses": 1}
@@ -0,0 +1,68 @@
+import os
+import time
+
+import pytest
+
+import src.processor
+import src.supervisor
+from src.processor import make_log_entry
+from src.supervisor import SupervisedPool
+
+# ワーカーは fork で起動するので、親で差し替えた process_paper がそのまま使われる
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/statm"),
+                                reason="/proc がない環境ではメモリ監視を試せない")
+
+def fake_process_paper(extractor, source_dir, aid, result_cache=None):
+    if aid.startswith("slow"):
+        time.sleep(30)
+    if aid.startswith("big"):
+        hog = bytearray(300 * 1024 * 1024)
+        for i in range(0, len(hog), 4096):
+            hog[i] = 1
+        time.sleep(30)
+    log_entry = make_log_entry(aid, "SUCCESS", "ok", "article", 1)
+    output = {"arxiv_id": aid, "doc_class": "article", "authors": []}
+    return output, log_entry, {"status": "success", "class": "article"}, "success"
+
+@pytest.fixture
+def fake_worker(monkeypatch, tmp_path):
+    monkeypatch.setattr(src.processor, "process_paper", fake_process_paper)
+    return str(tmp_path)
+
+def run(pool, aids):
+    return {outcome[1]["arxiv_id"]: outcome[3] for outcome in pool.imap_unordered(aids)}
+
+def test_timeout_kills_and_restarts_worker(fake_worker):
+    pool = SupervisedPool(1, fake_worker, time_budget_s=0.5, poll_interval=0.05)
+    result = run(pool, ["2401.00001", "slow.1", "2401.00002"])
+    assert result == {"2401.00001": "success", "slow.1": "timeout", "2401.00002": "success"}
+    assert pool.restarts == 1
+    assert [v["arxiv_id"] for v in pool.violations] == ["slow.1"]
+
+def test_memory_budget_kills_worker(fake_worker):
+    pool = SupervisedPool(1, fake_worker, memory_budget_mb=100, poll_interval=0.05)
+    result = run(pool, ["big.1", "2401.00001"])
+    assert result == {"big.1": "oom", "2401.00001": "success"}
+    assert pool.restarts == 1
+
+def test_memory_inherited_from_parent_is_not_counted(fake_worker):
+    # 親が予算より大きいメモリを持っていても、fork したワーカーは予算超過にならない
+    ballast = bytearray(200 * 1024 * 1024)
+    for i in range(0, len(ballast), 4096):
+        ballast[i] = 1
+    pool = SupervisedPool(2, fake_worker, memory_budget_mb=100, poll_interval=0.05)
+    result = run(pool, [f"2401.{i:05d}" for i in range(10)])
+    assert set(result.values()) == {"success"}
+    assert pool.violations == []
+    del ballast
+
+def test_result_sent_after_wait_is_not_a_timeout(fake_worker, monkeypatch):
+    # wait() が結果を取りこぼした回でも、届いている結果は予算超過として捨てない
+    def blind_wait(conns, timeout=None):
+        time.sleep(0.05)
+        return []
+    monkeypatch.setattr(src.supervisor, "wait", blind_wait)
+    pool = SupervisedPool(1, fake_worker, time_budget_s=0.01, poll_interval=0.05)
+    result = run(pool, ["2401.00001", "2401.00002"])
+    assert result == {"2401.00001": "success", "2401.00002": "success"}
+    assert pool.violations == []